@@ -0,0 +1,62 @@
+"""
+Page extraction scaling benchmark: pages/sec of common.extract.iter_pages
+for increasing worker counts on one synthetic PDF.
+
+Usage (from the multimodal_graph_rag_ingestion directory):
+    python -m benchmarks.extract --pages 1000 --workers 1 2 4 8
+    python -m benchmarks.extract --pdf big.pdf --output extract.json
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+
+def measure(pdf_path, workers, range_pages, runs):
+    import common.extract
+    from common.extract import iter_pages
+    # Force the sharded path whatever the document size
+    common.extract.EXTRACT_MIN_PAGES = 0
+    best, pages = None, 0
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        pages = sum(1 for _ in iter_pages(pdf_path, workers=workers, range_pages=range_pages))
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return {"workers": workers, "pages": pages, "elapsed_s": round(best, 3), "pages_per_sec": round(pages / best, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure page extraction throughput vs worker processes.")
+    parser.add_argument("--pdf", help="Existing PDF (default: generate a synthetic one)")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--images", type=int, default=2, help="Images per synthetic page")
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="Worker counts (default: 1, 2, 4 ... usable CPUs)")
+    parser.add_argument("--range-pages", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=3, help="Best of N per worker count")
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    from common.extract import usable_cpus
+    cpus = usable_cpus()
+    worker_counts = args.workers or sorted({1, cpus} | {2 ** i for i in range(1, cpus.bit_length()) if 2 ** i <= cpus})
+
+    with tempfile.TemporaryDirectory() as workdir:
+        pdf_path = args.pdf
+        if not pdf_path:
+            from benchmarks.synthetic import generate_pdf
+            # All-unique images so every page pays for decoding and hashing
+            pdf_path = generate_pdf(os.path.join(workdir, "extract.pdf"), pages=args.pages,
+                                    images_per_page=args.images, distinct_images=0)
+        results = [measure(pdf_path, n, args.range_pages, args.runs) for n in worker_counts]
+
+    baseline = results[0]["pages_per_sec"]
+    for r in results:
+        r["speedup"] = round(r["pages_per_sec"] / baseline, 2) if baseline else None
+        print(f"{r['workers']:3} workers  {r['pages_per_sec']:9.1f} pages/s  x{r['speedup']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cpu_count": cpus, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Local stand-ins for Gemini, the embedding model, S3 and Neo4j, with configurable latency.
+install_fakes() registers the model fakes in common.resources so the real
+pipeline code runs unchanged; LocalGraph is passed wherever a graph store is expected.
+"""
+import io
+import json
+import time
+import hashlib
+import threading
+from types import SimpleNamespace
+import numpy as np
+
+from benchmarks.synthetic import _VOCABULARY
+from common.local_store import LocalGraphStore
+
+EMBEDDING_DIM = 768
+
+
+def _seed(text):
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+
+class FakeChatModel:
+    """
+    Answers vision and metadata prompts after `latency` seconds.
+    Metadata answers follow the SUMMARY/NEEDS/EXPLICIT format generate_doc_metadata parses,
+    multi-image prompts get one JSON entry per image.
+    """
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+        if isinstance(prompt, str):
+            rng = np.random.default_rng(_seed(prompt))
+            topic = " ".join(rng.choice(_VOCABULARY, 3))
+            needs = ", ".join(" ".join(rng.choice(_VOCABULARY, 2)) for _ in range(3))
+            content = f"SUMMARY: A technical document about {topic}. It covers procedures and specifications.\nNEEDS: {needs}\nEXPLICIT: NONE"
+        else:
+            description = "A technical diagram showing labelled components connected by arrows."
+            parts = prompt[0].content
+            images = sum(1 for part in parts if isinstance(part, dict) and part.get("type") == "image_url")
+            # Batched vision prompts get the structured per-image answer common.ingest.analyze_images parses
+            content = json.dumps([{"image": i + 1, "description": description} for i in range(images)]) \
+                if images > 1 else description
+        return SimpleNamespace(content=content, usage_metadata={"input_tokens": 258, "output_tokens": 40})
+
+
+class FakeEmbeddings:
+    """
+    Deterministic unit vectors (same text -> same vector) after
+    `latency` seconds per call plus `per_text_latency` per text.
+    """
+    def __init__(self, latency=0.0, per_text_latency=0.0, dim=EMBEDDING_DIM):
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.dim = dim
+        self.calls = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, text):
+        v = np.random.default_rng(_seed(text)).standard_normal(self.dim).astype(np.float32)
+        return v / np.linalg.norm(v)
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency + self.per_text_latency * len(texts))
+        with self._lock:
+            self.calls += 1
+            self.texts += len(texts)
+        return [self._vector(t).tolist() for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class LocalS3Error(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class LocalS3:
+    """
+    In-memory S3 client (the calls the pipeline makes) with a fixed latency per request.
+    """
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.objects = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _request(self):
+        time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+
+    def head_object(self, Bucket, Key):
+        self._request()
+        if (Bucket, Key) not in self.objects:
+            raise LocalS3Error("404")
+        return {"ContentLength": len(self.objects[(Bucket, Key)])}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._request()
+        with self._lock:
+            self.objects[(Bucket, Key)] = bytes(Body)
+        return {}
+
+    def get_object(self, Bucket, Key):
+        self._request()
+        if (Bucket, Key) not in self.objects:
+            raise LocalS3Error("NoSuchKey")
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def download_file(self, Bucket, Key, Filename):
+        body = self.get_object(Bucket, Key)["Body"].read()
+        with open(Filename, "wb") as f:
+            f.write(body)
+
+    def delete_objects(self, Bucket, Delete):
+        self._request()
+        with self._lock:
+            for obj in Delete["Objects"]:
+                self.objects.pop((Bucket, obj["Key"]), None)
+        return {}
+
+
+class LocalGraph(LocalGraphStore):
+    """
+    The in-process graph backend (common.local_store) with a fixed latency per
+    round-trip, standing in for Neo4j over the network.
+    """
+    def __init__(self, latency=0.0, top_k=10, threshold=0.80):
+        super().__init__(top_k=top_k, threshold=threshold)
+        self.latency = latency
+        self.round_trips = 0
+        self._trips_lock = threading.Lock()
+
+    def _round_trip(self):
+        time.sleep(self.latency)
+        with self._trips_lock:
+            self.round_trips += 1
+
+
+def install_fakes(llm_latency=0.0, embed_latency=0.0, embed_per_text_latency=0.0, s3=None):
+    """
+    Registers the fake chat/embedding models (and `s3`, e.g. a LocalS3, if given)
+    in common.resources. Returns (llm, embeddings) so callers can read their call counters.
+    """
+    from common import resources
+    from common.embedder import CachedEmbedder
+    llm = FakeChatModel(latency=llm_latency)
+    embeddings = FakeEmbeddings(latency=embed_latency, per_text_latency=embed_per_text_latency)
+    resources.register_client(f"llm:{resources.LLM_MODEL}", llm)
+    resources.register_client(f"embeddings:{resources.EMBEDDING_MODEL}", embeddings)
+    resources.register_client(f"embedder:{resources.EMBEDDING_MODEL}", CachedEmbedder(embeddings))
+    if s3 is not None:
+        resources.register_client("s3", s3)
+    return llm, embeddings
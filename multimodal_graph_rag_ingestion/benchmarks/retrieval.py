@@ -0,0 +1,105 @@
+"""
+Read-path benchmark for common.retrieval with the offline stand-ins from
+benchmarks.fakes: a synthetic corpus in LocalGraph (fixed latency per graph
+round-trip) and FakeEmbeddings (fixed latency per embedding call).
+
+Replays a Zipf-distributed query stream (a few questions are asked over and
+over, most are rare) three ways and reports per-query latency percentiles:
+    cold     caches disabled: every query is embedded and searched
+    warm     embedding LRU + result cache
+    batched  warm caches, queries sent through retrieve_many in groups of --batch
+
+Usage (from the multimodal_graph_rag_ingestion directory):
+    python -m benchmarks.retrieval --documents 200 --queries 2000 --batch 16
+"""
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+def build_corpus(gm, embeddings, documents, chunks_per_doc, seed=0):
+    """Documents with chunks, summaries and needs, linked by the batch linker. Returns the chunk texts."""
+    from benchmarks.synthetic import _VOCABULARY
+    rng = np.random.default_rng(seed)
+    texts = []
+    for d in range(documents):
+        filename = f"doc_{d:04d}.pdf"
+        topic = " ".join(rng.choice(_VOCABULARY, 3))
+        needs = [" ".join(rng.choice(_VOCABULARY, 3)) for _ in range(3)]
+        summary = f"A technical document about {topic}."
+        gm.create_document_node(filename, summary, needs, [],
+                                summary_embedding=embeddings.embed_query(summary),
+                                need_embeddings=embeddings.embed_documents(needs))
+        chunk_texts = [f"{topic} section {c}: " + " ".join(rng.choice(_VOCABULARY, 40)) for c in range(chunks_per_doc)]
+        vectors = embeddings.embed_documents(chunk_texts)
+        gm.write_chunks(filename, [{"id": f"{filename}#{c}", "text": text, "embedding": vector,
+                                    "metadata": {"page": c // 4, "chunk_index": c, "source": filename}}
+                                   for c, (text, vector) in enumerate(zip(chunk_texts, vectors))])
+        texts.extend(chunk_texts)
+    gm.run_batch_linker([f"doc_{d:04d}.pdf" for d in range(documents)])
+    return texts
+
+def zipf_stream(pool, n, a=1.2, seed=1):
+    """`n` queries drawn from `pool` with Zipf popularity (rank r asked ~ 1/r^a as often)."""
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(pool) + 1) ** a
+    picks = rng.choice(len(pool), size=n, p=weights / weights.sum())
+    return [pool[i] for i in picks]
+
+def replay(retriever, stream, batch=1):
+    """Per-query latencies (a batch's latency is charged to each of its queries) and wall time."""
+    samples = []
+    t_start = time.perf_counter()
+    for i in range(0, len(stream), batch):
+        group = stream[i:i + batch]
+        t0 = time.perf_counter()
+        retriever.retrieve_many(group)
+        samples.extend([time.perf_counter() - t0] * len(group))
+    return samples, time.perf_counter() - t_start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark graph-aware retrieval with and without caching.")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--chunks-per-doc", type=int, default=30)
+    parser.add_argument("--queries", type=int, default=2000, help="Length of the replayed query stream")
+    parser.add_argument("--distinct", type=int, default=500, help="Distinct questions in the pool")
+    parser.add_argument("--batch", type=int, default=16, help="Queries per retrieve_many call in the batched run")
+    parser.add_argument("--graph-latency", type=float, default=0.005, help="Seconds per graph round-trip")
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="Seconds per embedding call")
+    parser.add_argument("--embed-rpm", type=float, default=0, help="Client-side embedding requests/minute (0 = unlimited)")
+    args = parser.parse_args()
+
+    os.environ["EMBED_REQUESTS_PER_MINUTE"] = str(args.embed_rpm or 10 ** 9)
+    from benchmarks.fakes import FakeEmbeddings, LocalGraph
+    from benchmarks.run import percentiles
+    from common.retrieval import Retriever
+
+    gm = LocalGraph()
+    texts = build_corpus(gm, FakeEmbeddings(), args.documents, args.chunks_per_doc)
+    # Questions are chunk texts, so every query has a known best hit
+    rng = np.random.default_rng(2)
+    pool = [texts[i] for i in rng.choice(len(texts), size=min(args.distinct, len(texts)), replace=False)]
+    stream = zipf_stream(pool, args.queries)
+    gm.latency = args.graph_latency
+
+    report = {"documents": args.documents, "chunks": len(texts), "queries": len(stream),
+              "distinct_in_stream": len(set(stream))}
+    runs = {
+        "cold": dict(embedding_cache_size=0, cache_size=0),
+        "warm": dict(),
+        "batched": dict(),
+    }
+    for name, options in runs.items():
+        embeddings = FakeEmbeddings(latency=args.embed_latency)
+        retriever = Retriever(store=gm, embeddings=embeddings, **options)
+        gm.round_trips = 0
+        samples, wall = replay(retriever, stream, batch=args.batch if name == "batched" else 1)
+        top_hit = sum(retriever.retrieve(q)["chunks"][0]["text"] == q for q in pool[:50]) / min(50, len(pool))
+        report[name] = {"latency_ms": percentiles(samples), "wall_s": round(wall, 3),
+                        "queries_per_s": round(len(stream) / wall, 1), "graph_round_trips": gm.round_trips,
+                        "embedding_calls": embeddings.calls, "top1_self_hit_rate": top_hit, **retriever.stats}
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Offline pipeline benchmarks: synthetic PDFs, fake Gemini/embeddings/S3 (configurable
+latency) and an in-memory graph, so no live endpoints are needed.
+
+Scenarios (each runs in a fresh interpreter so peak RSS is per scenario):
+1. large: one big document, timed per stage (process_pdf, chunk_content,
+   store_in_graph, run_targeted_linker) and end to end through ingest_document.
+2. small: many small documents through ingest_document; per-document percentiles and docs/sec.
+3. link: run_targeted_linker latency as the corpus grows.
+
+Usage (from the multimodal_graph_rag_ingestion directory):
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios large small --large-pages 500 --llm-latency 0.2
+    python -m benchmarks.run --compare benchmarks/results/20240101-120000.json --max-regression 0.2
+
+Results are written to benchmarks/results/<timestamp>.json.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+
+SCENARIOS = ["large", "small", "link"]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Metrics compared by --compare, and whether higher is better
+COMPARED_METRICS = {
+    "large.end_to_end_s": False,
+    "large.pages_per_sec": True,
+    "small.docs_per_sec": True,
+    "small.latency_ms.p99": False,
+    "link.largest_corpus.latency_ms.p50": False,
+}
+
+
+def percentiles(samples_s):
+    """p50/p90/p99/max of a list of durations (seconds), in milliseconds."""
+    if not samples_s:
+        return {}
+    ordered = sorted(samples_s)
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+    return {"p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99), "max": round(ordered[-1] * 1000, 2)}
+
+def _peak_rss_mb():
+    import resource
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# --- SCENARIOS (run inside the child interpreter) ---
+def scenario_large(args, workdir):
+    from benchmarks.synthetic import generate_pdf
+    from benchmarks.fakes import LocalGraph
+    from common.ingest import process_pdf, chunk_content
+    from common.loader import store_in_graph
+    from common.pipeline import ingest_document
+
+    path = generate_pdf(os.path.join(workdir, "large.pdf"), pages=args.large_pages,
+                        words_per_page=args.words, images_per_page=args.images)
+
+    # 1. Stage by stage (the non-streaming path)
+    gm = LocalGraph(latency=args.graph_latency)
+    gm.touch_document("large.pdf")
+    t0 = time.perf_counter()
+    blocks, _, _, _ = process_pdf(path)
+    t1 = time.perf_counter()
+    chunks = chunk_content(blocks)
+    t2 = time.perf_counter()
+    store_in_graph(chunks, "large.pdf", gm=gm)
+    t3 = time.perf_counter()
+    gm.run_targeted_linker("large.pdf")
+    t4 = time.perf_counter()
+    stages = {"process_pdf_s": t1 - t0, "chunk_content_s": t2 - t1,
+              "store_in_graph_s": t3 - t2, "run_targeted_linker_s": t4 - t3}
+
+    # 2. End to end through the streaming pipeline, against an empty graph
+    gm = LocalGraph(latency=args.graph_latency)
+    t0 = time.perf_counter()
+    stats = ingest_document(path, "large.pdf", gm, mode="full")
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "pages": args.large_pages,
+        "chunks": len(chunks),
+        "stages_s": {k: round(v, 3) for k, v in stages.items()},
+        "end_to_end_s": round(elapsed, 3),
+        "pages_per_sec": round(stats["pages"] / elapsed, 2) if elapsed else 0.0,
+        "chunks_per_sec": round(stats["chunks"] / elapsed, 2) if elapsed else 0.0,
+        "graph_round_trips": gm.round_trips,
+    }
+
+def scenario_small(args, workdir):
+    from benchmarks.synthetic import generate_pdf
+    from benchmarks.fakes import LocalGraph
+    from common.pipeline import ingest_document
+
+    paths = [generate_pdf(os.path.join(workdir, f"small_{i}.pdf"), pages=args.small_pages,
+                          words_per_page=args.words, images_per_page=args.images, seed=i)
+             for i in range(args.small_docs)]
+    gm = LocalGraph(latency=args.graph_latency)
+    latencies = []
+    started = time.perf_counter()
+    for path in paths:
+        t0 = time.perf_counter()
+        ingest_document(path, os.path.basename(path), gm, mode="full")
+        gm.run_targeted_linker(os.path.basename(path))
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "documents": len(paths),
+        "pages_per_doc": args.small_pages,
+        "elapsed_s": round(elapsed, 3),
+        "docs_per_sec": round(len(paths) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": percentiles(latencies),
+    }
+
+def scenario_link(args, workdir):
+    from benchmarks.fakes import LocalGraph
+    from common.pipeline import write_document_node
+
+    results = {}
+    for size in args.corpus_sizes:
+        gm = LocalGraph(latency=args.graph_latency)
+        # Each document needs three others by exact summary text, so links score 1.0
+        for i in range(size):
+            needs = [f"topic {(i * 7 + k) % size}" for k in (1, 2, 3)]
+            write_document_node(gm, f"doc_{i}.pdf", f"topic {i}", needs, [])
+
+        sample = [f"doc_{(i * 37) % size}.pdf" for i in range(min(args.link_samples, size))]
+        latencies, links = [], 0
+        for filename in sample:
+            t0 = time.perf_counter()
+            counts = gm.run_targeted_linker(filename)
+            latencies.append(time.perf_counter() - t0)
+            links += counts["outbound"] + counts["inbound"]
+
+        t0 = time.perf_counter()
+        gm.run_batch_linker(sample)
+        batch_s = time.perf_counter() - t0
+
+        results[str(size)] = {"latency_ms": percentiles(latencies), "links_per_call": round(links / len(sample), 2),
+                              "batch_of_sample_ms": round(batch_s * 1000, 2)}
+
+    return {"corpus_sizes": results, "largest_corpus": results[str(max(args.corpus_sizes))]}
+
+_SCENARIOS = {"large": scenario_large, "small": scenario_small, "link": scenario_link}
+
+def run_child(scenario, args):
+    """Entry point inside the child interpreter: prints one JSON line on stdout."""
+    # Must be set before common.ingest creates its description cache
+    os.environ["IMAGE_CACHE_BACKEND"] = "none"
+    os.environ["UPLOAD_TO_S3"] = "true"
+    os.environ["S3_BUCKET_NAME"] = "benchmark-assets"
+    os.environ["VISION_BATCH_SIZE"] = str(args.vision_batch)
+    # 0 = no client-side limit, so the numbers measure the pipeline rather than the quota
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = str(args.llm_rpm or 10 ** 9)
+    from benchmarks.fakes import install_fakes, LocalS3
+    s3 = LocalS3(latency=args.s3_latency)
+    llm, embeddings = install_fakes(llm_latency=args.llm_latency, embed_latency=args.embed_latency, s3=s3)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        result = _SCENARIOS[scenario](args, workdir)
+    result["llm_calls"] = llm.calls
+    result["embedding_calls"] = embeddings.calls
+    result["s3_requests"] = s3.requests
+    result["peak_rss_mb"] = _peak_rss_mb()
+    print(json.dumps(result))
+
+
+# --- PARENT ---
+def run_scenario(scenario, argv, cwd):
+    proc = subprocess.run([sys.executable, "-m", "benchmarks.run", "--child", scenario] + argv,
+                          cwd=cwd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Scenario '{scenario}' failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def _lookup(report, dotted):
+    value = report.get("scenarios", {})
+    for part in dotted.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+def compare(report, baseline, max_regression):
+    """Returns a list of regressions beyond max_regression (fractional change)."""
+    failures = []
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        current, previous = _lookup(report, metric), _lookup(baseline, metric)
+        if not current or not previous:
+            continue
+        change = (previous - current) / previous if higher_is_better else (current - previous) / previous
+        print(f"  {metric:38} {previous:>10} -> {current:<10} ({'worse' if change > 0 else 'better'} by {abs(change):.0%})")
+        if change > max_regression:
+            failures.append(f"{metric}: {previous} -> {current}")
+    return failures
+
+def _git_commit(cwd):
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=cwd,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Offline ingestion pipeline benchmarks.")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per fake Gemini call")
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="Seconds per fake embedding call")
+    parser.add_argument("--s3-latency", type=float, default=0.02, help="Seconds per fake S3 request")
+    parser.add_argument("--vision-batch", type=int, default=10, help="Images per vision prompt (1 = one per image)")
+    parser.add_argument("--llm-rpm", type=float, default=0, help="Client-side Gemini requests/minute (0 = unlimited)")
+    parser.add_argument("--graph-latency", type=float, default=0.002, help="Seconds per graph round-trip")
+    parser.add_argument("--words", type=int, default=400, help="Words per page")
+    parser.add_argument("--images", type=int, default=1, help="Images per page")
+    parser.add_argument("--large-pages", type=int, default=200)
+    parser.add_argument("--small-docs", type=int, default=50)
+    parser.add_argument("--small-pages", type=int, default=3)
+    parser.add_argument("--corpus-sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--link-samples", type=int, default=20, help="Linker calls timed per corpus size")
+    parser.add_argument("--output", help="Report path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    return parser
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.child:
+        return run_child(args.child, args)
+
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # Children get the same knobs, minus the parent-only options
+    child_argv = list(sys.argv[1:])
+    for option in ("--scenarios", "--output", "--compare", "--max-regression"):
+        if option in child_argv:
+            i = child_argv.index(option)
+            end = i + 1
+            while end < len(child_argv) and not child_argv[end].startswith("--"):
+                end += 1
+            del child_argv[i:end]
+
+    report = {
+        "metadata": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": _git_commit(cwd),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("child", "output", "compare")},
+        },
+        "scenarios": {},
+    }
+    for scenario in args.scenarios:
+        print(f"▶ {scenario} ...", flush=True)
+        result = report["scenarios"][scenario] = run_scenario(scenario, child_argv, cwd)
+        print(json.dumps(result, indent=2))
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            failures = compare(report, json.load(f), args.max_regression)
+        for failure in failures:
+            print(f"❌ Regression: {failure}")
+        if failures:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
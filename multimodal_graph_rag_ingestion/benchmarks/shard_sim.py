@@ -0,0 +1,69 @@
+"""
+Local simulation of the sharded ingest flow (plan -> Map -> merge) with the
+offline stand-ins from benchmarks.fakes: no AWS, Gemini or Neo4j needed.
+
+Ingests the same synthetic PDF once through ingest_document and once through
+common.sharding.simulate, checks that both graphs hold the same chunks, and
+reports timings.
+
+Usage (from the multimodal_graph_rag_ingestion directory):
+    python -m benchmarks.shard_sim --pages 120 --shard-pages 25 --workers 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+def _chunk_view(gm, filename):
+    return {cid: (gm.chunks[cid]["chunk_index"], gm.chunks[cid]["page"], gm.chunks[cid]["text"])
+            for cid in gm.has_chunk.get(filename, set())}
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate sharded ingestion locally and compare with a single pass.")
+    parser.add_argument("--pages", type=int, default=120)
+    parser.add_argument("--shard-pages", type=int, default=25)
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent shards (the Map state's MaxConcurrency)")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    os.environ["IMAGE_CACHE_BACKEND"] = "none"
+    # Chunks end at shard boundaries, as they do in a single pass with matching break pages
+    os.environ["CHUNK_BREAK_PAGES"] = str(args.shard_pages)
+    from benchmarks.fakes import install_fakes, LocalGraph
+    from benchmarks.synthetic import generate_pdf
+    install_fakes(llm_latency=args.llm_latency, embed_latency=args.embed_latency)
+    from common.pipeline import ingest_document
+    from common.sharding import simulate
+
+    with tempfile.TemporaryDirectory() as workdir:
+        pdf_path = generate_pdf(os.path.join(workdir, "big.pdf"), pages=args.pages)
+
+        single = LocalGraph()
+        t0 = time.perf_counter()
+        ingest_document(pdf_path, "big.pdf", single, mode="full")
+        single_s = time.perf_counter() - t0
+
+        sharded = LocalGraph()
+        t0 = time.perf_counter()
+        stats = simulate(pdf_path, "big.pdf", sharded, os.path.join(workdir, "shards"),
+                         shard_pages=args.shard_pages, max_workers=args.workers, mode="full")
+        sharded_s = time.perf_counter() - t0
+        leftovers = [f for _, _, files in os.walk(os.path.join(workdir, "shards")) for f in files]
+
+    same_chunks = _chunk_view(single, "big.pdf") == _chunk_view(sharded, "big.pdf")
+    same_metadata = single.documents["big.pdf"]["summary"] == sharded.documents["big.pdf"]["summary"]
+    report = {
+        "pages": args.pages, "shards": stats["shards"], "chunks": stats["chunks"],
+        "single_pass_s": round(single_s, 3), "sharded_s": round(sharded_s, 3),
+        "same_chunks": same_chunks, "same_metadata": same_metadata, "leftover_shard_files": len(leftovers),
+    }
+    print(json.dumps(report, indent=2))
+    if not (same_chunks and same_metadata) or leftovers:
+        print("❌ Sharded ingest diverged from the single-pass result")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Cold-start benchmark for the Lambda handlers.
+
+Each run starts a fresh interpreter (like a cold Lambda container) and reports:
+1. Import time of the handler module, plus its slowest transitive imports (-X importtime).
+2. First-invocation latency of handler(event, None).
+
+Default events run each handler's full path against local stand-ins
+(GRAPH_BACKEND=local, benchmarks.fakes for Gemini/embeddings and LocalS3
+holding a small synthetic PDF): the ingest worker downloads, extracts,
+describes, chunks, embeds and writes it, and the link worker links it in a
+graph snapshot. So the first invocation pays for the lazy imports (fitz, the
+pipeline) and client setup, as on Lambda. The fakes are installed after the
+handler import and timed separately (setup); they preload NumPy.
+A handler returning status=error fails the run.
+
+Pass --event-dir with <handler_module>.json files and --live to time first
+invocations against the configured Neo4j/S3/Gemini instead.
+
+Usage (from the multimodal_graph_rag_ingestion directory):
+    python -m benchmarks.startup --runs 5 --output startup.json
+    python -m benchmarks.startup --baseline startup.json --max-regression 0.2
+    python -m benchmarks.startup --live --event-dir events/
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+HANDLERS = ["common.link_worker", "common.ingest_worker"]
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BUCKET = "startup-bench"
+KEY = "docs/startup.pdf"
+DEFAULT_EVENTS = {
+    "common.link_worker": {"Records": [{"messageId": "m1", "body": json.dumps({"filename": os.path.basename(KEY)})}]},
+    "common.ingest_worker": {"detail-type": "Object Created",
+                             "detail": {"bucket": {"name": BUCKET}, "object": {"key": KEY}}},
+}
+
+# Runs inside the child interpreter; prints one JSON line on stdout (after the handler's EMF lines)
+_CHILD = """
+import sys, json, time, importlib
+fixture = json.loads(sys.argv[3])
+t0 = time.perf_counter()
+module = importlib.import_module(sys.argv[1])
+t1 = time.perf_counter()
+if fixture:
+    from benchmarks.startup import install_stand_ins
+    install_stand_ins(fixture)
+t2 = time.perf_counter()
+result = module.handler(json.loads(sys.argv[2]), None)
+t3 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "setup_s": t2 - t1, "first_invoke_s": t3 - t2,
+                  "status": (result or {}).get("status")}))
+"""
+
+def install_stand_ins(fixture):
+    """In the child: fake Gemini/embeddings, and a LocalS3 holding the fixture PDF."""
+    from benchmarks.fakes import LocalS3, install_fakes
+    s3 = LocalS3()
+    with open(fixture["pdf"], "rb") as f:
+        s3.put_object(Bucket=BUCKET, Key=KEY, Body=f.read())
+    install_fakes(s3=s3)
+
+def prepare_fixture(workdir, pages=10):
+    """
+    Synthetic PDF for the ingest event, plus a local graph snapshot that already
+    holds it (written by one untimed ingest_worker run) for the link event.
+    """
+    from benchmarks.synthetic import generate_pdf
+    fixture = {"pdf": generate_pdf(os.path.join(workdir, "startup.pdf"), pages=pages),
+               "graph": os.path.join(workdir, "graph")}
+    run_once("common.ingest_worker", DEFAULT_EVENTS["common.ingest_worker"], fixture, workdir, snapshot=True)
+    return fixture
+
+def _child_env(fixture, workdir, handler, snapshot):
+    env = dict(os.environ)
+    if fixture:
+        env.update({
+            "GRAPH_BACKEND": "local",
+            # The link worker loads the snapshot on its first invocation, like opening the Neo4j pool
+            "LOCAL_GRAPH_PATH": fixture["graph"] if snapshot or handler == "common.link_worker" else "",
+            "CHECKPOINT_BACKEND": "none",
+            "UPLOAD_TO_S3": "false",
+            # A fresh description cache per run, so every run describes every image
+            "IMAGE_CACHE_BACKEND": "sqlite",
+            "IMAGE_CACHE_PATH": os.path.join(workdir, f"cache-{os.urandom(4).hex()}.sqlite3"),
+        })
+    return env
+
+def _parse_importtime(stderr, top):
+    """Returns the `top` slowest imports (cumulative microseconds) from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        # Skip the header line ("self [us] | cumulative | imported package")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        rows.append((int(parts[1]), parts[2].strip()))
+    rows.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": us / 1000} for us, name in rows[:top]]
+
+def run_once(handler, event, fixture, workdir, snapshot=False):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD, handler, json.dumps(event), json.dumps(fixture)],
+        cwd=_ROOT, capture_output=True, text=True, env=_child_env(fixture, workdir, handler, snapshot)
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{handler} failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["slowest_imports"] = _parse_importtime(proc.stderr, top=10)
+    return result
+
+def benchmark(handlers, runs, events, fixture, workdir):
+    report = {}
+    for handler in handlers:
+        samples = [run_once(handler, events.get(handler, {}), fixture, workdir) for _ in range(runs)]
+        report[handler] = {
+            "runs": runs,
+            "import_ms_median": statistics.median(s["import_s"] for s in samples) * 1000,
+            "import_ms_max": max(s["import_s"] for s in samples) * 1000,
+            "setup_ms_median": statistics.median(s["setup_s"] for s in samples) * 1000,
+            "first_invoke_ms_median": statistics.median(s["first_invoke_s"] for s in samples) * 1000,
+            "status": samples[-1]["status"],
+            "errors": sum(1 for s in samples if s["status"] == "error"),
+            "slowest_imports": samples[-1]["slowest_imports"],
+        }
+    return report
+
+def compare(report, baseline, max_regression):
+    """Returns a list of regressions beyond max_regression (fractional increase)."""
+    failures = []
+    for handler, current in report.items():
+        previous = baseline.get(handler)
+        if not previous:
+            continue
+        for metric in ("import_ms_median", "first_invoke_ms_median"):
+            if previous[metric] > 0 and current[metric] > previous[metric] * (1 + max_regression):
+                failures.append(f"{handler} {metric}: {previous[metric]:.1f} ms -> {current[metric]:.1f} ms")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure handler import time and first-invocation latency.")
+    parser.add_argument("--handlers", nargs="+", default=HANDLERS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--event-dir", help="Directory with <handler_module>.json events")
+    parser.add_argument("--live", action="store_true",
+                        help="Use the configured Neo4j/S3/Gemini instead of the local stand-ins")
+    parser.add_argument("--pages", type=int, default=10, help="Pages of the synthetic fixture PDF")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Previous JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    events = dict(DEFAULT_EVENTS)
+    if args.event_dir:
+        for handler in args.handlers:
+            path = os.path.join(args.event_dir, f"{handler}.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    events[handler] = json.load(f)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        fixture = None if args.live else prepare_fixture(workdir, pages=args.pages)
+        report = benchmark(args.handlers, args.runs, events, fixture, workdir)
+
+    for handler, r in report.items():
+        print(f"{handler:28} import {r['import_ms_median']:8.1f} ms (max {r['import_ms_max']:.1f})"
+              f"   first invoke {r['first_invoke_ms_median']:8.1f} ms   status={r['status']}")
+        for imp in r["slowest_imports"][:5]:
+            print(f"    {imp['cumulative_ms']:8.1f} ms  {imp['module']}")
+
+    # An early error return skips the lazy imports and client setup this benchmark is about
+    errors = [handler for handler, r in report.items() if r["errors"]]
+    for handler in errors:
+        print(f"❌ {handler} returned status=error in {report[handler]['errors']}/{report[handler]['runs']} runs; "
+              f"its first-invoke time does not cover the full path")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(report, json.load(f), args.max_regression)
+        for failure in failures:
+            print(f"❌ Cold-start regression: {failure}")
+        if failures:
+            sys.exit(1)
+    if errors:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Synthetic PDF generator for offline benchmarks.
+
+    python -m benchmarks.synthetic out.pdf --pages 200 --words 400 --images 2
+"""
+import random
+import argparse
+
+_VOCABULARY = (
+    "pump valve pressure flange gasket torque assembly inspection audit report quarterly "
+    "revenue schematic diagram circuit voltage current sensor calibration procedure safety "
+    "maintenance interval compliance standard specification tolerance bearing shaft motor "
+    "controller firmware network topology latency throughput capacity storage backup policy"
+).split()
+
+
+def _make_image(width, height, rng):
+    """A PNG with a few coloured bands (compressible, but not trivially so)."""
+    import fitz
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, height), False)
+    band = max(1, height // 4)
+    for y in range(0, height, band):
+        pix.set_rect(fitz.IRect(0, y, width, min(height, y + band)),
+                     (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    return pix.tobytes("png")
+
+def _paragraph(words, rng):
+    return " ".join(rng.choice(_VOCABULARY) for _ in range(words))
+
+def generate_pdf(path, pages=10, words_per_page=400, images_per_page=1, image_size=(320, 240),
+                 distinct_images=8, seed=0):
+    """
+    Writes a PDF with `pages` pages of random technical-sounding text and
+    `images_per_page` images each. Images are drawn from a pool of
+    `distinct_images`, so repeated logos/diagrams are represented (0 = all unique).
+    Returns the path.
+    """
+    import fitz
+    rng = random.Random(seed)
+    pool = [_make_image(*image_size, rng) for _ in range(distinct_images)]
+
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        text_height = page.rect.height * (0.55 if images_per_page else 0.9)
+        text_rect = fitz.Rect(36, 36, page.rect.width - 36, 36 + text_height)
+        page.insert_textbox(text_rect, f"Section {page_num + 1}. " + _paragraph(words_per_page, rng), fontsize=7)
+
+        slot_width = (page.rect.width - 72) / max(images_per_page, 1)
+        for i in range(images_per_page):
+            image = rng.choice(pool) if pool else _make_image(*image_size, rng)
+            x0 = 36 + i * slot_width
+            page.insert_image(fitz.Rect(x0, 48 + text_height, x0 + slot_width - 6, page.rect.height - 36), stream=image)
+
+    doc.save(path, deflate=True)
+    doc.close()
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic PDF for benchmarks.")
+    parser.add_argument("path")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--words", type=int, default=400, help="Words per page")
+    parser.add_argument("--images", type=int, default=1, help="Images per page")
+    parser.add_argument("--distinct-images", type=int, default=8, help="Image pool size (0 = all unique)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate_pdf(args.path, pages=args.pages, words_per_page=args.words, images_per_page=args.images,
+                 distinct_images=args.distinct_images, seed=args.seed)
+    print(args.path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Asynchronous asset uploads for the ingest pipeline.
+
+1. Uploads run on a background thread pool over the pooled S3 client, so they
+   overlap with extraction and the vision calls of the same page batch.
+2. Keys are content addressed (assets/<document>/<sha256>.<ext>); an object that
+   already exists is not uploaded again (HEAD instead of PUT).
+3. Assets smaller than ASSET_ARCHIVE_THRESHOLD are collected and written as one
+   zip per batch; their URI points into it (s3://bucket/key.zip#<member>).
+
+Works against any S3-compatible endpoint (S3_ENDPOINT_URL, e.g. MinIO or moto)
+or an injected client.
+"""
+import io
+import os
+import zipfile
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from common.tracing import span, count, add_bytes
+from common.image_prep import mime_type
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+ASSET_UPLOAD_CONCURRENCY = int(os.getenv("ASSET_UPLOAD_CONCURRENCY", "16"))
+# Assets below this size (bytes) are bundled into one zip per batch; 0 disables bundling
+ASSET_ARCHIVE_THRESHOLD = int(os.getenv("ASSET_ARCHIVE_THRESHOLD", "0"))
+ASSET_PREFIX = "assets"
+# How long a key confirmed to exist is trusted without a HEAD. Kept well below the
+# GC grace period, so assets of a deleted document are never assumed to still exist.
+ASSET_KNOWN_TTL_SECONDS = int(os.getenv("ASSET_KNOWN_TTL_SECONDS", "300"))
+
+# Keys known to exist -> when that was confirmed, shared across warm invocations
+_known_keys = {}
+_known_lock = threading.Lock()
+
+
+def _is_missing(error):
+    code = getattr(error, "response", {}).get("Error", {}).get("Code")
+    return code in ("404", "NoSuchKey", "NotFound")
+
+def asset_prefix(filename_base):
+    return f"{ASSET_PREFIX}/{filename_base}/"
+
+def asset_key(filename_base, data, ext):
+    return f"{asset_prefix(filename_base)}{hashlib.sha256(data).hexdigest()}.{ext}"
+
+def delete_assets(bucket, filename_base, client=None):
+    """
+    Removes every asset of a document (assets/<filename_base>/) with bulk
+    delete_objects calls, 1000 keys each. Returns the number of keys deleted.
+    """
+    if client is None:
+        from common.resources import get_s3_client
+        client = get_s3_client()
+    prefix = asset_prefix(filename_base)
+    keys = []
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        keys.extend(o["Key"] for o in page.get("Contents", []))
+
+    for i in range(0, len(keys), 1000):
+        client.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": key} for key in keys[i:i + 1000]], "Quiet": True}
+        )
+    with _known_lock:
+        for key in keys:
+            _known_keys.pop(key, None)
+    count("assets_deleted", len(keys))
+    if keys:
+        logger.info(f"🧹 Deleted {len(keys)} assets under s3://{bucket}/{prefix}")
+    return len(keys)
+
+
+class AssetRef:
+    """Handle for a submitted asset; uri is set once the upload (or its archive) is done."""
+    def __init__(self):
+        self.uri = None
+        self.error = None
+
+
+class AssetUploader:
+    """
+    Per-document uploader. submit() returns immediately; flush() waits for
+    everything submitted so far (and writes the pending archive), after which
+    every AssetRef has its uri or error.
+    """
+    def __init__(self, bucket, filename_base, client=None, max_workers=ASSET_UPLOAD_CONCURRENCY,
+                 archive_threshold=ASSET_ARCHIVE_THRESHOLD):
+        if not bucket:
+            raise ValueError("Asset uploads require S3_BUCKET_NAME")
+        if client is None:
+            from common.resources import get_s3_client
+            client = get_s3_client()
+        self.bucket = bucket
+        self.filename_base = filename_base
+        self.client = client
+        self.archive_threshold = archive_threshold
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="asset-upload")
+        self._futures = []
+        self._small = []  # (ref, member_name, data)
+
+    def _exists(self, key):
+        with _known_lock:
+            if time.monotonic() - _known_keys.get(key, float("-inf")) < ASSET_KNOWN_TTL_SECONDS:
+                return True
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except Exception as e:
+            if _is_missing(e):
+                return False
+            raise
+        with _known_lock:
+            _known_keys[key] = time.monotonic()
+        return True
+
+    def _put(self, key, data, content_type):
+        if self._exists(key):
+            count("assets_existing")
+            return
+        with span("save_image"):
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type)
+        count("assets_uploaded")
+        add_bytes("uploaded", len(data))
+        with _known_lock:
+            _known_keys[key] = time.monotonic()
+
+    def _upload(self, ref, key, data, content_type):
+        try:
+            self._put(key, data, content_type)
+            ref.uri = f"s3://{self.bucket}/{key}"
+        except Exception as e:
+            ref.error = e
+            logger.warning(f"⚠️ Asset upload failed for {key}: {e}")
+
+    def submit(self, data, ext):
+        ref = AssetRef()
+        key = asset_key(self.filename_base, data, ext)
+        if len(data) < self.archive_threshold:
+            self._small.append((ref, key.rsplit("/", 1)[1], data))
+        else:
+            self._futures.append(self._pool.submit(self._upload, ref, key, data, mime_type(ext)))
+        return ref
+
+    def _write_archive(self):
+        small, self._small = self._small, []
+        members = {}
+        for _, name, data in small:
+            members.setdefault(name, data)
+
+        # Content-addressed by its member names (which are content hashes themselves)
+        digest = hashlib.sha256("\n".join(sorted(members)).encode("ascii")).hexdigest()
+        key = f"{ASSET_PREFIX}/{self.filename_base}/bundle-{digest}.zip"
+        buffer = io.BytesIO()
+        # Images are already compressed
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+            for name in sorted(members):
+                archive.writestr(name, members[name])
+
+        ref = AssetRef()
+        self._upload(ref, key, buffer.getvalue(), "application/zip")
+        count("asset_archives")
+        for member_ref, name, _ in small:
+            member_ref.uri = f"{ref.uri}#{name}" if ref.uri else None
+            member_ref.error = ref.error
+
+    def flush(self):
+        if self._small:
+            self._futures.append(self._pool.submit(self._write_archive))
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._pool.shutdown(wait=True)
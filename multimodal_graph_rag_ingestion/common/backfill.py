@@ -0,0 +1,229 @@
+"""
+Bulk backfill runner: ingests every PDF under a local directory or S3 prefix.
+
+    python -m common.backfill ./archive --workers 8
+    python -m common.backfill s3://my-bucket/archive/ --workers 8 --progress backfill.jsonl
+
+1. Extraction, vision and chunking (process_pdf / chunk_content) run in a process pool.
+2. Embedding and graph writes run in the parent on a shared, bounded thread pool.
+3. Written documents are coalesced in an InMemoryLinkQueue and linked in batches.
+4. Every finished document is appended to a JSON-lines progress file; re-running
+   with the same file skips documents already marked done.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROGRESS_FILE = "backfill_progress.jsonl"
+
+
+def list_sources(location):
+    """
+    Yields (source, filename) for every PDF under a directory or s3://bucket/prefix.
+    """
+    if location.startswith("s3://"):
+        from common.resources import get_s3_client
+        bucket, _, prefix = location[len("s3://"):].partition("/")
+        paginator = get_s3_client().get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if obj["Key"].lower().endswith(".pdf"):
+                    yield f"s3://{bucket}/{obj['Key']}", os.path.basename(obj["Key"])
+        return
+
+    for root, _, files in os.walk(location):
+        for name in sorted(files):
+            if name.lower().endswith(".pdf"):
+                yield os.path.join(root, name), name
+
+
+class ProgressTracker:
+    """
+    Append-only JSON-lines log of finished documents, safe to share between threads.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from an interrupted run
+                    if record.get("status") == "done":
+                        self.done.add(record["source"])
+
+    def record(self, **entry):
+        with self._lock, open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+
+
+def _init_worker(vision_concurrency):
+    # Split the global vision budget across processes
+    import common.ingest
+    import common.extract
+    common.ingest.VISION_CONCURRENCY = vision_concurrency
+    # Documents are already spread over the pool, so don't shard pages on top of that
+    common.extract.EXTRACT_WORKERS = 1
+    logging.basicConfig(level=logging.WARNING)
+
+def _extract(source, filename):
+    """
+    Process-pool task: extraction, vision and chunking for one document.
+    Returns plain data so it pickles back to the parent.
+    """
+    import fitz
+    from common.ingest import process_pdf, chunk_content
+
+    tmp_path = None
+    if source.startswith("s3://"):
+        from common.resources import get_s3_client
+        bucket, _, key = source[len("s3://"):].partition("/")
+        fd, tmp_path = tempfile.mkstemp(suffix=".pdf")
+        os.close(fd)
+        get_s3_client().download_file(bucket, key, tmp_path)
+
+    local_path = tmp_path or source
+    try:
+        with fitz.open(local_path) as doc:
+            pages = doc.page_count
+        content_blocks, summary, needs, explicit = process_pdf(local_path)
+        for block in content_blocks:
+            block["source"] = source
+        chunks = chunk_content(content_blocks)
+        return {"source": source, "filename": filename, "pages": pages, "chunks": chunks,
+                "summary": summary, "needs": needs, "explicit": explicit}
+    finally:
+        if tmp_path:
+            os.remove(tmp_path)
+
+def _store(result):
+    """
+    Thread-pool task: Kill & Fill write of one extracted document (idempotent on re-run).
+    """
+    import hashlib
+    from common.graph_store import get_graph_store
+    from common.loader import store_in_graph, assign_chunk_ids
+    from common.pipeline import write_document_node
+
+    gm = get_graph_store()
+    filename, chunks = result["filename"], result["chunks"]
+    gm.delete_document_data(filename)
+    gm.touch_document(filename)
+    assign_chunk_ids(chunks, filename, {})
+    store_in_graph(chunks, filename, gm=gm)
+
+    doc_hasher = hashlib.sha256()
+    for chunk_data in chunks:
+        doc_hasher.update(chunk_data["metadata"]["content_hash"].encode("ascii"))
+    write_document_node(gm, filename, result["summary"], result["needs"], result["explicit"],
+                        content_hash=doc_hasher.hexdigest())
+
+
+def run_backfill(location, workers=None, vision_concurrency=32, write_workers=4,
+                 progress_path=DEFAULT_PROGRESS_FILE):
+    """
+    Ingests every PDF under `location` and returns a throughput report.
+    """
+    workers = workers or os.cpu_count() or 1
+    tracker = ProgressTracker(progress_path)
+    pending_sources = [(s, f) for s, f in list_sources(location) if s not in tracker.done]
+    logger.info(f"📦 Backfill: {len(pending_sources)} documents to ingest ({len(tracker.done)} already done)")
+
+    from common.graph_store import get_graph_store
+    from common.link_queue import InMemoryLinkQueue, drain_and_link
+    link_queue = InMemoryLinkQueue()
+    gm = get_graph_store()
+
+    report = {"documents": 0, "pages": 0, "chunks": 0, "failed": 0, "skipped": len(tracker.done)}
+    started = time.perf_counter()
+    # Keep a bounded number of extracted documents in flight to cap parent memory
+    max_in_flight = workers * 2
+    ctx = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(max(1, vision_concurrency // workers),)) as extract_pool, \
+         ThreadPoolExecutor(max_workers=write_workers) as write_pool:
+        queue = iter(pending_sources)
+        extracting, writing = {}, {}
+
+        def _submit_next():
+            for source, filename in queue:
+                extracting[extract_pool.submit(_extract, source, filename)] = source
+                return
+
+        for _ in range(max_in_flight):
+            _submit_next()
+
+        while extracting or writing:
+            done, _ = wait(list(extracting) + list(writing), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in extracting:
+                    source = extracting.pop(future)
+                    try:
+                        result = future.result()
+                        writing[write_pool.submit(_store, result)] = result
+                    except Exception as e:
+                        logger.error(f"❌ Extraction failed for {source}: {e}")
+                        report["failed"] += 1
+                        tracker.record(source=source, status="failed", error=str(e))
+                        _submit_next()
+                else:
+                    result = writing.pop(future)
+                    try:
+                        future.result()
+                        report["documents"] += 1
+                        report["pages"] += result["pages"]
+                        report["chunks"] += len(result["chunks"])
+                        tracker.record(source=result["source"], status="done",
+                                       pages=result["pages"], chunks=len(result["chunks"]))
+                        link_queue.enqueue(result["filename"])
+                    except Exception as e:
+                        logger.error(f"❌ Graph write failed for {result['source']}: {e}")
+                        report["failed"] += 1
+                        tracker.record(source=result["source"], status="failed", error=str(e))
+                    _submit_next()
+            drain_and_link(link_queue, gm)
+
+    # Link whatever is still waiting for its window
+    while len(link_queue):
+        drain_and_link(link_queue, gm, force=True)
+    # Persists the snapshot when running against the local backend
+    gm.close()
+
+    elapsed = time.perf_counter() - started
+    report["elapsed_s"] = round(elapsed, 2)
+    report["docs_per_sec"] = round(report["documents"] / elapsed, 3) if elapsed else 0.0
+    report["pages_per_sec"] = round(report["pages"] / elapsed, 3) if elapsed else 0.0
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill a directory or S3 prefix of PDFs into the graph.")
+    parser.add_argument("location", help="Local directory or s3://bucket/prefix")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction processes (default: CPU count)")
+    parser.add_argument("--vision-concurrency", type=int, default=32, help="Total in-flight vision calls")
+    parser.add_argument("--write-workers", type=int, default=4, help="Concurrent embedding/graph writers")
+    parser.add_argument("--progress", default=DEFAULT_PROGRESS_FILE, help="Resumable progress file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    report = run_backfill(args.location, workers=args.workers, vision_concurrency=args.vision_concurrency,
+                          write_workers=args.write_workers, progress_path=args.progress)
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Checkpoints for resumable ingestion.
+
+After each page batch is written to the graph, ingest_document commits one
+segment: the page range, the ids/content hashes of the chunks it wrote, the
+bounded metadata text sample so far and the chunker's carried-over text (see
+StreamingChunker.state). When the IngestWorker is retried after a timeout or
+crash, those pages are not extracted, described or embedded again: the ingest
+picks up the last segment's sample and carry-over and continues from the last
+committed page. Only page ranges and chunk ids/hashes of earlier segments are
+kept in memory, so memory stays flat as page count grows.
+
+Checkpoints are keyed by file name and PDF content hash, so a new version of
+the file never resumes from an old run. They are cleared once the Document
+node is written.
+"""
+import os
+import gzip
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+# Backend: "local" (disk, default), "s3" (survives a retry on another container) or "none"
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "local").lower()
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "/tmp/ingest_checkpoints")
+CHECKPOINT_BUCKET = os.getenv("CHECKPOINT_BUCKET", os.getenv("S3_BUCKET_NAME"))
+CHECKPOINT_PREFIX = os.getenv("CHECKPOINT_PREFIX", "checkpoints/")
+
+
+def checkpoint_key(pdf_path, filename):
+    """<filename>/<sha256 of the PDF>"""
+    hasher = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(block)
+    return f"{filename}/{hasher.hexdigest()}"
+
+
+class CheckpointStore:
+    """
+    Storage interface: an append-only list of segments per checkpoint key.
+    """
+    def put(self, key, seq, data):
+        raise NotImplementedError
+
+    def list(self, key):
+        """Yields the encoded segments of `key`, one at a time, in commit order."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class LocalCheckpointStore(CheckpointStore):
+    """
+    Files under CHECKPOINT_PATH. On Lambda this only helps a retry that lands
+    on the same warm container; use the S3 store in production.
+    """
+    def __init__(self, root=CHECKPOINT_PATH):
+        self.root = root
+
+    def put(self, key, seq, data):
+        directory = os.path.join(self.root, key)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{seq:06d}.json.gz")
+        # Write-then-rename, so a crash never leaves a torn segment behind
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def list(self, key):
+        directory = os.path.join(self.root, key)
+        if not os.path.isdir(directory):
+            return
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".json.gz"):
+                with open(os.path.join(directory, name), "rb") as f:
+                    yield f.read()
+
+    def delete(self, key):
+        directory = os.path.join(self.root, key)
+        if not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+class S3CheckpointStore(CheckpointStore):
+    """
+    One object per segment under CHECKPOINT_PREFIX in the document bucket
+    (outside the .pdf event filter; a lifecycle rule expires abandoned runs).
+    """
+    def __init__(self, bucket=CHECKPOINT_BUCKET, prefix=CHECKPOINT_PREFIX, client=None):
+        if not bucket:
+            raise ValueError("S3 checkpoint store requires CHECKPOINT_BUCKET or S3_BUCKET_NAME")
+        from common.resources import get_s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client or get_s3_client()
+
+    def _keys(self, key):
+        keys = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}{key}/"):
+            keys.extend(o["Key"] for o in page.get("Contents", []))
+        return sorted(keys)
+
+    def put(self, key, seq, data):
+        self.client.put_object(Bucket=self.bucket, Key=f"{self.prefix}{key}/{seq:06d}.json.gz",
+                               Body=data, ContentType="application/gzip")
+
+    def list(self, key):
+        for k in self._keys(key):
+            yield self.client.get_object(Bucket=self.bucket, Key=k)["Body"].read()
+
+    def delete(self, key):
+        keys = self._keys(key)
+        for i in range(0, len(keys), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": k} for k in keys[i:i + 1000]], "Quiet": True}
+            )
+
+
+class Checkpoint:
+    """
+    Progress of one document ingest.
+    segments: committed segments, each
+        {"start_page", "end_page" (0-based, end exclusive), "chunk_ids": [...], "content_hashes": [...]}
+    resume_state: {"sample", "carry"} of the last segment (None before the first commit)
+    """
+    _KEPT = ("start_page", "end_page", "chunk_ids", "content_hashes")
+
+    def __init__(self, store, key):
+        self.store = store
+        self.key = key
+        self.segments = []
+        self.resume_state = None
+        # Segments are decoded one at a time; only the last one's sample and carry-over are kept
+        for data in store.list(key):
+            segment = json.loads(gzip.decompress(data))
+            if "carry" not in segment:
+                logger.warning(f"Dropping checkpoint {key} in an older format; ingesting from the first page")
+                self.clear()
+                break
+            self.segments.append({name: segment[name] for name in self._KEPT})
+            self.resume_state = {"sample": segment["sample"], "carry": segment["carry"]}
+
+    @property
+    def next_page(self):
+        """0-based page the ingest continues from."""
+        return self.segments[-1]["end_page"] if self.segments else 0
+
+    def progress(self):
+        """DocumentWriter resume state covering every committed segment."""
+        chunk_ids, content_hashes = [], []
+        for segment in self.segments:
+            chunk_ids.extend(segment["chunk_ids"])
+            content_hashes.extend(segment["content_hashes"])
+        return {"chunk_ids": chunk_ids, "content_hashes": content_hashes}
+
+    def commit(self, start_page, end_page, chunks, sample, carry):
+        """
+        Records a batch whose chunks are in the graph, with the text sample so far
+        and the chunker state (StreamingChunker.state()) after it.
+        """
+        segment = {
+            "start_page": start_page,
+            "end_page": end_page,
+            "chunk_ids": [c["id"] for c in chunks],
+            "content_hashes": [c["metadata"]["content_hash"] for c in chunks],
+        }
+        encoded = json.dumps({**segment, "sample": sample, "carry": carry}).encode("utf-8")
+        self.store.put(self.key, len(self.segments), gzip.compress(encoded))
+        self.segments.append(segment)
+        self.resume_state = {"sample": sample, "carry": carry}
+
+    def clear(self):
+        try:
+            self.store.delete(self.key)
+        except Exception as e:
+            # Leftovers only cost storage (and expire via the lifecycle rule)
+            logger.warning(f"Could not clear checkpoint {self.key}: {e}")
+        self.segments = []
+        self.resume_state = None
+
+
+def get_checkpoint_store():
+    """Store built from env config, or None when CHECKPOINT_BACKEND=none."""
+    if CHECKPOINT_BACKEND == "none":
+        return None
+    return S3CheckpointStore() if CHECKPOINT_BACKEND == "s3" else LocalCheckpointStore()
+
+def open_checkpoint(pdf_path, filename, store=None):
+    """Checkpoint for this exact file, with whatever an earlier attempt committed (None if disabled)."""
+    store = store or get_checkpoint_store()
+    if store is None:
+        return None
+    checkpoint = Checkpoint(store, checkpoint_key(pdf_path, filename))
+    if checkpoint.segments:
+        logger.info(f"⏯️ Resuming {filename} from page {checkpoint.next_page + 1} "
+                    f"({len(checkpoint.segments)} committed batches)")
+    return checkpoint
@@ -0,0 +1,187 @@
+"""
+Streaming chunker: page text is treated as one continuous stream, so chunks
+run across page boundaries (with their overlap) instead of every page ending
+in a small fragment chunk that costs an embedding call of its own.
+
+    chunker = StreamingChunker()
+    for blocks in iter_page_batches(pdf_path):
+        for chunk in chunker.feed(blocks):    # complete chunks only
+            ...
+    for chunk in chunker.flush():             # the rest of the document
+        ...
+
+Chunk boundaries are found with str.rfind/regex scans on offsets into a small
+pending buffer (the overlap tail plus the pages not yet chunked); the only
+strings built are the chunk texts themselves. Boundaries only depend on the
+text, never on how it was split into batches, so a resumed or sharded ingest
+produces the same chunks (and chunk ids) as a single pass.
+
+Each chunk is {"text", "metadata": {"source", "page", "page_end"}}: the pages
+its first and last character come from. Image descriptions are chunked on
+their own and never merged with page text.
+"""
+import os
+import re
+import bisect
+
+# --- CONFIGURATION ---
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "150"))
+# "chars", or "tokens": words and punctuation marks (TOKEN_PATTERN), a cheap
+# local stand-in for model tokens that runs on offsets like the char mode
+CHUNK_UNIT = os.getenv("CHUNK_UNIT", "chars").lower()
+# Chunks never straddle a multiple of this many pages (0 = never break). Same
+# default as SHARD_PAGES, so shard boundaries fall on chunk boundaries.
+CHUNK_BREAK_PAGES = int(os.getenv("CHUNK_BREAK_PAGES", os.getenv("SHARD_PAGES", "150")))
+
+PAGE_SEPARATOR = "\n\n"
+# Preferred split points, best first (searched in the second half of the window)
+SEPARATORS = ("\n\n", "\n", ". ", " ")
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SPACE = re.compile(r"\s")
+_NON_SPACE = re.compile(r"\S")
+
+
+class StreamingChunker:
+    def __init__(self, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP, unit=CHUNK_UNIT, break_pages=CHUNK_BREAK_PAGES):
+        if unit not in ("chars", "tokens"):
+            raise ValueError(f"Unknown chunk unit '{unit}' (expected 'chars' or 'tokens')")
+        if not 0 <= overlap < size // 2:
+            raise ValueError(f"Chunk overlap must be less than half the chunk size ({overlap} >= {size // 2})")
+        self.size = size
+        self.overlap = overlap
+        self.unit = unit
+        self.break_pages = break_pages
+        self._text = ""  # pending text: overlap tail of the last chunk + pages not chunked yet
+        self._start = 0  # offset of the next chunk in _text
+        self._offsets = []  # where each page's text begins in _text ...
+        self._pages = []  # ... and its page number
+        self._source = None
+        self._section = None
+        # `size` tokens (possessive, so words are never split) followed by another token
+        self._window = re.compile(r"(?:\s*+(?:\w++|[^\w\s])){%d}(?=\s*\S)" % size)
+
+    def feed(self, blocks):
+        """Yields the chunks of `blocks` (in page order) that are complete; the rest waits for more text."""
+        for block in blocks:
+            if block["type"] == "image_error" or not (block.get("content") or "").strip():
+                continue
+            if block["type"] != "text":
+                yield from self._standalone(block)
+                continue
+            # Pages are 1-based, shard ranges 0-based: pages 1..N are section 0
+            section = (block["page"] - 1) // self.break_pages if self.break_pages else 0
+            if section != self._section:
+                yield from self.flush()
+                self._section = section
+            self._append(block["content"], block["page"], block["source"])
+            yield from self._cut(final=False)
+
+    def flush(self):
+        """Yields the buffered text as final chunks and resets the buffer."""
+        yield from self._cut(final=True)
+        self._text, self._start, self._offsets, self._pages = "", 0, [], []
+
+    def state(self):
+        """
+        The text carried over to the next feed (JSON-serializable, about one
+        chunk + one page), e.g. for a checkpoint. from_state() continues from it.
+        """
+        self._compact()
+        return {"text": self._text, "offsets": self._offsets, "pages": self._pages,
+                "source": self._source, "section": self._section}
+
+    @classmethod
+    def from_state(cls, state, **kwargs):
+        chunker = cls(**kwargs)
+        chunker._text = state["text"]
+        chunker._offsets = list(state["offsets"])
+        chunker._pages = list(state["pages"])
+        chunker._source = state["source"]
+        chunker._section = state["section"]
+        return chunker
+
+    # --- Buffer ---
+    def _compact(self):
+        # Drop what every future chunk starts after, so the buffer stays about one chunk + one page
+        if self._start:
+            cut = self._start
+            keep = max(bisect.bisect_right(self._offsets, cut) - 1, 0)
+            self._text = self._text[cut:]
+            self._offsets = [max(offset - cut, 0) for offset in self._offsets[keep:]]
+            self._pages = self._pages[keep:]
+            self._start = 0
+
+    def _append(self, text, page, source):
+        # 1. Drop the text that is already chunked
+        self._compact()
+        # 2. Pages are joined like paragraphs, which makes a page end a good (not a forced) split point
+        if self._text:
+            self._text += PAGE_SEPARATOR
+        self._offsets.append(len(self._text))
+        self._pages.append(page)
+        self._text += text
+        self._source = source
+
+    def _page_at(self, offset):
+        return self._pages[max(bisect.bisect_right(self._offsets, offset) - 1, 0)]
+
+    # --- Boundaries ---
+    def _limit(self, start):
+        """End offset of a full-size chunk at `start`, or None while the rest of the buffer fits in one."""
+        if self.unit == "chars":
+            return start + self.size if len(self._text) > start + self.size else None
+        # The size-th token is only complete once another one follows it
+        match = self._window.match(self._text, start)
+        return match.end() if match else None
+
+    def _split_point(self, start, limit):
+        lower = start + (limit - start) // 2
+        for separator in SEPARATORS:
+            pos = self._text.rfind(separator, lower, limit)
+            if pos != -1:
+                return pos + len(separator)
+        return limit
+
+    def _next_start(self, start, end):
+        """Start of the next chunk: `overlap` units before `end`, moved forward to a word boundary."""
+        if self.overlap == 0:
+            return end
+        if self.unit == "tokens":
+            # Scan a tail of the chunk first; its first token may be cut, but is never the one picked
+            tail = max(start, end - 16 * self.overlap)
+            starts = [match.start() for match in TOKEN_PATTERN.finditer(self._text, tail, end)]
+            if len(starts) <= self.overlap and tail > start:
+                starts = [match.start() for match in TOKEN_PATTERN.finditer(self._text, start, end)]
+            return starts[max(len(starts) - self.overlap, 1)] if len(starts) > 1 else end
+        pos = max(end - self.overlap, start + 1)
+        if not self._text[pos - 1].isspace():
+            match = _SPACE.search(self._text, pos, end)
+            pos = match.start() if match else end
+        return pos
+
+    def _cut(self, final):
+        while True:
+            match = _NON_SPACE.search(self._text, self._start)
+            if match is None:
+                self._start = len(self._text)
+                return
+            start = match.start()
+            limit = self._limit(start)
+            if limit is None and not final:
+                self._start = start
+                return
+            end = len(self._text) if limit is None else self._split_point(start, limit)
+            yield self._chunk(start, end)
+            self._start = len(self._text) if limit is None else self._next_start(start, end)
+
+    def _chunk(self, start, end):
+        while end > start and self._text[end - 1].isspace():
+            end -= 1
+        return {"text": self._text[start:end],
+                "metadata": {"source": self._source, "page": self._page_at(start), "page_end": self._page_at(end - 1)}}
+
+    def _standalone(self, block):
+        splitter = StreamingChunker(self.size, self.overlap, self.unit, break_pages=0)
+        splitter._append(block["content"], block["page"], block["source"])
+        yield from splitter._cut(final=True)
@@ -1,51 +1,81 @@
-import os
-from dotenv import load_dotenv
-from neo4j import GraphDatabase
-
-# Load environment variables
-load_dotenv()
-
-URI = os.getenv("NEO4J_URI")
-AUTH = (os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD"))
+from common.resources import get_config, get_driver
+from common.graph_store import GRAPH_BACKEND
 
 def init_graph_schema():
     """
     Initializes the Graph DB schema:
     1. Verify connection
     2. Create unique constraints for Documents and Chunks
+    3. Create the chunk/summary/need vector indexes and the linker's full-text indexes
+    (Nothing to do for GRAPH_BACKEND=local: its indexes are built in memory.)
     """
-    print(f"🔌 Connecting to Neo4j at {URI}...")
-    
+    if GRAPH_BACKEND == "local":
+        print("🗂️ GRAPH_BACKEND=local, no schema to initialize.")
+        return
     try:
-        with GraphDatabase.driver(URI, auth=AUTH) as driver:
-            driver.verify_connectivity()
-            print("✅ Connection Successful!")
+        print(f"🔌 Connecting to Neo4j at {get_config().get('NEO4J_URI')}...")
+        driver = get_driver()
+        print("✅ Connection Successful!")
 
-            # Create Constraints (Ensures we don't duplicate documents)
-            queries = [
-                # Ensure every Document has a unique ID
-                "CREATE CONSTRAINT document_id_unique IF NOT EXISTS FOR (d:Document) REQUIRE d.id IS UNIQUE",
-                # Ensure every Chunk has a unique ID
-                "CREATE CONSTRAINT chunk_id_unique IF NOT EXISTS FOR (c:Chunk) REQUIRE c.id IS UNIQUE",
-                # Create a Vector Index (Required for similarity search)
-                # Note: We configure 768 dimensions (standard for Google embedding models)
-                """
-                CREATE VECTOR INDEX vector_index IF NOT EXISTS
-                FOR (c:Chunk) ON (c.embedding)
-                OPTIONS {indexConfig: {
-                 `vector.dimensions`: 768,
-                 `vector.similarity_function`: 'cosine'
-                }}
-                """
-            ]
+        # Create Constraints (Ensures we don't duplicate documents)
+        queries = [
+            # Ensure every Document has a unique ID
+            "CREATE CONSTRAINT document_id_unique IF NOT EXISTS FOR (d:Document) REQUIRE d.id IS UNIQUE",
+            # Ensure every Chunk has a unique ID
+            "CREATE CONSTRAINT chunk_id_unique IF NOT EXISTS FOR (c:Chunk) REQUIRE c.id IS UNIQUE",
+            # Property index for per-document chunk lookups (bulk writer, re-ingest diffs)
+            "CREATE INDEX chunk_parent_doc IF NOT EXISTS FOR (c:Chunk) ON (c.parent_doc)",
+            # Single node holding the corpus generation (see GraphManager.corpus_generation)
+            "CREATE CONSTRAINT corpus_state_id_unique IF NOT EXISTS FOR (s:CorpusState) REQUIRE s.id IS UNIQUE",
+            # Tombstones waiting for the GC worker, oldest first
+            "CREATE INDEX deleted_document_at IF NOT EXISTS FOR (d:DeletedDocument) ON (d.deleted_at)",
+            # Create a Vector Index (Required for similarity search)
+            # Note: We configure 768 dimensions (standard for Google embedding models)
+            """
+            CREATE VECTOR INDEX vector_index IF NOT EXISTS
+            FOR (c:Chunk) ON (c.embedding)
+            OPTIONS {indexConfig: {
+             `vector.dimensions`: 768,
+             `vector.similarity_function`: 'cosine'
+            }}
+            """,
+            # Ensure every Need has a unique ID
+            "CREATE CONSTRAINT need_id_unique IF NOT EXISTS FOR (n:Need) REQUIRE n.id IS UNIQUE",
+            # Vector indexes for semantic linking (Need embedding -> Document summary embedding)
+            """
+            CREATE VECTOR INDEX document_summary_vector_index IF NOT EXISTS
+            FOR (d:Document) ON (d.summary_embedding)
+            OPTIONS {indexConfig: {
+             `vector.dimensions`: 768,
+             `vector.similarity_function`: 'cosine'
+            }}
+            """,
+            """
+            CREATE VECTOR INDEX need_vector_index IF NOT EXISTS
+            FOR (n:Need) ON (n.embedding)
+            OPTIONS {indexConfig: {
+             `vector.dimensions`: 768,
+             `vector.similarity_function`: 'cosine'
+            }}
+            """,
+            # Full-text indexes for the targeted linker (candidate lookup instead of a corpus scan)
+            "CREATE FULLTEXT INDEX document_summary_index IF NOT EXISTS FOR (d:Document) ON EACH [d.summary, d.id]",
+            "CREATE FULLTEXT INDEX document_needs_index IF NOT EXISTS FOR (d:Document) ON EACH [d.needs_text, d.refs_text]",
+            # Backfill the flat needs/refs strings on Documents ingested before the linker index existed
+            """
+            MATCH (d:Document) WHERE d.needs_text IS NULL
+            SET d.needs_text = reduce(s = '', n IN coalesce(d.semantic_needs, []) | s + n + ' | '),
+                d.refs_text = reduce(s = '', r IN coalesce(d.explicit_refs, []) | s + r + ' | ')
+            """
+        ]
 
-            with driver.session() as session:
-                for q in queries:
-                    session.run(q)
-                    print(f"   Executed constraint: {q.split('FOR')[0].strip()}...")
-            
-            print("🏗️ Schema and Vector Index configured successfully.")
-            
+        with driver.session() as session:
+            for q in queries:
+                session.run(q)
+                print(f"   Executed constraint: {q.split('FOR')[0].strip()}...")
+        
+        print("🏗️ Schema and Vector Index configured successfully.")
+        
     except Exception as e:
         print(f"❌ Error connecting to Neo4j: {e}")
 
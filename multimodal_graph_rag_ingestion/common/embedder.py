@@ -0,0 +1,103 @@
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from common.tracing import span, count
+from common.rate_limit import call_with_limits, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+# ~3 KB per 768-dim float32 vector, so the default caps the cache near 30 MB
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "10000"))
+
+
+class CachedEmbedder:
+    """
+    Embedding layer in front of a LangChain Embeddings model:
+    1. Keys every text by its sha256, so identical chunks are embedded once.
+    2. Serves repeats from an LRU cache of float32 vectors.
+    3. Sends the remaining texts in fixed-size batches on a bounded thread pool.
+    """
+    def __init__(self, embeddings, cache_size=EMBED_CACHE_SIZE, batch_size=EMBED_BATCH_SIZE,
+                 max_workers=EMBED_CONCURRENCY):
+        self.embeddings = embeddings
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key):
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+            return vector
+
+    def _store(self, key, vector):
+        with self._lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _embed_batch(self, texts):
+        vectors = call_with_limits(lambda: self.embeddings.embed_documents(texts), limiter=get_rate_limiter("embeddings"))
+        return np.asarray(vectors, dtype=np.float32)
+
+    def embed_texts(self, texts):
+        """
+        Returns a (len(texts), dim) float32 matrix, rows in input order.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        keys = [self.key(text) for text in texts]
+
+        # 1. Deduplicate and split into cached / missing
+        vectors, missing = {}, {}
+        for key, text in zip(keys, texts):
+            if key in vectors or key in missing:
+                continue
+            cached = self._lookup(key)
+            if cached is None:
+                missing[key] = text
+            else:
+                vectors[key] = cached
+        self.hits += len(vectors)
+        self.misses += len(missing)
+        count("embed_cache_hits", len(vectors))
+        count("embedded_texts", len(missing))
+
+        # 2. Embed the misses in concurrent batches
+        if missing:
+            missing_keys = list(missing)
+            batches = [missing_keys[i:i + self.batch_size] for i in range(0, len(missing_keys), self.batch_size)]
+            workers = max(1, min(self.max_workers, len(batches)))
+            with span("embed"), ThreadPoolExecutor(max_workers=workers) as pool:
+                results = pool.map(lambda batch: self._embed_batch([missing[k] for k in batch]), batches)
+                for batch, matrix in zip(batches, results):
+                    for key, vector in zip(batch, matrix):
+                        vectors[key] = vector
+                        self._store(key, vector)
+
+        logger.info(f"Embedded {len(texts)} texts: {len(vectors)} unique, {len(missing)} sent to the model")
+        return np.stack([vectors[key] for key in keys])
+
+    def embed_query(self, text):
+        return self.embed_texts([text])[0]
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "cached": len(self._cache)}
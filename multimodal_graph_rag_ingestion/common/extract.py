@@ -0,0 +1,169 @@
+"""
+Page extraction (text + prepared images), optionally sharded across processes.
+
+Large documents are split into small page ranges that a set of worker processes
+extract on demand, each with its own handle on the PDF. Results are merged back
+in page order with at most 2 ranges per worker in flight, so memory stays bounded.
+
+Workers talk to the parent over multiprocessing Pipes only: Lambda has no
+/dev/shm, which multiprocessing Pool/Queue need for their semaphores.
+"""
+import os
+import logging
+import multiprocessing
+from multiprocessing.connection import wait
+from common.image_prep import prepare_image
+from common.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+# Extraction processes per document (0 = usable_cpus(); 1 = in-process). With fewer
+# than 2 usable CPUs the workers only compete with the parent, so extraction stays serial.
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "0"))
+# Documents with fewer pages are extracted in-process (worker start-up is ~0.2 s)
+EXTRACT_MIN_PAGES = int(os.getenv("EXTRACT_MIN_PAGES", "100"))
+# Pages per task handed to a worker
+EXTRACT_RANGE_PAGES = int(os.getenv("EXTRACT_RANGE_PAGES", "8"))
+# Lambda allots one full vCPU per 1769 MB of memory
+LAMBDA_MB_PER_VCPU = 1769
+
+
+def usable_cpus():
+    """
+    CPUs this process can actually use, which on Lambda and in containers is less
+    than os.cpu_count(): the smallest of the CPU affinity mask, the cgroup CPU quota
+    and the Lambda memory share (rounded, at least 1).
+    """
+    limits = [len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1]
+    # 1. cgroup v2 ("<quota> <period>" or "max <period>"), then v1
+    for quota_path, period_path in (("/sys/fs/cgroup/cpu.max", None),
+                                    ("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu/cpu.cfs_period_us")):
+        try:
+            with open(quota_path) as f:
+                fields = f.read().split()
+            if period_path:
+                with open(period_path) as f:
+                    fields.append(f.read().strip())
+        except (OSError, ValueError):
+            continue
+        if fields[0] not in ("max", "-1"):
+            limits.append(int(fields[0]) / int(fields[1]))
+        break
+    # 2. Lambda memory size
+    memory_mb = os.getenv("AWS_LAMBDA_FUNCTION_MEMORY_SIZE")
+    if memory_mb:
+        limits.append(int(memory_mb) / LAMBDA_MB_PER_VCPU)
+    return max(1, round(min(limits)))
+
+
+def extract_range(doc, start, end):
+    """
+    Extracts pages [start, end) of an open fitz document.
+    Returns one record per page:
+        {"page": 1-based number, "text": str,
+         "images": [{"image_index": 1-based, "xref": int, "raw_size": int, "prepared": PreparedImage | None}]}
+    (prepared is None for images dropped by common.image_prep).
+    """
+    pages = []
+    for page_num in range(start, end):
+        page = doc[page_num]
+        record = {"page": page_num + 1, "text": page.get_text(), "images": []}
+        for img_index, img in enumerate(page.get_images(full=True)):
+            extracted = doc.extract_image(img[0])
+            record["images"].append({
+                "image_index": img_index + 1,
+                "xref": img[0],
+                "raw_size": len(extracted["image"]),
+                "prepared": prepare_image(extracted["image"], ext=extracted.get("ext")),
+            })
+        pages.append(record)
+    return pages
+
+def _worker(conn, pdf_path):
+    """Worker loop: receives (start, end) tasks until None, replies with page records."""
+    import fitz
+    with fitz.open(pdf_path) as doc:
+        while True:
+            task = conn.recv()
+            if task is None:
+                break
+            try:
+                conn.send(("ok", extract_range(doc, *task)))
+            except Exception as e:
+                conn.send(("error", f"pages {task[0] + 1}-{task[1]}: {e}"))
+    conn.close()
+
+
+def _iter_serial(doc, start, end, range_pages):
+    for range_start in range(start, end, range_pages):
+        with span("extract"):
+            pages = extract_range(doc, range_start, min(range_start + range_pages, end))
+        yield from pages
+
+def _iter_sharded(pdf_path, start, end, workers, range_pages):
+    ctx = multiprocessing.get_context("spawn")
+    tasks = [(s, min(s + range_pages, end)) for s in range(start, end, range_pages)]
+    procs, conns = [], []
+    for _ in range(min(workers, len(tasks))):
+        parent_conn, child_conn = ctx.Pipe()
+        proc = ctx.Process(target=_worker, args=(child_conn, pdf_path), daemon=True)
+        proc.start()
+        child_conn.close()
+        procs.append(proc)
+        conns.append(parent_conn)
+
+    next_task = 0
+    assigned = {conn: [] for conn in conns}  # conn -> task indexes in flight, in send order
+    results = {}  # task index -> pages, waiting for their turn
+    try:
+        def _dispatch():
+            nonlocal next_task
+            # Keep each worker busy, with at most one range queued behind the current one
+            for conn in conns:
+                while len(assigned[conn]) < 2 and next_task < len(tasks):
+                    conn.send(tasks[next_task])
+                    assigned[conn].append(next_task)
+                    next_task += 1
+
+        _dispatch()
+        for index in range(len(tasks)):
+            with span("extract"):
+                while index not in results:
+                    for conn in wait([c for c in conns if assigned[c]]):
+                        status, payload = conn.recv()
+                        if status != "ok":
+                            raise RuntimeError(f"Page extraction failed ({payload})")
+                        results[assigned[conn].pop(0)] = payload
+                    _dispatch()
+            yield from results.pop(index)
+    finally:
+        for conn in conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        for conn in conns:
+            conn.close()
+
+def iter_pages(pdf_path, workers=None, range_pages=EXTRACT_RANGE_PAGES, start=0, end=None):
+    """
+    Yields extract_range page records for pages [start, end) (default: the whole
+    document), in page order. Uses `workers` processes (default EXTRACT_WORKERS,
+    read at call time) for ranges of at least EXTRACT_MIN_PAGES pages, otherwise
+    extracts in-process.
+    """
+    import fitz
+    workers = workers or EXTRACT_WORKERS or usable_cpus()
+    with fitz.open(pdf_path) as doc:
+        end = doc.page_count if end is None else min(end, doc.page_count)
+        if workers <= 1 or end - start < EXTRACT_MIN_PAGES:
+            yield from _iter_serial(doc, start, end, range_pages)
+            return
+
+    logger.info(f"Extracting pages {start + 1}-{end} with {workers} processes")
+    yield from _iter_sharded(pdf_path, start, end, workers, range_pages)
@@ -0,0 +1,86 @@
+import os
+import json
+from datetime import datetime
+from common.graph_store import get_graph_store
+from common.tracing import start_trace, finish_trace
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+# Tombstones younger than this are left alone (longer than assets.ASSET_KNOWN_TTL_SECONDS)
+GC_GRACE_SECONDS = int(os.getenv("GC_GRACE_SECONDS", "900"))
+# Tombstones purged per run; the rest wait for the next scheduled run
+GC_MAX_TOMBSTONES = int(os.getenv("GC_MAX_TOMBSTONES", "100"))
+# Scheduled runs between sweeps of the S3 image description cache (listing it is O(cache size))
+GC_CACHE_EVICT_EVERY = int(os.getenv("GC_CACHE_EVICT_EVERY", "4"))
+# Minutes between scheduled runs (the stack's GcSchedule, aligned to the clock)
+GC_SCHEDULE_MINUTES = int(os.getenv("GC_SCHEDULE_MINUTES", "15"))
+
+def is_cache_sweep(event):
+    """
+    True for every GC_CACHE_EVICT_EVERY-th schedule slot, numbered from the epoch
+    by the event's scheduled time, so the cadence holds whichever container (cold
+    or warm) gets the run. Direct invokes sweep only with {"evict_cache": true}.
+    """
+    if "evict_cache" in event:
+        return bool(event["evict_cache"])
+    if not event.get("time"):
+        return False
+    scheduled = datetime.fromisoformat(event["time"].replace("Z", "+00:00")).timestamp()
+    # Rounded, so a run delivered a few seconds late keeps its slot
+    slot = round(scheduled / (GC_SCHEDULE_MINUTES * 60))
+    return slot % max(GC_CACHE_EVICT_EVERY, 1) == 0
+
+def evict_description_cache():
+    """
+    Enforces the size cap of the shared S3 description cache, which is only
+    evicted here (the SQLite backend evicts itself on put). Expired entries
+    are also removed by the bucket's lifecycle rule.
+    """
+    from common import image_cache
+    if image_cache.CACHE_BACKEND != "s3":
+        return False
+    try:
+        image_cache.S3CacheBackend().evict()
+        return True
+    except Exception as e:
+        logger.warning(f"Image cache eviction failed: {e}")
+        return False
+
+def handler(event, context):
+    """
+    STEP 3: GARBAGE COLLECTION WORKER
+    Runs on a schedule. Deletes the chunks and relationships of tombstoned
+    documents (see GraphManager.tombstone_document) in small transactions, then
+    their S3 assets, unless the file has been ingested again in the meantime.
+    Input: scheduled EventBridge event, or { "grace_seconds": 0, "evict_cache": true } (direct invoke)
+    Every GC_CACHE_EVICT_EVERY-th scheduled run it also sweeps the image
+    description cache (see is_cache_sweep).
+    Output: { "status": "gc_complete", "purged": [ { "filename", "chunks", "assets" } ], "cache_evicted": bool }
+    """
+    logger.info(f"🧹 GC Worker Received: {json.dumps(event)}")
+    from common.assets import delete_assets
+
+    start_trace("GcWorker")
+    gm = get_graph_store()
+    try:
+        purged = gm.collect_garbage(grace_seconds=event.get("grace_seconds", GC_GRACE_SECONDS),
+                                    max_tombstones=GC_MAX_TOMBSTONES)
+        for item in purged:
+            bucket = item.pop("asset_bucket")
+            item["assets"] = 0
+            # A live Document with the same name owns assets/<name>/ again
+            if bucket and not gm.document_exists(item["filename"]):
+                item["assets"] = delete_assets(bucket, item["filename"].replace(".pdf", ""))
+
+        logger.info(f"Purged {len(purged)} tombstoned document(s)")
+        cache_evicted = evict_description_cache() if is_cache_sweep(event) else False
+        return finish_trace({"status": "gc_complete", "purged": purged, "cache_evicted": cache_evicted})
+
+    except Exception as e:
+        logger.error(f"GC Worker Critical Failure: {str(e)}")
+        raise e
+    finally:
+        gm.close()
+        finish_trace()
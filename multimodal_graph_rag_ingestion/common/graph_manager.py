@@ -1,59 +1,414 @@
 
-from neo4j import GraphDatabase
-from common.secrets import load_config
+import os
+import re
+import uuid
+from common.resources import get_driver
+from common.graph_store import GraphStore
+from common.tracing import span, count
 import logging
 
-try:
-    CONFIG = load_config()
-    URI = CONFIG["NEO4J_URI"]
-    AUTH = (CONFIG["NEO4J_USERNAME"], CONFIG["NEO4J_PASSWORD"])
-except Exception:
-    URI, AUTH = None, None
-
 logger = logging.getLogger(__name__)
 
-class GraphManager:
-    def __init__(self):
-        if not URI: 
-            raise ValueError("DB Config Missing")
-        self.driver = GraphDatabase.driver(URI, auth=AUTH)
+# Max candidates pulled from the full-text indexes per lookup
+LINK_CANDIDATE_LIMIT = int(os.getenv("LINK_CANDIDATE_LIMIT", "50"))
+# Max filename terms used for the inbound explicit-ref lookup
+LINK_MAX_TERMS = int(os.getenv("LINK_MAX_TERMS", "64"))
+# Approximate nearest neighbours fetched per need / summary, and the minimum cosine score to link
+LINK_TOP_K = int(os.getenv("LINK_TOP_K", "10"))
+LINK_SIMILARITY_THRESHOLD = float(os.getenv("LINK_SIMILARITY_THRESHOLD", "0.80"))
+# Documents linked per set-based linker transaction
+LINK_BATCH_SIZE = int(os.getenv("LINK_BATCH_SIZE", "100"))
+# Chunks written per UNWIND transaction
+WRITE_BATCH_SIZE = int(os.getenv("NEO4J_WRITE_BATCH", "500"))
+# Nodes / relationships removed per inner transaction of a batched delete
+DELETE_BATCH_SIZE = int(os.getenv("NEO4J_DELETE_BATCH", "1000"))
+
+# Corpus generation: bumped by every change readers can see (document writes, tombstones,
+# linker passes), so query-serving processes can tell their cached results are stale
+_BUMP_GENERATION_QUERY = "MERGE (s:CorpusState {id: 'corpus'}) SET s.generation = coalesce(s.generation, 0) + 1"
+
+def _phrase_query(text):
+    """Lucene phrase query for a need or filename (only quotes and backslashes need escaping)."""
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def _filename_query(filename):
+    """
+    Lucene query for references to a file: the whole name and its stem as phrases
+    (the standard analyzer keeps "pump_manual.pdf" as one token), boosted over the
+    stem's word terms for partial references. The extension is never a term on its
+    own: "pdf" would match nearly every document and use up the candidate limit.
+    """
+    stem, ext = os.path.splitext(filename)
+    generic = {"pdf", ext.lstrip(".").lower()}
+    clauses = [_phrase_query(filename) + "^4"]
+    if stem and stem != filename:
+        clauses.append(_phrase_query(stem) + "^2")
+    terms = [t for t in dict.fromkeys(re.findall(r"[^\W_]+", stem.lower())) if len(t) > 2 and t not in generic]
+    return " OR ".join(clauses + terms[:LINK_MAX_TERMS])
+
+class GraphManager(GraphStore):
+    """Neo4j backend of GraphStore (GRAPH_BACKEND=neo4j)."""
+    def __init__(self, driver=None):
+        # Defaults to the process-wide pooled driver, reused across warm invocations
+        self.driver = driver or get_driver()
 
     def close(self):
-        self.driver.close()
+        # No-op: the pooled driver stays open for the next invocation
+        # (drivers passed in explicitly are closed by their owner)
+        pass
+
+    def init_schema(self):
+        from common.db_init import init_graph_schema
+        init_graph_schema()
+
+    def delete_document_data(self, filename, asset_bucket=None):
+        """
+        Non-blocking delete: tombstones the Document (see tombstone_document).
+        Its chunks are removed in the background by collect_garbage.
+        """
+        return self.tombstone_document(filename, asset_bucket=asset_bucket)
 
-    def delete_document_data(self, filename):
-        query = "MATCH (d:Document {id: $filename}) OPTIONAL MATCH (d)-[:HAS_CHUNK]->(c:Chunk) DETACH DELETE d, c"
+    def tombstone_document(self, filename, asset_bucket=None):
+        """
+        Hides a Document from every reader in one small transaction:
+        1. Its Need nodes and REFERENCES edges are deleted (a handful per document).
+        2. The node is relabelled DeletedDocument under a unique id, which takes it out
+           of the Document indexes and frees the id for a re-ingest right away.
+        Chunks stay attached to the tombstone until collect_garbage removes them; a re-ingest
+        that produces the same chunk ids adopts those nodes instead (the writer MERGEs on id).
+        asset_bucket: also delete the document's assets (assets/<name>/) from this bucket during GC.
+        Returns True if there was a Document to delete.
+        """
+        query = """
+        MATCH (d:Document {id: $filename})
+        OPTIONAL MATCH (d)-[:HAS_NEED]->(n:Need)
+        DETACH DELETE n
+        WITH DISTINCT d
+        OPTIONAL MATCH (d)-[r:REFERENCES]-()
+        DELETE r
+        WITH DISTINCT d
+        REMOVE d:Document, d.summary_embedding
+        SET d:DeletedDocument, d.id = $filename + '#deleted-' + $token,
+            d.filename = $filename, d.asset_bucket = $asset_bucket, d.deleted_at = datetime()
+        RETURN count(d) AS tombstoned
+        """
+        with span("neo4j_delete"), self.driver.session() as session:
+            tombstoned = session.run(query, filename=filename, token=uuid.uuid4().hex,
+                                     asset_bucket=asset_bucket).single()["tombstoned"]
+            if tombstoned:
+                session.run(_BUMP_GENERATION_QUERY).consume()
+        count("tombstones", tombstoned)
+        return tombstoned > 0
+
+    def collect_garbage(self, grace_seconds=0, max_tombstones=100, batch_size=DELETE_BATCH_SIZE):
+        """
+        Background pass over tombstones older than grace_seconds (oldest first):
+        1. Deletes their chunks that no live Document adopted, batch_size per transaction.
+        2. Deletes their remaining relationships the same way, then the tombstone itself.
+        Returns [{"filename", "asset_bucket", "chunks"}] for the purged tombstones, so
+        the caller can clean up the documents' assets.
+        """
+        tombstones_query = """
+        MATCH (t:DeletedDocument)
+        WHERE t.deleted_at <= datetime() - duration({seconds: $grace_seconds})
+        RETURN t.id AS id, t.filename AS filename, t.asset_bucket AS asset_bucket
+        ORDER BY t.deleted_at LIMIT $limit
+        """
+        # CALL { } IN TRANSACTIONS needs an auto-commit transaction (session.run)
+        chunks_query = """
+        MATCH (:DeletedDocument {id: $id})-[:HAS_CHUNK]->(c:Chunk)
+        WHERE NOT EXISTS { MATCH (:Document)-[:HAS_CHUNK]->(c) }
+        CALL { WITH c DETACH DELETE c } IN TRANSACTIONS OF $batch_size ROWS
+        """
+        edges_query = """
+        MATCH (:DeletedDocument {id: $id})-[r]-()
+        CALL { WITH r DELETE r } IN TRANSACTIONS OF $batch_size ROWS
+        """
+        purged = []
+        with span("neo4j_gc"), self.driver.session() as session:
+            tombstones = session.run(tombstones_query, grace_seconds=grace_seconds, limit=max_tombstones).data()
+            for tombstone in tombstones:
+                summary = session.run(chunks_query, id=tombstone["id"], batch_size=batch_size).consume()
+                session.run(edges_query, id=tombstone["id"], batch_size=batch_size).consume()
+                session.run("MATCH (t:DeletedDocument {id: $id}) DELETE t", id=tombstone["id"]).consume()
+                purged.append({"filename": tombstone["filename"], "asset_bucket": tombstone["asset_bucket"],
+                               "chunks": summary.counters.nodes_deleted})
+                count("gc_chunks", summary.counters.nodes_deleted)
+        count("gc_tombstones", len(purged))
+        return purged
+
+    def document_exists(self, filename):
+        with self.driver.session() as session:
+            return session.run("MATCH (d:Document {id: $filename}) RETURN count(d) > 0 AS found",
+                               filename=filename).single()["found"]
+
+    def touch_document(self, filename):
+        """Creates the Document node early so streamed chunks can attach to it."""
+        query = "MERGE (d:Document {id: $filename}) SET d.filename = $filename, d.updated_at = datetime()"
         with self.driver.session() as session:
             session.run(query, filename=filename)
 
-    def create_document_node(self, filename, summary, needs, explicit):
+    def create_document_node(self, filename, summary, needs, explicit, content_hash=None, sample_hash=None,
+                             summary_embedding=None, need_embeddings=None):
         query = """
         MERGE (d:Document {id: $filename})
         SET d.filename = $filename, d.summary = $summary, 
             d.semantic_needs = $needs, d.explicit_refs = $explicit,
+            d.needs_text = $needs_text, d.refs_text = $refs_text,
+            d.summary_embedding = $summary_embedding,
+            d.content_hash = $content_hash, d.sample_hash = $sample_hash,
             d.updated_at = datetime()
         """
+        # Each need becomes its own Need node so it can be searched in need_vector_index
+        needs_query = """
+        MATCH (d:Document {id: $filename})
+        OPTIONAL MATCH (d)-[:HAS_NEED]->(old:Need)
+        DETACH DELETE old
+        WITH DISTINCT d
+        UNWIND range(0, size($needs) - 1) AS i
+        CREATE (d)-[:HAS_NEED]->(:Need {id: $filename + '#' + toString(i), text: $needs[i], embedding: $need_embeddings[i]})
+        """
+        # needs_text / refs_text are flat strings for the full-text linker index
+        with span("neo4j_write"), self.driver.session() as session:
+            session.run(query, filename=filename, summary=summary, needs=needs, explicit=explicit,
+                        needs_text=" | ".join(needs), refs_text=" | ".join(explicit),
+                        summary_embedding=summary_embedding,
+                        content_hash=content_hash, sample_hash=sample_hash)
+            if need_embeddings is not None:
+                session.run(needs_query, filename=filename, needs=needs, need_embeddings=need_embeddings)
+            session.run(_BUMP_GENERATION_QUERY).consume()
+
+    def get_document_state(self, filename):
+        """
+        Returns the stored hashes and metadata of a Document, or None if it is new.
+        """
+        query = """
+        MATCH (d:Document {id: $filename})
+        RETURN d.content_hash AS content_hash, d.sample_hash AS sample_hash,
+               d.summary AS summary, d.semantic_needs AS needs, d.explicit_refs AS explicit
+        """
         with self.driver.session() as session:
-            session.run(query, filename=filename, summary=summary, needs=needs, explicit=explicit)
+            record = session.run(query, filename=filename).single()
+            return record.data() if record else None
 
-    def run_targeted_linker(self, filename):
+    def get_chunk_ids(self, filename):
+        query = "MATCH (:Document {id: $filename})-[:HAS_CHUNK]->(c:Chunk) RETURN c.id AS id"
+        with self.driver.session() as session:
+            return {record["id"] for record in session.run(query, filename=filename)}
+
+    def write_chunks(self, filename, rows, batch_size=WRITE_BATCH_SIZE):
         """
-        Surgical Linking: Matches current file's 'needs' against others' 'summaries'.
+        Bulk writer: creates Chunk nodes, their embeddings and HAS_CHUNK edges
+        in one UNWIND transaction per batch. Each batch is anchored on the
+        Document id, so cost depends on the batch, not on the graph size.
+        rows: [{"id": ..., "text": ..., "metadata": {...}, "embedding": [...]}]
         """
-        logger.info(f"🔗 Semantic Linking for: {filename}")
         query = """
-        MATCH (this:Document {id: $filename})
-        MATCH (target:Document) WHERE target.id <> this.id
-        
-        // Match if any of our needs appear in their summary OR explicit name match
-        WITH this, target
-        WHERE any(need IN this.semantic_needs WHERE toLower(target.summary) CONTAINS toLower(need))
-           OR any(ref IN this.explicit_refs WHERE toLower(target.id) CONTAINS toLower(ref))
-        
-        MERGE (this)-[r:REFERENCES]->(target)
-        SET r.type = 'inferred', r.updated_at = datetime()
-        RETURN count(r) as links
+        MATCH (d:Document {id: $filename})
+        UNWIND $rows AS row
+        MERGE (c:Chunk {id: row.id})
+        SET c += row.metadata, c.text = row.text
+        WITH d, c, row
+        CALL db.create.setNodeVectorProperty(c, 'embedding', row.embedding)
+        MERGE (d)-[:HAS_CHUNK]->(c)
+        """
+        with span("neo4j_write"), self.driver.session() as session:
+            for i in range(0, len(rows), batch_size):
+                batch = rows[i:i + batch_size]
+                session.execute_write(lambda tx: tx.run(query, filename=filename, rows=batch).consume())
+                count("neo4j_write_batches")
+
+    def update_chunk_positions(self, rows):
         """
+        Refreshes position metadata of unchanged chunks without touching their embeddings.
+        rows: [{"id": ..., "chunk_index": ..., "page": ..., "page_end": ...}]
+        """
+        if not rows:
+            return
+        query = """
+        UNWIND $rows AS row
+        MATCH (c:Chunk {id: row.id})
+        SET c.chunk_index = row.chunk_index, c.page = row.page, c.page_end = row.page_end
+        """
+        with span("neo4j_write"), self.driver.session() as session:
+            session.run(query, rows=rows)
+
+    def delete_stale_chunks(self, filename, keep_ids, batch_size=DELETE_BATCH_SIZE):
+        """
+        Removes the Document's chunks whose ids are not in keep_ids,
+        batch_size per transaction.
+        """
+        query = """
+        MATCH (:Document {id: $filename})-[:HAS_CHUNK]->(c:Chunk)
+        WHERE NOT c.id IN $keep_ids
+        CALL { WITH c DETACH DELETE c } IN TRANSACTIONS OF $batch_size ROWS
+        """
+        with span("neo4j_delete"), self.driver.session() as session:
+            summary = session.run(query, filename=filename, keep_ids=list(keep_ids), batch_size=batch_size).consume()
+            return summary.counters.nodes_deleted
+
+    def corpus_generation(self):
         with self.driver.session() as session:
-            result = session.run(query, filename=filename)
-            logger.info(f"Links established: {result.single()['links']}")
\ No newline at end of file
+            record = session.run("MATCH (s:CorpusState {id: 'corpus'}) RETURN s.generation AS generation").single()
+        return record["generation"] if record else 0
+
+    def search_chunks(self, query_embeddings, k=5, candidates=20, neighbour_docs=3, neighbour_chunks=2):
+        """
+        Graph-aware vector search for a batch of queries in one round-trip
+        (see GraphStore.search_chunks):
+        1. `candidates` nearest chunks from vector_index, kept if a live Document owns them
+           (tombstoned documents drop out here), best k per query.
+        2. The hit documents' REFERENCES neighbours (either direction, best link score first),
+           each with its chunks closest to the query (vector.similarity.cosine, Neo4j 5.18+).
+        """
+        if len(query_embeddings) == 0:
+            return []
+        with span("neo4j_search"), self.driver.session() as session:
+            rows = session.execute_read(lambda tx: tx.run(
+                self._SEARCH_QUERY, queries=[list(map(float, q)) for q in query_embeddings], k=k,
+                candidates=max(candidates, k), neighbour_docs=neighbour_docs, neighbour_chunks=neighbour_chunks
+            ).data())
+        count("searches", len(query_embeddings))
+        return [{"chunks": row["hits"], "neighbours": row["neighbours"]} for row in sorted(rows, key=lambda r: r["qi"])]
+
+    _SEARCH_QUERY = """
+    UNWIND range(0, size($queries) - 1) AS qi
+    CALL {
+        WITH qi
+        CALL db.index.vector.queryNodes('vector_index', $candidates, $queries[qi]) YIELD node AS c, score
+        MATCH (d:Document)-[:HAS_CHUNK]->(c)
+        WITH c, d, score ORDER BY score DESC LIMIT $k
+        RETURN collect({id: c.id, text: c.text, page: c.page, chunk_index: c.chunk_index,
+                        document: d.id, score: score}) AS hits,
+               collect(DISTINCT d) AS docs
+    }
+    CALL {
+        WITH qi, docs
+        UNWIND docs AS d
+        MATCH (d)-[r:REFERENCES]-(n:Document)
+        WHERE NOT n IN docs
+        WITH qi, n, max(coalesce(r.score, 1.0)) AS link_score
+        ORDER BY link_score DESC LIMIT $neighbour_docs
+        CALL {
+            WITH qi, n
+            MATCH (n)-[:HAS_CHUNK]->(nc:Chunk)
+            WITH nc, vector.similarity.cosine(nc.embedding, $queries[qi]) AS score
+            ORDER BY score DESC LIMIT $neighbour_chunks
+            RETURN collect({id: nc.id, text: nc.text, page: nc.page, chunk_index: nc.chunk_index,
+                            document: n.id, score: score}) AS top
+        }
+        RETURN collect({document: n.id, link_score: link_score, chunks: top}) AS neighbours
+    }
+    RETURN qi, hits, neighbours
+    """
+
+    def run_targeted_linker(self, filename):
+        """
+        Surgical Linking for a single file (see run_batch_linker).
+        """
+        return self.run_batch_linker([filename])
+
+    def run_batch_linker(self, filenames):
+        """
+        Set-based Surgical Linking: one Cypher pass per LINK_BATCH_SIZE files,
+        resolved through indexes instead of a corpus scan.
+        1. Outbound: each file's Need embeddings are resolved with a top-k query on
+           document_summary_vector_index; explicit refs are looked up in
+           document_summary_index and verified against target ids.
+        2. Inbound (Repair): each file's summary embedding is resolved against
+           need_vector_index, and its filename against other files' explicit refs.
+        Semantic edges record the best cosine score in r.score.
+        """
+        filenames = list(dict.fromkeys(f for f in filenames if f))
+        logger.info(f"🔗 Semantic Linking for {len(filenames)} file(s)")
+        totals = {"outbound": 0, "inbound": 0}
+
+        with span("link"), self.driver.session() as session:
+            for i in range(0, len(filenames), LINK_BATCH_SIZE):
+                batch = filenames[i:i + LINK_BATCH_SIZE]
+
+                # Lucene queries are built client-side (escaping), keyed by file
+                explicit = session.run(
+                    "UNWIND $filenames AS fname MATCH (d:Document {id: fname}) RETURN d.id AS id, d.explicit_refs AS explicit",
+                    filenames=batch
+                ).data()
+                ref_queries = {
+                    row["id"]: [_phrase_query(r) for r in (row["explicit"] or []) if r and r.strip()]
+                    for row in explicit
+                }
+                ref_terms = {row["id"]: _filename_query(row["id"]) for row in explicit if row["id"].strip()}
+
+                counts = session.execute_write(
+                    lambda tx: tx.run(self._BATCH_LINK_QUERY,
+                                      filenames=batch, ref_queries=ref_queries, ref_terms=ref_terms,
+                                      k=LINK_TOP_K + 1, inbound_k=LINK_TOP_K * 4,
+                                      threshold=LINK_SIMILARITY_THRESHOLD,
+                                      limit=LINK_CANDIDATE_LIMIT, inbound_limit=LINK_CANDIDATE_LIMIT * 4).single()
+                )
+                totals["outbound"] += counts["outbound"] or 0
+                totals["inbound"] += counts["inbound"] or 0
+            if filenames:
+                session.run(_BUMP_GENERATION_QUERY).consume()
+
+        count("links", totals["outbound"] + totals["inbound"])
+        logger.info(f"Links established: {totals['outbound']} outbound, {totals['inbound']} inbound")
+        return totals
+
+    _BATCH_LINK_QUERY = """
+    UNWIND $filenames AS fname
+    MATCH (this:Document {id: fname})
+
+    // 1. Outbound: needs -> summaries (ANN)
+    CALL {
+        WITH this
+        MATCH (this)-[:HAS_NEED]->(need:Need)
+        CALL db.index.vector.queryNodes('document_summary_vector_index', $k, need.embedding) YIELD node AS target, score
+        WITH this, target, max(score) AS score
+        WHERE score >= $threshold AND target.id <> this.id
+        MERGE (this)-[r:REFERENCES]->(target)
+        SET r.type = 'inferred', r.score = score, r.updated_at = datetime()
+        RETURN count(r) AS semantic_out
+    }
+
+    // 2. Outbound: explicit filename refs -> ids (full-text)
+    CALL {
+        WITH this
+        UNWIND coalesce($ref_queries[this.id], []) AS q
+        CALL db.index.fulltext.queryNodes('document_summary_index', q, {limit: $limit}) YIELD node AS target
+        WITH DISTINCT this, target
+        WHERE target.id <> this.id
+          AND any(ref IN this.explicit_refs WHERE toLower(target.id) CONTAINS toLower(ref))
+        MERGE (this)-[r:REFERENCES]->(target)
+        SET r.type = 'inferred', r.updated_at = datetime()
+        RETURN count(r) AS explicit_out
+    }
+
+    // 3. Inbound: summary -> other files' needs (ANN)
+    CALL {
+        WITH this
+        WITH this WHERE this.summary_embedding IS NOT NULL
+        CALL db.index.vector.queryNodes('need_vector_index', $inbound_k, this.summary_embedding) YIELD node AS need, score
+        WITH this, need, score WHERE score >= $threshold
+        MATCH (source:Document)-[:HAS_NEED]->(need)
+        WHERE source.id <> this.id
+        WITH this, source, max(score) AS score
+        MERGE (source)-[r:REFERENCES]->(this)
+        SET r.type = 'inferred', r.score = score, r.updated_at = datetime()
+        RETURN count(r) AS semantic_in
+    }
+
+    // 4. Inbound: filename -> other files' explicit refs (full-text)
+    CALL {
+        WITH this
+        UNWIND CASE WHEN $ref_terms[this.id] IS NULL THEN [] ELSE [$ref_terms[this.id]] END AS terms
+        CALL db.index.fulltext.queryNodes('document_needs_index', terms, {limit: $inbound_limit}) YIELD node AS source
+        WITH this, source
+        WHERE source.id <> this.id
+          AND any(ref IN source.explicit_refs WHERE toLower(this.id) CONTAINS toLower(ref))
+        MERGE (source)-[r:REFERENCES]->(this)
+        SET r.type = 'inferred', r.updated_at = datetime()
+        RETURN count(r) AS explicit_in
+    }
+
+    RETURN sum(semantic_out + explicit_out) AS outbound, sum(semantic_in + explicit_in) AS inbound
+    """
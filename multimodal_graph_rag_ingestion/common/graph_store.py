@@ -0,0 +1,112 @@
+"""
+Storage interface of the pipeline and the factory that picks its backend.
+
+    GRAPH_BACKEND=neo4j   common.graph_manager.GraphManager (default, production)
+    GRAPH_BACKEND=local   common.local_store.LocalGraphStore: in-process NumPy
+                          vectors + dict adjacency, optionally snapshotted to
+                          LOCAL_GRAPH_PATH (local development, CI, offline bulk runs)
+
+Workers, the loader and the backfill get their store from get_graph_store()
+instead of constructing a GraphManager, so neither the Neo4j driver nor a
+running database is needed with the local backend.
+"""
+import os
+import threading
+
+# --- CONFIGURATION ---
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "neo4j").lower()
+# Snapshot directory of the local backend (loaded on first use, saved on close); empty = memory only
+LOCAL_GRAPH_PATH = os.getenv("LOCAL_GRAPH_PATH", "")
+
+
+class GraphStore:
+    """
+    Documents, their chunks (text + embedding), needs and REFERENCES links.
+    Method semantics are those of GraphManager, which documents each one.
+    """
+    def close(self):
+        pass
+
+    def init_schema(self):
+        """Creates constraints/indexes where the backend needs them."""
+        pass
+
+    # --- Documents ---
+    def delete_document_data(self, filename, asset_bucket=None):
+        raise NotImplementedError
+
+    def collect_garbage(self, grace_seconds=0, max_tombstones=100):
+        raise NotImplementedError
+
+    def document_exists(self, filename):
+        raise NotImplementedError
+
+    def touch_document(self, filename):
+        raise NotImplementedError
+
+    def create_document_node(self, filename, summary, needs, explicit, content_hash=None, sample_hash=None,
+                             summary_embedding=None, need_embeddings=None):
+        raise NotImplementedError
+
+    def get_document_state(self, filename):
+        raise NotImplementedError
+
+    # --- Chunks ---
+    def get_chunk_ids(self, filename):
+        raise NotImplementedError
+
+    def write_chunks(self, filename, rows):
+        raise NotImplementedError
+
+    def update_chunk_positions(self, rows):
+        raise NotImplementedError
+
+    def delete_stale_chunks(self, filename, keep_ids):
+        raise NotImplementedError
+
+    # --- Retrieval ---
+    def corpus_generation(self):
+        """
+        Counter bumped by every document write, tombstone and linker pass. One
+        cheap read; callers key cached results on it.
+        """
+        raise NotImplementedError
+
+    def search_chunks(self, query_embeddings, k=5, candidates=20, neighbour_docs=3, neighbour_chunks=2):
+        """
+        One round-trip for a batch of query vectors. Per query:
+            {"chunks": top k chunks of live documents,
+             "neighbours": [{"document", "link_score", "chunks": top neighbour_chunks}]
+                 for the best-linked REFERENCES neighbours of the hit documents}
+        Chunks are {"id", "text", "page", "chunk_index", "document", "score"}.
+        """
+        raise NotImplementedError
+
+    # --- Linking ---
+    def run_targeted_linker(self, filename):
+        return self.run_batch_linker([filename])
+
+    def run_batch_linker(self, filenames):
+        raise NotImplementedError
+
+
+_local_store = None
+_local_lock = threading.Lock()
+
+def get_graph_store(backend=None):
+    """
+    The configured store. GraphManager wraps the pooled driver; the local store
+    is one instance per process, so every caller sees the same graph.
+    """
+    global _local_store
+    backend = (backend or GRAPH_BACKEND).lower()
+    if backend == "local":
+        with _local_lock:
+            if _local_store is None:
+                from common.local_store import LocalGraphStore
+                _local_store = LocalGraphStore.open(LOCAL_GRAPH_PATH or None)
+            return _local_store
+    if backend != "neo4j":
+        raise ValueError(f"Unknown GRAPH_BACKEND '{backend}' (expected 'neo4j' or 'local')")
+    from common.graph_manager import GraphManager
+    return GraphManager()
@@ -0,0 +1,237 @@
+import os
+import time
+import json
+import hashlib
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+# Backend: "sqlite" (local disk, default), "s3" (shared across invocations) or "none"
+CACHE_BACKEND = os.getenv("IMAGE_CACHE_BACKEND", "sqlite").lower()
+CACHE_PATH = os.getenv("IMAGE_CACHE_PATH", "/tmp/image_descriptions.sqlite3")
+CACHE_BUCKET = os.getenv("IMAGE_CACHE_BUCKET", os.getenv("S3_BUCKET_NAME"))
+CACHE_PREFIX = os.getenv("IMAGE_CACHE_PREFIX", "cache/image-descriptions/")
+CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "50000"))
+CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_MAX_AGE_SECONDS = int(os.getenv("IMAGE_CACHE_MAX_AGE_DAYS", "30")) * 86400
+
+
+def image_key(image_bytes, namespace=""):
+    """
+    Content address of an image: sha256 of its bytes, optionally namespaced
+    (e.g. by vision model) so a model change does not serve stale descriptions.
+    """
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    return f"{namespace}:{digest}" if namespace else digest
+
+
+class CacheBackend:
+    """
+    Storage interface for the description cache.
+    get() returns None on a miss or an expired entry.
+    """
+    def get(self, key):
+        raise NotImplementedError
+
+    def put(self, key, value):
+        raise NotImplementedError
+
+    def evict(self):
+        """Drops expired entries, then least-recently-used ones above the size limits."""
+        raise NotImplementedError
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Single-file cache on local disk. On Lambda this lives in /tmp and survives
+    warm invocations of the same container.
+    """
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES,
+                 max_bytes=CACHE_MAX_BYTES, max_age_seconds=CACHE_MAX_AGE_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS descriptions (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON descriptions (accessed_at)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value FROM descriptions WHERE key = ? AND created_at >= ?",
+                (key, now - self.max_age_seconds)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE descriptions SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO descriptions (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now)
+            )
+            self._puts_since_evict += 1
+        # Amortize eviction: sweep every 100 writes instead of on each one
+        if self._puts_since_evict >= 100:
+            self.evict()
+
+    def evict(self):
+        with self._lock, self._conn:
+            self._puts_since_evict = 0
+            self._conn.execute("DELETE FROM descriptions WHERE created_at < ?", (time.time() - self.max_age_seconds,))
+            count, total = self._conn.execute("SELECT count(*), coalesce(sum(size), 0) FROM descriptions").fetchone()
+            if count <= self.max_entries and total <= self.max_bytes:
+                return
+            # Walk from least recently used, dropping rows until both limits hold
+            doomed = []
+            for key, size in self._conn.execute("SELECT key, size FROM descriptions ORDER BY accessed_at ASC"):
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                doomed.append((key,))
+                count -= 1
+                total -= size
+            self._conn.executemany("DELETE FROM descriptions WHERE key = ?", doomed)
+            logger.info(f"🧹 Evicted {len(doomed)} cached image descriptions")
+
+
+class S3CacheBackend(CacheBackend):
+    """
+    One small JSON object per description under an S3 prefix, shared by every
+    IngestWorker container. Age is enforced on read from LastModified.
+    """
+    def __init__(self, bucket=CACHE_BUCKET, prefix=CACHE_PREFIX, max_entries=CACHE_MAX_ENTRIES,
+                 max_bytes=CACHE_MAX_BYTES, max_age_seconds=CACHE_MAX_AGE_SECONDS, client=None):
+        if not bucket:
+            raise ValueError("S3 cache backend requires IMAGE_CACHE_BUCKET or S3_BUCKET_NAME")
+        from common.resources import get_s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.client = client or get_s3_client()
+
+    def _object_key(self, key):
+        return f"{self.prefix}{key.replace(':', '/')}.json"
+
+    def get(self, key):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        except self.client.exceptions.NoSuchKey:
+            return None
+        if time.time() - response["LastModified"].timestamp() > self.max_age_seconds:
+            return None
+        return json.loads(response["Body"].read())["description"]
+
+    def put(self, key, value):
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._object_key(key),
+            Body=json.dumps({"description": value}).encode("utf-8"),
+            ContentType="application/json"
+        )
+
+    def evict(self):
+        # Listing is O(cache size), so this is meant for a periodic sweep, not the hot path
+        objects = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            objects.extend(page.get("Contents", []))
+
+        cutoff = time.time() - self.max_age_seconds
+        doomed = [o for o in objects if o["LastModified"].timestamp() < cutoff]
+        live = sorted((o for o in objects if o["LastModified"].timestamp() >= cutoff),
+                      key=lambda o: o["LastModified"])
+        count, total = len(live), sum(o["Size"] for o in live)
+        for o in live:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append(o)
+            count -= 1
+            total -= o["Size"]
+
+        for i in range(0, len(doomed), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": o["Key"]} for o in doomed[i:i + 1000]], "Quiet": True}
+            )
+        if doomed:
+            logger.info(f"🧹 Evicted {len(doomed)} cached image descriptions from s3://{self.bucket}/{self.prefix}")
+
+
+class DescriptionCache:
+    """
+    Content-addressed cache of image descriptions with hit/miss counters.
+    Backend errors degrade to a miss; they never fail an ingest.
+    """
+    def __init__(self, backend, namespace=""):
+        self.backend = backend
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, image_bytes):
+        return image_key(image_bytes, self.namespace)
+
+    def get(self, key):
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Image cache read failed: {e}")
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key, value):
+        try:
+            self.backend.put(key, value)
+        except Exception as e:
+            logger.warning(f"Image cache write failed: {e}")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_description_cache(namespace=""):
+    """
+    Returns the process-wide description cache built from env config,
+    or None when IMAGE_CACHE_BACKEND=none.
+    """
+    global _cache
+    if CACHE_BACKEND == "none":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            backend = S3CacheBackend() if CACHE_BACKEND == "s3" else SQLiteCacheBackend()
+            _cache = DescriptionCache(backend, namespace=namespace)
+            logger.info(f"🗃️ Image description cache: {CACHE_BACKEND}")
+        return _cache
@@ -0,0 +1,172 @@
+"""
+Image preprocessing before storage and vision calls:
+1. Detects the real format from magic bytes.
+2. Drops spacers, icons and blank/solid images (size threshold, and the share of non-background pixels).
+3. Downscales and re-encodes images above IMAGE_MAX_DIM, and converts formats
+   Gemini does not accept (JPX, JBIG2, TIFF, ...) to PNG.
+4. Computes a perceptual hash so near-duplicates within a document are described once.
+"""
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+IMAGE_PREP_ENABLED = os.getenv("IMAGE_PREP_ENABLED", "true").lower() == "true"
+# Images with a side below this (pixels) or fewer bytes are dropped
+IMAGE_MIN_SIDE = int(os.getenv("IMAGE_MIN_SIDE", "32"))
+IMAGE_MIN_BYTES = int(os.getenv("IMAGE_MIN_BYTES", "256"))
+# Share of "ink" pixels (gray level more than IMAGE_BLANK_TOLERANCE away from the
+# background level) below which an image is treated as blank. Measured at full
+# resolution, so thin lines on a large canvas still count (a sparse schematic is ~0.5%)
+IMAGE_MIN_INK = float(os.getenv("IMAGE_MIN_INK", "0.0005"))
+IMAGE_BLANK_TOLERANCE = int(os.getenv("IMAGE_BLANK_TOLERANCE", "8"))
+# Longest side after downscaling; Gemini tiles larger images anyway
+IMAGE_MAX_DIM = int(os.getenv("IMAGE_MAX_DIM", "1536"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+# Max Hamming distance (of 128 bits) between perceptual hashes of near-duplicates
+IMAGE_DEDUP_DISTANCE = int(os.getenv("IMAGE_DEDUP_DISTANCE", "6"))
+
+MIME_TYPES = {
+    "png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp", "gif": "image/gif",
+    "bmp": "image/bmp", "tiff": "image/tiff", "jpx": "image/jp2", "jb2": "image/jbig2",
+}
+# Formats sent to the vision model as they are
+VISION_FORMATS = {"png", "jpeg", "webp"}
+
+_MAGIC = [
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+    (b"\x00\x00\x00\x0cjP  ", "jpx"),
+    (b"\xff\x4f\xff\x51", "jpx"),
+    (b"\x97JB2\r\n\x1a\n", "jb2"),
+]
+
+def detect_format(image_bytes, default=None):
+    """Real image format from the leading bytes (falls back to `default`)."""
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "webp"
+    for magic, fmt in _MAGIC:
+        if image_bytes.startswith(magic):
+            return fmt
+    return default
+
+def mime_type(image_format):
+    return MIME_TYPES.get(image_format, f"image/{image_format}")
+
+
+class PreparedImage:
+    def __init__(self, data, image_format, width, height, phash, original_size, reencoded=False):
+        self.data = data
+        self.format = image_format
+        self.width = width
+        self.height = height
+        self.phash = phash
+        self.original_size = original_size
+        self.reencoded = reencoded
+
+    @property
+    def mime_type(self):
+        return mime_type(self.format)
+
+
+def _ink_fraction(gray_pixmap):
+    """Share of pixels that differ from the most common gray level (the background)."""
+    # Histogram computed by MuPDF over every pixel: no subsampling, no Python loop
+    levels = {color[0]: n for color, n in gray_pixmap.color_count(colors=True).items()}
+    background = max(levels, key=levels.get)
+    ink = sum(n for level, n in levels.items() if abs(level - background) > IMAGE_BLANK_TOLERANCE)
+    return ink / (gray_pixmap.width * gray_pixmap.height)
+
+def _phash(gray_pixmap):
+    """
+    128-bit difference hash: brightness gradients of a 9x9 thumbnail, row-wise
+    and column-wise (row-wise alone cannot tell horizontally uniform images apart).
+    """
+    import fitz
+    thumb = fitz.Pixmap(gray_pixmap, 9, 9)
+    px = thumb.samples
+    bits = 0
+    for y in range(8):
+        for x in range(8):
+            bits = (bits << 1) | (px[y * 9 + x] > px[y * 9 + x + 1])
+            bits = (bits << 1) | (px[y * 9 + x] > px[(y + 1) * 9 + x])
+    return bits
+
+def prepare_image(image_bytes, ext=None):
+    """
+    Returns a PreparedImage, or None if the image should be dropped.
+    Images PyMuPDF cannot decode are passed through unchanged (no hash).
+    """
+    image_format = detect_format(image_bytes, default=ext or "png")
+    if not IMAGE_PREP_ENABLED:
+        return PreparedImage(image_bytes, image_format, 0, 0, None, len(image_bytes))
+    if len(image_bytes) < IMAGE_MIN_BYTES:
+        return None
+
+    import fitz
+    try:
+        pix = fitz.Pixmap(image_bytes)
+    except Exception as e:
+        logger.debug(f"Could not decode {image_format} image, passing it through: {e}")
+        return PreparedImage(image_bytes, image_format, 0, 0, None, len(image_bytes))
+
+    # 1. Size filter
+    width, height = pix.width, pix.height
+    if min(width, height) < IMAGE_MIN_SIDE:
+        return None
+
+    # 2. Blank filter: near-uniform images (solid fills, empty frames)
+    # Normalise to plain gray/RGB (drops alpha, converts CMYK)
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    if pix.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    gray = pix if pix.n == 1 else fitz.Pixmap(fitz.csGRAY, pix)
+    if _ink_fraction(gray) < IMAGE_MIN_INK:
+        return None
+
+    # 3. Downscale / re-encode
+    data = image_bytes
+    scale = IMAGE_MAX_DIM / max(width, height)
+    if scale < 1 or image_format not in VISION_FORMATS:
+        if scale < 1:
+            width, height = max(1, int(width * scale)), max(1, int(height * scale))
+            pix = fitz.Pixmap(pix, width, height)
+        # Photos stay JPEG; everything else (diagrams, scans, exotic formats) becomes PNG
+        if image_format == "jpeg":
+            data = pix.tobytes("jpeg", jpg_quality=IMAGE_JPEG_QUALITY)
+        else:
+            data, image_format = pix.tobytes("png"), "png"
+
+    return PreparedImage(data, image_format, width, height, _phash(gray), len(image_bytes),
+                         reencoded=data is not image_bytes)
+
+
+class NearDuplicateIndex:
+    """
+    Perceptual hashes seen so far in one document. find() returns the value stored
+    for the closest earlier image within max_distance bits, or None.
+    """
+    def __init__(self, max_distance=IMAGE_DEDUP_DISTANCE):
+        self.max_distance = max_distance
+        self._entries = []
+
+    def find(self, phash):
+        if phash is None:
+            return None
+        best, best_distance = None, self.max_distance + 1
+        for other, value in self._entries:
+            distance = bin(phash ^ other).count("1")
+            if distance < best_distance:
+                best, best_distance = value, distance
+        return best
+
+    def add(self, phash, value):
+        if phash is not None:
+            self._entries.append((phash, value))
@@ -1,31 +1,38 @@
 import os
-import fitz
+import re
+import json
 import base64
+import logging
 # import time
-import boto3
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from common.secrets import load_config
+from concurrent.futures import ThreadPoolExecutor
+from common.resources import get_llm, get_s3_client, LLM_MODEL
+from common.image_cache import get_description_cache
+from common.tracing import span, count, add_bytes, record_llm_usage
+from common.image_prep import detect_format, mime_type, NearDuplicateIndex
+from common.assets import AssetUploader
+from common.extract import iter_pages
+from common.chunker import StreamingChunker
+from common.rate_limit import call_with_limits
+
+logger = logging.getLogger(__name__)
 
 # --- CONFIGURATION ---
-try:
-    CONFIG = load_config()
-    GOOGLE_API_KEY = CONFIG["GOOGLE_API_KEY"]
-except Exception:
-    # print(f"Config Error in Ingest: {e}")
-    GOOGLE_API_KEY = None
-
-llm = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash", 
-    google_api_key=GOOGLE_API_KEY,
-    temperature=0
-)
+# Credentials and clients come from the shared registry in common.resources
+VISION_MODEL = LLM_MODEL
 
 USE_S3 = os.getenv("UPLOAD_TO_S3", "false").lower() == "true"
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
-if USE_S3:
-    s3_client = boto3.client('s3')
+
+# Max in-flight Gemini vision requests per document
+VISION_CONCURRENCY = int(os.getenv("VISION_CONCURRENCY", "8"))
+# Images packed into one vision prompt (1 = one request per image), and the
+# cap on their combined size (Gemini rejects inline requests above 20 MB)
+VISION_BATCH_SIZE = int(os.getenv("VISION_BATCH_SIZE", "10"))
+VISION_BATCH_MAX_BYTES = int(os.getenv("VISION_BATCH_MAX_BYTES", str(12 * 1024 * 1024)))
+# Pages extracted, described and flushed together by the streaming pipeline
+PAGE_BATCH_SIZE = int(os.getenv("INGEST_PAGE_BATCH", "20"))
+# Characters of document text sent to generate_doc_metadata
+METADATA_SAMPLE_CHARS = 4000
 
 def generate_doc_metadata(text):
     """
@@ -37,7 +44,7 @@ def generate_doc_metadata(text):
     2. Identify specific outside topics or documents this text infers a need for to be fully understood.
     3. List any explicit filenames mentioned.
 
-    Text: {text[:4000]}...
+    Text: {text[:METADATA_SAMPLE_CHARS]}...
 
     Format your response exactly as:
     SUMMARY: <summary>
@@ -45,7 +52,9 @@ def generate_doc_metadata(text):
     EXPLICIT: <comma_separated_filenames_or_NONE>
     """
     try:
-        response = llm.invoke(prompt)
+        with span("metadata"):
+            response = call_with_limits(lambda: get_llm(VISION_MODEL).invoke(prompt))
+        record_llm_usage(response)
         content = response.content
         
         # Simple parsing
@@ -61,48 +70,324 @@ def save_image(image_bytes, filename_base, page_num, img_index, image_ext):
     filename = f"{filename_base}_p{page_num}_img{img_index}.{image_ext}"
     if USE_S3:
         s3_key = f"assets/{filename_base}/{filename}"
-        s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=s3_key, Body=image_bytes, ContentType=f"image/{image_ext}")
+        with span("save_image"):
+            get_s3_client().put_object(Bucket=S3_BUCKET_NAME, Key=s3_key, Body=image_bytes, ContentType=mime_type(image_ext))
+        add_bytes("uploaded", len(image_bytes))
         return f"s3://{S3_BUCKET_NAME}/{s3_key}"
     return f"local_assets/{filename}"
 
-def analyze_image(image_bytes):
+def _image_part(image_bytes, image_mime_type=None):
+    image_mime_type = image_mime_type or mime_type(detect_format(image_bytes, default="png"))
     img_base64 = base64.b64encode(image_bytes).decode("utf-8")
+    return {"type": "image_url", "image_url": {"url": f"data:{image_mime_type};base64,{img_base64}"}}
+
+def analyze_image(image_bytes, image_mime_type=None):
+    """
+    Asks Gemini for a technical description of a single image.
+    The MIME type is detected from the bytes unless given.
+    Raises on failure so callers can report errors per image.
+    """
+    from langchain_core.messages import HumanMessage
     message = HumanMessage(content=[
         {"type": "text", "text": "Describe this image in detail for a technical RAG system."},
-        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"}}
+        _image_part(image_bytes, image_mime_type)
     ])
+    with span("analyze_image"):
+        response = call_with_limits(lambda: get_llm(VISION_MODEL).invoke([message]))
+    record_llm_usage(response)
+    return response.content
+
+def _parse_batch_response(content, n):
+    """
+    Maps a batched vision answer (JSON list of {"image": 1-based index, "description": ...},
+    possibly inside a code fence) to {index: description}. Malformed entries are skipped.
+    """
+    match = re.search(r"\[.*\]", content, re.DOTALL)
+    if not match:
+        return {}
     try:
-        return llm.invoke([message]).content
-    except Exception:
-        return "Image analysis failed."
+        items = json.loads(match.group(0))
+    except ValueError:
+        return {}
+    descriptions = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        index, description = item.get("image"), item.get("description")
+        if isinstance(index, int) and 1 <= index <= n and isinstance(description, str) and description.strip():
+            descriptions[index - 1] = description.strip()
+    return descriptions
+
+def analyze_images(images):
+    """
+    Describes several images with one Gemini request. Each image is labelled
+    in the prompt and the model answers with one JSON entry per image.
+    Returns one description per image (None where the answer has no usable entry).
+    """
+    from langchain_core.messages import HumanMessage
+    if len(images) == 1:
+        return [analyze_image(images[0])]
+
+    content = [{"type": "text", "text": (
+        f"You are given {len(images)} images from a technical document, labelled Image 1 to Image {len(images)}. "
+        "Describe each image in detail for a technical RAG system, independently of the others.\n"
+        'Respond with only a JSON array, one object per image, in order: '
+        '[{"image": <number>, "description": "<description>"}, ...]'
+    )}]
+    for i, image_bytes in enumerate(images):
+        content.append({"type": "text", "text": f"Image {i + 1}:"})
+        content.append(_image_part(image_bytes))
+
+    with span("analyze_image"):
+        response = call_with_limits(lambda: get_llm(VISION_MODEL).invoke([HumanMessage(content=content)]))
+    record_llm_usage(response)
+    descriptions = _parse_batch_response(response.content, len(images))
+    return [descriptions.get(i) for i in range(len(images))]
+
+def _vision_batches(items, batch_size, max_bytes):
+    """Groups (key, image_bytes) items in document order, so a prompt holds neighbouring images."""
+    batch, size = [], 0
+    for item in items:
+        if batch and (len(batch) >= batch_size or size + len(item[1]) > max_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(item)
+        size += len(item[1])
+    if batch:
+        yield batch
+
+def describe_images(images, max_workers=None, batch_size=None):
+    """
+    Describes all images on a bounded thread pool (max_workers defaults to
+    VISION_CONCURRENCY, read at call time).
+    Identical images are described once, and the content-addressed cache
+    is consulted before any Gemini call. The remaining images go out
+    batch_size at a time (default VISION_BATCH_SIZE) in one prompt each;
+    images a batched answer leaves out are retried one by one.
+    Returns one (description, error) pair per image, in input order.
+    """
+    if not images:
+        return []
+    max_workers = max_workers or VISION_CONCURRENCY
+    batch_size = max(1, batch_size or VISION_BATCH_SIZE)
+
+    cache = get_description_cache(namespace=VISION_MODEL)
+    keys = [cache.key(image_bytes) if cache else str(i) for i, image_bytes in enumerate(images)]
+
+    # 1. Collapse duplicates within the document, keeping the first copy
+    unique = {}
+    for key, image_bytes in zip(keys, images):
+        unique.setdefault(key, image_bytes)
+
+    def _describe_single(key, image_bytes):
+        try:
+            return analyze_image(image_bytes), None
+        except Exception as e:
+            return None, e
+
+    def _describe_batch(batch):
+        try:
+            descriptions = analyze_images([image_bytes for _, image_bytes in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                return [(None, e)]
+            logger.warning(f"⚠️ Batched vision request for {len(batch)} images failed ({e}), retrying one by one")
+            descriptions = [None] * len(batch)
+        out = []
+        for (key, image_bytes), description in zip(batch, descriptions):
+            if description is None:
+                count("vision_batch_misses")
+                out.append(_describe_single(key, image_bytes))
+            else:
+                out.append((description, None))
+        # Stored from the worker thread, so cache writes (S3 PUTs) overlap like the vision calls
+        if cache:
+            for (key, _), (description, error) in zip(batch, out):
+                if error is None:
+                    cache.put(key, description)
+        return out
+
+    count("images", len(images))
+    count("images_unique", len(unique))
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique)))) as pool:
+        # 2. Serve what the cache already knows (lookups run on the pool: one GET each on S3)
+        if cache:
+            for key, cached in zip(unique, pool.map(cache.get, unique)):
+                if cached is not None:
+                    count("image_cache_hits")
+                    results[key] = (cached, None)
+        pending = [(key, image_bytes) for key, image_bytes in unique.items() if key not in results]
+
+        # 3. Describe the rest, several images per request, batches in parallel
+        batches = list(_vision_batches(pending, batch_size, VISION_BATCH_MAX_BYTES))
+        if batches:
+            with span("vision"):
+                for batch, batch_results in zip(batches, pool.map(_describe_batch, batches)):
+                    for (key, _), result in zip(batch, batch_results):
+                        results[key] = result
+
+    if cache:
+        logger.info(f"Image cache: {len(images)} images, {len(unique)} unique, {cache.stats()}")
+    return [results[key] for key in keys]
+
+class TextSample:
+    """
+    Bounded prefix of a document's text for metadata generation.
+    Stops accumulating once max_chars is reached, whatever the page count.
+    """
+    def __init__(self, max_chars=METADATA_SAMPLE_CHARS):
+        self.max_chars = max_chars
+        self._parts = []
+        self._size = 0
+
+    @property
+    def full(self):
+        return self._size >= self.max_chars
+
+    def add(self, text):
+        if self.full:
+            return
+        part = text[:self.max_chars - self._size]
+        self._parts.append(part)
+        self._size += len(part)
+
+    def text(self):
+        return "".join(self._parts)
+
+def _group_pages(pages, batch_pages):
+    batch = []
+    for record in pages:
+        batch.append(record)
+        if batch_pages and len(batch) >= batch_pages:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def iter_page_batches(pdf_path, batch_pages=PAGE_BATCH_SIZE, source=None, start_page=0, end_page=None):
+    """
+    Streams a PDF as lists of content blocks, batch_pages pages at a time
+    (None = the whole document in one batch). Each batch is extracted, its assets saved and its images described
+    before it is yielded; image bytes never outlive their batch.
+    Extraction runs on several processes for large documents (see common.extract).
+    start_page/end_page (0-based, end exclusive) restrict it to one shard of the document.
+    Images go through common.image_prep first: spacers and blank images are dropped,
+    oversized ones downscaled, and near-duplicates reuse the first copy's asset and description.
+    With UPLOAD_TO_S3, assets upload in the background while the batch is being described.
+    """
+    source = source or pdf_path
+    filename_base = os.path.basename(pdf_path).replace(".pdf", "")
+
+    # Perceptual hashes of the document's described images -> their blocks
+    near_duplicates = NearDuplicateIndex()
+    uploader = AssetUploader(S3_BUCKET_NAME, filename_base) if USE_S3 else None
+
+    try:
+        for batch in _group_pages(iter_pages(pdf_path, start=start_page, end=end_page), batch_pages):
+            content_blocks = []
+            pending_images = []
+            uploads = []
+            duplicates = []
+
+            # 1. Turn extracted pages into blocks (image blocks are filled in after the vision stage)
+            for record in batch:
+                page_num = record["page"]
+                count("pages")
+                if record["text"].strip():
+                    content_blocks.append({"type": "text", "content": record["text"], "page": page_num, "source": source})
+
+                for image in record["images"]:
+                    add_bytes("images", image["raw_size"])
+                    prepared = image["prepared"]
+                    if prepared is None:
+                        # Logged one by one, so a wrongly dropped figure can be traced back
+                        logger.info(f"🗑️ Dropped image {image['image_index']} (xref {image['xref']}) on page {page_num} "
+                                    f"of {source}: too small or blank")
+                        count("images_dropped")
+                        continue
+
+                    block = {"type": "image_description", "content": None, "image_path": None, "page": page_num, "image_index": image["image_index"], "source": source}
+                    content_blocks.append(block)
+                    original = near_duplicates.find(prepared.phash)
+                    if original is not None:
+                        count("images_near_duplicate")
+                        duplicates.append((block, original))
+                        continue
+
+                    if prepared.reencoded:
+                        count("images_reencoded")
+                    add_bytes("images_prepared", len(prepared.data))
+                    if uploader:
+                        uploads.append((block, uploader.submit(prepared.data, prepared.format)))
+                    else:
+                        block["image_path"] = save_image(prepared.data, filename_base, page_num, image["image_index"], prepared.format)
+                    near_duplicates.add(prepared.phash, block)
+                    pending_images.append((block, prepared.data))
+
+            # 2. Describe the batch's images in parallel (uploads keep running meanwhile)
+            results = describe_images([image_bytes for _, image_bytes in pending_images])
+
+            # 3. Wait for the batch's uploads and fill in the asset URIs
+            if uploader:
+                uploader.flush()
+                for block, ref in uploads:
+                    block["image_path"] = ref.uri
+                    if ref.error is not None:
+                        block["asset_error"] = str(ref.error)
+
+            for (block, _), (description, error) in zip(pending_images, results):
+                if error is None:
+                    block["content"] = f"[IMAGE]: {description}"
+                else:
+                    block["type"] = "image_error"
+                    block["content"] = ""
+                    block["error"] = str(error)
+                    logger.warning(f"⚠️ Vision failed for {block['image_path']}: {error}")
+            for block, original in duplicates:
+                block["image_path"] = original["image_path"]
+                block["type"], block["content"] = original["type"], original["content"]
+                if "error" in original:
+                    block["error"] = original["error"]
+
+            yield content_blocks
+    finally:
+        if uploader:
+            uploader.close()
 
 def process_pdf(pdf_path):
-    doc = fitz.open(pdf_path)
+    """
+    Non-streaming wrapper: returns every content block plus the document metadata.
+    Prefer common.pipeline.ingest_document for large files.
+    """
     content_blocks = []
-    full_text = ""
-    filename_base = os.path.basename(pdf_path).replace(".pdf", "")
+    sample = TextSample()
+    for batch in iter_page_batches(pdf_path, batch_pages=None):
+        for block in batch:
+            if block["type"] == "text":
+                sample.add(block["content"])
+        content_blocks.extend(batch)
 
-    for page_num, page in enumerate(doc):
-        text = page.get_text()
-        full_text += text
-        if text.strip():
-            content_blocks.append({"type": "text", "content": text, "page": page_num + 1, "source": pdf_path})
-        
-        for img_index, img in enumerate(page.get_images(full=True)):
-            image_bytes = doc.extract_image(img[0])["image"]
-            image_path = save_image(image_bytes, filename_base, page_num + 1, img_index + 1, "png")
-            description = analyze_image(image_bytes)
-            content_blocks.append({"type": "image_description", "content": f"[IMAGE]: {description}", "image_path": image_path, "page": page_num + 1, "source": pdf_path})
-            
     # Generate Semantic Metadata
-    summary, needs, explicit = generate_doc_metadata(full_text)
+    summary, needs, explicit = generate_doc_metadata(sample.text())
     return content_blocks, summary, needs, explicit
 
-def chunk_content(content_blocks):
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
-    final_chunks = []
-    for block in content_blocks:
-        chunks = splitter.split_text(block["content"])
-        for c in chunks:
-            final_chunks.append({"text": c, "metadata": {"source": block["source"], "page": block["page"]}})
+def chunk_content(content_blocks, chunker=None):
+    """
+    Chunks a list of content blocks (see common.chunker). With the `chunker` of
+    a document that is streamed batch by batch, text after the last complete
+    chunk carries over to the next batch (call chunker.flush() after the last
+    one). Without one, content_blocks are the whole document.
+    """
+    whole_document = chunker is None
+    chunker = chunker or StreamingChunker()
+    with span("chunk"):
+        # Failed image analyses are reported on the block, not embedded
+        errors = sum(1 for block in content_blocks if block["type"] == "image_error")
+        if errors:
+            count("image_errors", errors)
+        final_chunks = list(chunker.feed(content_blocks))
+        if whole_document:
+            final_chunks.extend(chunker.flush())
+    count("chunks", len(final_chunks))
     return final_chunks
\ No newline at end of file
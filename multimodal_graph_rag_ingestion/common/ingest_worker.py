@@ -1,50 +1,80 @@
+import os
 import json
-from common.graph_manager import GraphManager
+import uuid
+from common.graph_store import get_graph_store
+from common.resources import get_s3_client
+from common.tracing import start_trace, finish_trace, span, add_bytes
 import logging
 
 logger = logging.getLogger(__name__)
 
 def handler(event, context):
     """
-    STEP 2: TARGETED LINKING WORKER
-    Triggered by Step Function after IngestWorker (or Choice state).
-    Input: { "filename": "example.pdf", "status": "ingested" }
+    STEP 1: INGEST OR DELETE WORKER
+    Triggered by Step Function on S3 EventBridge events.
+    Input: { "detail-type": "Object Created" | "Object Deleted",
+             "detail": { "bucket": { "name": ... }, "object": { "key": "docs/example.pdf" } } }
+    Output: { "filename": "example.pdf", "status": "ingested" | "deleted", "trace": {...} }
+        or, for PDFs above SHARD_THRESHOLD_PAGES, the shard plan for the Map state:
+            { "filename": ..., "status": "needs_sharding", "run_id": ..., "shards": [...] }
     """
-    logger.info(f"Linker Worker Received: {json.dumps(event)}")
-    
-    # Extract filename from the output of the IngestWorker
-    filename = event.get("filename")
-    status = event.get("status")
-    
-    # If the file was deleted, the Choice state should have skipped this,
-    # but we add a safety check here just in case.
-    if status == "deleted":
-        logger.info(f"File {filename} was deleted. Skipping linking phase.")
-        return {"status": "skipped", "filename": filename}
-    
-    if not filename:
-        logger.error("Error: No filename found in event payload.")
-        return {"status": "error", "message": "Missing filename"}
+    logger.info(f"Ingest Worker Received: {json.dumps(event)}")
+
+    detail = event.get("detail", {})
+    bucket = detail.get("bucket", {}).get("name")
+    key = detail.get("object", {}).get("key")
+
+    if not bucket or not key:
+        logger.error("Error: No S3 bucket/key found in event payload.")
+        return {"status": "error", "message": "Missing S3 object"}
+
+    filename = os.path.basename(key)
+    start_trace("IngestWorker")
+    # Wraps the pooled driver: warm invocations skip connection setup
+    gm = get_graph_store()
 
     try:
-        # Initialize GraphManager (fetches credentials from Secrets Manager)
-        gm = GraphManager()
-        
-        # Execute the surgical update:
-        # 1. Links THIS file to others (Outbound)
-        # 2. Links others to THIS file (Inbound/Repair)
-        # 3. Uses both Explicit names and Semantic Summaries
-        gm.run_targeted_linker(filename)
-        
-        gm.close()
-        
-        logger.info(f"Linking phase complete for {filename}")
-        return {
-            "status": "linking_complete",
-            "filename": filename
-        }
+        # Auto-Prune: the object is gone, so tombstone its nodes and stop here
+        # (chunks and assets/<name>/ are purged by the scheduled GcWorker)
+        if event.get("detail-type") == "Object Deleted":
+            gm.delete_document_data(filename, asset_bucket=bucket)
+            logger.info(f"Removed {filename} from the graph.")
+            return finish_trace({"status": "deleted", "filename": filename})
+
+        # The pipeline pulls in PyMuPDF/LangChain/NumPy, so only load it on the ingest path
+        from common.pipeline import ingest_document
+
+        # Download into Lambda scratch space and stream it through the pipeline
+        local_path = os.path.join("/tmp", filename)
+        with span("download"):
+            get_s3_client().download_file(bucket, key, local_path)
+        add_bytes("pdf", os.path.getsize(local_path))
+        try:
+            # Too big for one invocation: plan shards and let the state machine fan out
+            import fitz
+            from common.sharding import SHARD_THRESHOLD_PAGES, build_plan
+            with fitz.open(local_path) as doc:
+                page_count = doc.page_count
+            if page_count > SHARD_THRESHOLD_PAGES:
+                run_id = getattr(context, "aws_request_id", None) or uuid.uuid4().hex
+                plan = build_plan(bucket, key, filename, page_count, run_id)
+                logger.info(f"🧩 {filename}: {page_count} pages, fanning out {len(plan['shards'])} shards")
+                return finish_trace({**plan, "bucket": bucket})
+
+            # Picks up where a timed-out or crashed attempt on the same file stopped
+            from common.checkpoint import open_checkpoint
+            checkpoint = open_checkpoint(local_path, filename)
+            stats = ingest_document(local_path, filename, gm, source=f"s3://{bucket}/{key}", checkpoint=checkpoint)
+        finally:
+            os.remove(local_path)
+
+        return finish_trace({"status": "ingested", "filename": filename, **stats})
 
     except Exception as e:
-        logger.error(f"Linking Worker Critical Failure: {str(e)}")
+        logger.error(f"Ingest Worker Critical Failure: {str(e)}")
         # Raise exception to trigger Step Function Retry/Fail logic
-        raise e
\ No newline at end of file
+        raise e
+    finally:
+        gm.close()
+        # Still emits the metrics when the ingest failed (no-op after a normal return)
+        finish_trace()
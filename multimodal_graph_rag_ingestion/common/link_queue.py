@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+# Failed linker passes allowed while narrowing a failing SQS batch down to the bad filenames
+LINK_ISOLATION_BUDGET = int(os.getenv("LINK_ISOLATION_BUDGET", "32"))
+# How long a pending filename waits for others to coalesce with, and the max batch per drain
+LINK_WINDOW_SECONDS = float(os.getenv("LINK_WINDOW_SECONDS", "30"))
+LINK_MAX_BATCH = int(os.getenv("LINK_MAX_BATCH", "1000"))
+LINK_QUEUE_URL = os.getenv("LINK_QUEUE_URL")
+
+
+class LinkQueue:
+    """
+    Queue of filenames waiting to be linked. Repeated enqueues of the same
+    filename inside one window collapse into a single link request.
+    """
+    def enqueue(self, filename):
+        raise NotImplementedError
+
+    def drain(self, force=False):
+        """Returns the next batch of distinct filenames that are due (all pending if force), or []."""
+        raise NotImplementedError
+
+
+class InMemoryLinkQueue(LinkQueue):
+    """
+    Local implementation for tests and single-process runs (e.g. backfills).
+    A batch is due once its oldest entry has waited window_seconds, or as soon
+    as max_batch distinct filenames are pending.
+    """
+    def __init__(self, window_seconds=LINK_WINDOW_SECONDS, max_batch=LINK_MAX_BATCH, clock=time.monotonic):
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self.clock = clock
+        self._pending = {}  # filename -> first enqueue time (insertion ordered)
+        self._lock = threading.Lock()
+
+    def enqueue(self, filename):
+        with self._lock:
+            self._pending.setdefault(filename, self.clock())
+
+    def __len__(self):
+        return len(self._pending)
+
+    def drain(self, force=False):
+        with self._lock:
+            if not self._pending:
+                return []
+            oldest = next(iter(self._pending.values()))
+            if not force and len(self._pending) < self.max_batch and self.clock() - oldest < self.window_seconds:
+                return []
+            batch = list(self._pending)[:self.max_batch]
+            for filename in batch:
+                del self._pending[filename]
+            return batch
+
+
+class SQSLinkQueue(LinkQueue):
+    """
+    Production queue. Coalescing happens in the SQS event source mapping
+    (MaximumBatchingWindowInSeconds), which hands link_worker one batch of
+    messages; use filenames_from_sqs_event to collapse it.
+    """
+    def __init__(self, queue_url=LINK_QUEUE_URL, client=None):
+        if not queue_url:
+            raise ValueError("SQS link queue requires LINK_QUEUE_URL")
+        if client is None:
+            import boto3
+            client = boto3.client("sqs")
+        self.queue_url = queue_url
+        self.client = client
+
+    def enqueue(self, filename):
+        self.client.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps({"filename": filename}))
+
+    def drain(self, force=False):
+        raise NotImplementedError("SQS batches are delivered to link_worker by the event source mapping")
+
+
+def message_ids_by_filename(event):
+    """
+    Distinct filenames of an SQS batch (in arrival order) -> the message ids that asked for them.
+    Malformed records are skipped, so they are deleted rather than redelivered.
+    """
+    messages = {}
+    for record in event.get("Records", []):
+        try:
+            body = json.loads(record["body"])
+        except (KeyError, ValueError):
+            logger.warning(f"Skipping malformed link request: {record.get('messageId')}")
+            continue
+        if body.get("filename"):
+            messages.setdefault(body["filename"], []).append(record.get("messageId"))
+    return messages
+
+def filenames_from_sqs_event(event):
+    """
+    Distinct filenames from an SQS batch, in arrival order.
+    """
+    return list(message_ids_by_filename(event))
+
+def link_isolating_failures(gm, filenames, budget=LINK_ISOLATION_BUDGET):
+    """
+    Links a batch in one set-based pass. If that fails, splits it in halves
+    (recursively) so one bad filename does not fail the rest of the batch.
+    After `budget` failed passes (e.g. the database is down) the unresolved
+    groups are given up on as a whole.
+    Returns (link counts, filenames that could not be linked).
+    """
+    totals = {"outbound": 0, "inbound": 0}
+    failed = []
+    pending = [filenames]
+    failures = 0
+    while pending:
+        group = pending.pop()
+        if failures >= budget:
+            failed.extend(group)
+            continue
+        try:
+            links = gm.run_batch_linker(group)
+            totals["outbound"] += links["outbound"]
+            totals["inbound"] += links["inbound"]
+        except Exception as e:
+            failures += 1
+            if len(group) == 1:
+                logger.error(f"Linking failed for {group[0]}: {e}")
+                failed.extend(group)
+            else:
+                half = len(group) // 2
+                pending.extend([group[half:], group[:half]])
+    return totals, failed
+
+def drain_and_link(queue, gm, force=False):
+    """
+    Links one due batch from a local queue in a single set-based pass.
+    Returns the link counts, or None if nothing was due.
+    """
+    batch = queue.drain(force=force)
+    if not batch:
+        return None
+    logger.info(f"Coalesced {len(batch)} link requests")
+    return gm.run_batch_linker(batch)
@@ -1,5 +1,7 @@
 import json
-from common.graph_manager import GraphManager
+from common.graph_store import get_graph_store
+from common.link_queue import message_ids_by_filename, link_isolating_failures
+from common.tracing import start_trace, finish_trace, count
 import logging
 
 logger = logging.getLogger(__name__)
@@ -7,33 +9,60 @@ logger = logging.getLogger(__name__)
 def handler(event, context):
     """
     STEP 2: TARGETED LINKING WORKER
-    Triggered by Step Function after IngestWorker (or Choice state).
-    Input: { "filename": "example.pdf", "status": "ingested", ... }
+    Triggered by the SQS link queue, which the Step Function feeds after IngestWorker.
+    The event source mapping coalesces an upload burst into one batch of records,
+    linked together in a single set-based pass.
+    Input: { "Records": [ { "body": "{\"filename\": \"example.pdf\"}" }, ... ] }
+       or: { "filename": "example.pdf", "status": "ingested", ... } (direct invoke)
+    For SQS batches, filenames that fail to link are returned as batchItemFailures
+    (ReportBatchItemFailures), so only their messages are redelivered and,
+    after maxReceiveCount, moved to the dead-letter queue.
     """
     logger.info(f"🔗 Linker Worker Received: {json.dumps(event)}")
-    
-    # The filename comes from the output of the previous 'IngestDocument' task
-    filename = event.get("filename")
-    
-    if not filename:
+
+    messages = None
+    if "Records" in event:
+        messages = message_ids_by_filename(event)
+        filenames = list(messages)
+    else:
+        # The filename comes from the output of the previous 'IngestDocument' task
+        filenames = [event["filename"]] if event.get("filename") else []
+
+    if not filenames:
         logger.error("Error: No filename found in event payload.")
         return {"status": "error", "message": "Missing filename"}
 
+    start_trace("LinkWorker")
+    count("documents", len(filenames))
     try:
-        gm = GraphManager()
-        
-        # Perform the surgical update
-        gm.run_targeted_linker(filename)
-        
+        # Wraps the pooled driver: warm invocations skip connection setup
+        gm = get_graph_store()
+
+        # Perform the surgical update for the whole batch:
+        # 1. Links THESE files to others (Outbound)
+        # 2. Links others to THESE files (Inbound/Repair)
+        if messages is None:
+            links = gm.run_batch_linker(filenames)
+            failed = []
+        else:
+            links, failed = link_isolating_failures(gm, filenames)
+
         gm.close()
-        
-        return {
+
+        result = {
             "status": "linking_complete",
-            "filename": filename,
+            "filenames": filenames,
+            "links": links,
             "processed_at": "datetime_placeholder" # You can add real timestamp if needed
         }
+        if messages is not None:
+            count("link_failures", len(failed))
+            result["batchItemFailures"] = [{"itemIdentifier": message_id}
+                                           for filename in failed for message_id in messages[filename]]
+        return finish_trace(result)
 
     except Exception as e:
         logger.error(f"Linking Worker Critical Failure: {str(e)}")
-        # Raise exception to trigger Step Function Retry/Fail logic
-        raise e
\ No newline at end of file
+        finish_trace()
+        # Raise so SQS redelivers the batch (or Step Function Retry/Fail on direct invoke)
+        raise e
@@ -1,81 +1,72 @@
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_neo4j import Neo4jVector
-from langchain_core.documents import Document as LangChainDocument
-from neo4j import GraphDatabase
-from common.secrets import load_config
+from common.resources import get_embedder
+from common.graph_store import get_graph_store
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
 
-# --- CONFIGURATION ---
-try:
-    CONFIG = load_config()
-    GOOGLE_API_KEY = CONFIG["GOOGLE_API_KEY"]
-    URI = CONFIG["NEO4J_URI"]
-    AUTH = (CONFIG["NEO4J_USERNAME"], CONFIG["NEO4J_PASSWORD"])
-except Exception as e:
-    logger.warning(f"Config Error in Loader: {e}")
-    GOOGLE_API_KEY, URI, AUTH = None, None, None
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
-# Using 3.13 compatible model
-embeddings = GoogleGenerativeAIEmbeddings(
-    model="models/text-embedding-004",
-    google_api_key=GOOGLE_API_KEY
-)
+def assign_chunk_ids(chunks, filename, occurrences, start_index=0):
+    """
+    Stamps each chunk with a content hash, its chunk_index and a stable id.
+    The id depends only on the document, the text and how many identical
+    chunks preceded it, so unchanged chunks keep their id across re-ingests.
+    `occurrences` (hash -> count) must be shared across a document's batches.
+    """
+    for i, chunk_data in enumerate(chunks):
+        digest = content_hash(chunk_data["text"])
+        n = occurrences.get(digest, 0)
+        occurrences[digest] = n + 1
+        chunk_data["id"] = content_hash(f"{filename}\x00{digest}\x00{n}")
+        chunk_data["metadata"]["content_hash"] = digest
+        chunk_data["metadata"]["chunk_index"] = start_index + i
+    return chunks
 
-def store_in_graph(chunks, filename):
+def store_in_graph(chunks, filename, start_index=0, gm=None):
     """
     1. Embeds text chunks.
     2. Stores them as Vector nodes.
     3. Connects Chunks to the Parent Document node.
+    Steps 2 and 3 run together in batched UNWIND transactions (GraphStore.write_chunks).
+    start_index offsets chunk_index when a document is written in batches;
+    chunks stamped by assign_chunk_ids keep their own index and id.
     """
     logger.info(f"Vectorizing {len(chunks)} chunks for '{filename}'...")
 
-    if not URI or not AUTH:
-        raise ValueError("Cannot store vectors: Missing Database Credentials")
+    if not chunks:
+        return
+    if any("id" not in chunk_data for chunk_data in chunks):
+        assign_chunk_ids(chunks, filename, {}, start_index=start_index)
 
-    # 1. Convert dictionary chunks to LangChain Documents
-    langchain_docs = []
+    # 1. Prepare texts and metadata
+    texts = []
     for i, chunk_data in enumerate(chunks):
         metadata = chunk_data["metadata"]
-        metadata["chunk_index"] = i
+        metadata.setdefault("chunk_index", start_index + i)
         metadata["parent_doc"] = filename
-        
-        langchain_docs.append(
-            LangChainDocument(
-                page_content=chunk_data["text"],
-                metadata=metadata
-            )
-        )
+        texts.append(chunk_data["text"])
+
+    # 2. Embed through the cache (cost scales with unique, unseen text);
+    #    chunks embedded upstream (e.g. by a shard worker) keep their vector
+    embeddings = [chunk_data.get("embedding") for chunk_data in chunks]
+    missing = [i for i, vector in enumerate(embeddings) if vector is None]
+    if missing:
+        vectors = get_embedder().embed_texts([texts[i] for i in missing])
+        for i, vector in zip(missing, vectors.tolist()):
+            embeddings[i] = vector
 
-    # 2. Batch Insert Vectors (Modern LangChain-Neo4j Integration)
+    # 3. Bulk write Chunk nodes, embeddings and HAS_CHUNK edges
+    gm = gm or get_graph_store()
     try:
-        Neo4jVector.from_documents(
-            langchain_docs,
-            embeddings,
-            url=URI,
-            username=AUTH[0],
-            password=AUTH[1],
-            index_name="vector_index",
-            node_label="Chunk",
-            text_node_property="text",
-            embedding_node_property="embedding"
-        )
-        
-        # 3. Link Parent Document -> Child Chunks
-        with GraphDatabase.driver(URI, auth=AUTH) as driver:
-            with driver.session() as session:
-                session.run(
-                    """
-                    MATCH (d:Document {id: $filename})
-                    MATCH (c:Chunk)
-                    WHERE c.parent_doc = $filename
-                    MERGE (d)-[:HAS_CHUNK]->(c)
-                    """,
-                    filename=filename
-                )
+        rows = [
+            {"id": chunk_data["id"], "text": chunk_data["text"], "metadata": chunk_data["metadata"], "embedding": vector}
+            for chunk_data, vector in zip(chunks, embeddings)
+        ]
+        gm.write_chunks(filename, rows)
         logger.info("Vector Storage and Parent-Child Linking Complete.")
 
     except Exception as e:
         logger.error(f"Error during vector storage: {e}")
-        raise e
\ No newline at end of file
+        raise e
@@ -0,0 +1,453 @@
+"""
+In-process graph + vector store (GRAPH_BACKEND=local).
+
+1. Chunk, summary and need embeddings live in growable float32 matrices of unit
+   vectors (VectorIndex); a top-k query is one matrix-vector product plus an
+   argpartition.
+2. HAS_CHUNK, HAS_NEED and REFERENCES are plain adjacency dicts.
+3. save() writes the matrices as .npy files next to a JSON file with the rest;
+   open() memory-maps them back, so a large snapshot loads in milliseconds and
+   is only copied into memory once it is written to.
+
+Linking follows GraphManager.run_batch_linker: same top-k, threshold and Neo4j
+cosine score ((1 + cos) / 2), same explicit-ref rules. Candidates are exact
+(brute force) instead of coming from the full-text indexes.
+"""
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+import numpy as np
+from common.graph_store import GraphStore
+from common.graph_manager import LINK_TOP_K, LINK_SIMILARITY_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+_INDEXES = ("chunks", "summaries", "needs")
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class VectorIndex:
+    """
+    id -> unit-norm float32 row. Deleted rows are masked out and reused.
+    search() returns Neo4j-style cosine scores in [0, 1].
+    """
+    def __init__(self, ids=None, matrix=None):
+        self.ids = list(ids or [])
+        self.rows = {id_: row for row, id_ in enumerate(self.ids)}
+        self.matrix = matrix
+        self.size = len(self.ids)
+        self.live = np.ones(self.size, dtype=bool)
+        self.free = []
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, id_):
+        return id_ in self.rows
+
+    def _ensure_capacity(self, dim):
+        if self.matrix is None:
+            self.matrix = np.zeros((64, dim), dtype=np.float32)
+            self.live = np.zeros(64, dtype=bool)
+        elif isinstance(self.matrix, np.memmap) or self.size >= len(self.matrix):
+            # Memory-mapped snapshots are read-only: copy on first write, doubling as we go
+            capacity = max(64, len(self.matrix) * 2 if self.size >= len(self.matrix) else len(self.matrix))
+            matrix = np.zeros((capacity, self.matrix.shape[1]), dtype=np.float32)
+            matrix[:self.size] = self.matrix[:self.size]
+            live = np.zeros(capacity, dtype=bool)
+            live[:self.size] = self.live[:self.size]
+            self.matrix, self.live = matrix, live
+
+    def put(self, id_, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        self._ensure_capacity(len(vector))
+        row = self.rows.get(id_)
+        if row is None:
+            if self.free:
+                row = self.free.pop()
+                self.ids[row] = id_
+            else:
+                row = self.size
+                self.size += 1
+                self.ids.append(id_)
+            self.rows[id_] = row
+        self.matrix[row] = vector / norm if norm else vector
+        self.live[row] = True
+
+    def remove(self, id_):
+        row = self.rows.pop(id_, None)
+        if row is None:
+            return
+        self._ensure_capacity(self.matrix.shape[1])
+        self.ids[row] = None
+        self.live[row] = False
+        self.free.append(row)
+
+    def vector(self, id_):
+        return self.matrix[self.rows[id_]]
+
+    def search_many(self, queries, k):
+        """Top-k per query row: [[(id, score), ...], ...], best first."""
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        if not len(self) or not len(queries):
+            return [[] for _ in range(len(queries))]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = (queries / np.where(norms == 0, 1, norms)) @ self.matrix[:self.size].T
+        scores[:, ~self.live[:self.size]] = -np.inf
+        k = min(k, len(self))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for q, candidates in enumerate(top):
+            order = candidates[np.argsort(-scores[q, candidates])]
+            results.append([(self.ids[i], float((1 + scores[q, i]) / 2)) for i in order])
+        return results
+
+    def search(self, query, k):
+        return self.search_many(query, k)[0]
+
+    def compact(self):
+        """(ids, matrix) of the live rows only."""
+        rows = np.flatnonzero(self.live[:self.size])
+        dim = self.matrix.shape[1] if self.matrix is not None else 0
+        matrix = self.matrix[rows] if len(rows) else np.empty((0, dim), dtype=np.float32)
+        return [self.ids[i] for i in rows], np.ascontiguousarray(matrix, dtype=np.float32)
+
+
+class LocalGraphStore(GraphStore):
+    """
+    GraphStore kept in process memory. Thread-safe (one lock); deletes take
+    effect immediately, so collect_garbage only reports what was deleted.
+    """
+    def __init__(self, path=None, top_k=LINK_TOP_K, threshold=LINK_SIMILARITY_THRESHOLD):
+        self.path = path
+        self.top_k = top_k
+        self.threshold = threshold
+        self.documents = {}   # id -> properties
+        self.chunks = {}      # id -> properties (metadata + text)
+        self.has_chunk = {}   # document id -> {chunk id}
+        self.chunk_owner = {} # chunk id -> document id
+        self.needs = {}       # document id -> [need id]
+        self.need_owner = {}  # need id -> document id
+        self.references = {}  # source id -> {target id: properties}
+        self.index = {name: VectorIndex() for name in _INDEXES}
+        self.generation = 0  # see GraphStore.corpus_generation
+        self._purged = []
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def _round_trip(self):
+        """Called once per logical request; benchmarks hook simulated latency in here."""
+        pass
+
+    # --- Persistence ---
+    @classmethod
+    def open(cls, path=None, mmap=True, **kwargs):
+        """Store backed by snapshot directory `path` (loaded if present)."""
+        store = cls(path=path, **kwargs)
+        if path and os.path.exists(os.path.join(path, "graph.json")):
+            store.load(path, mmap=mmap)
+        return store
+
+    def load(self, path, mmap=True):
+        with open(os.path.join(path, "graph.json")) as f:
+            state = json.load(f)
+        if state.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported local graph snapshot version {state.get('version')}")
+        with self._lock:
+            self.documents = state["documents"]
+            self.chunks = state["chunks"]
+            self.has_chunk = {d: set(ids) for d, ids in state["has_chunk"].items()}
+            self.chunk_owner = {c: d for d, ids in self.has_chunk.items() for c in ids}
+            self.needs = state["needs"]
+            self.need_owner = {n: d for d, ids in self.needs.items() for n in ids}
+            self.references = state["references"]
+            self.generation = state.get("generation", 0)
+            for name in _INDEXES:
+                matrix_path = os.path.join(path, f"{name}.npy")
+                matrix = np.load(matrix_path, mmap_mode="r" if mmap else None) if state["indexes"][name] else None
+                self.index[name] = VectorIndex(state["indexes"][name], matrix)
+            self._dirty = False
+        logger.info(f"📂 Loaded local graph from {path}: {len(self.documents)} documents, {len(self.chunks)} chunks")
+
+    def save(self, path=None):
+        """
+        Snapshot to `path` (default: the store's own). The .npy files go first and
+        graph.json last, each via write-then-rename, so a crash keeps the old snapshot readable.
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("No snapshot path (set LOCAL_GRAPH_PATH)")
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            indexes = {}
+            for name in _INDEXES:
+                ids, matrix = self.index[name].compact()
+                indexes[name] = ids
+                with open(os.path.join(path, f"{name}.npy.tmp"), "wb") as f:
+                    np.save(f, matrix)
+                os.replace(os.path.join(path, f"{name}.npy.tmp"), os.path.join(path, f"{name}.npy"))
+            state = {
+                "version": SNAPSHOT_VERSION,
+                "documents": self.documents,
+                "chunks": self.chunks,
+                "has_chunk": {d: sorted(ids) for d, ids in self.has_chunk.items()},
+                "needs": self.needs,
+                "references": self.references,
+                "indexes": indexes,
+                "generation": self.generation,
+            }
+            with open(os.path.join(path, "graph.json.tmp"), "w") as f:
+                json.dump(state, f)
+            os.replace(os.path.join(path, "graph.json.tmp"), os.path.join(path, "graph.json"))
+            # Rows were compacted on disk; reload so memory matches the snapshot
+            self.load(path)
+
+    def close(self):
+        if self.path and self._dirty:
+            self.save()
+
+    # --- Documents ---
+    def _drop_document(self, filename):
+        self.documents.pop(filename, None)
+        for need_id in self.needs.pop(filename, []):
+            self.need_owner.pop(need_id, None)
+            self.index["needs"].remove(need_id)
+        self.index["summaries"].remove(filename)
+        self.references.pop(filename, None)
+        for targets in self.references.values():
+            targets.pop(filename, None)
+
+    def delete_document_data(self, filename, asset_bucket=None):
+        self._round_trip()
+        with self._lock:
+            if filename not in self.documents:
+                return False
+            self._drop_document(filename)
+            chunk_ids = self.has_chunk.pop(filename, set())
+            for chunk_id in chunk_ids:
+                self.chunks.pop(chunk_id, None)
+                self.chunk_owner.pop(chunk_id, None)
+                self.index["chunks"].remove(chunk_id)
+            self._purged.append({"filename": filename, "asset_bucket": asset_bucket, "chunks": len(chunk_ids)})
+            self.generation += 1
+            self._dirty = True
+            return True
+
+    def collect_garbage(self, grace_seconds=0, max_tombstones=100):
+        with self._lock:
+            purged, self._purged = self._purged[:max_tombstones], self._purged[max_tombstones:]
+            return purged
+
+    def document_exists(self, filename):
+        self._round_trip()
+        return filename in self.documents
+
+    def touch_document(self, filename):
+        self._round_trip()
+        with self._lock:
+            document = self.documents.setdefault(filename, {"id": filename})
+            document.update(filename=filename, updated_at=_now())
+            self.has_chunk.setdefault(filename, set())
+            self._dirty = True
+
+    def create_document_node(self, filename, summary, needs, explicit, content_hash=None, sample_hash=None,
+                             summary_embedding=None, need_embeddings=None):
+        self._round_trip()
+        with self._lock:
+            document = self.documents.setdefault(filename, {"id": filename})
+            document.update(filename=filename, summary=summary, semantic_needs=needs, explicit_refs=explicit,
+                            content_hash=content_hash, sample_hash=sample_hash, updated_at=_now())
+            self.has_chunk.setdefault(filename, set())
+            if summary_embedding is None:
+                self.index["summaries"].remove(filename)
+            else:
+                self.index["summaries"].put(filename, summary_embedding)
+            if need_embeddings is not None:
+                for need_id in self.needs.pop(filename, []):
+                    self.need_owner.pop(need_id, None)
+                    self.index["needs"].remove(need_id)
+                self.needs[filename] = []
+                for i, vector in enumerate(need_embeddings):
+                    need_id = f"{filename}#{i}"
+                    self.needs[filename].append(need_id)
+                    self.need_owner[need_id] = filename
+                    self.index["needs"].put(need_id, vector)
+            self.generation += 1
+            self._dirty = True
+
+    def get_document_state(self, filename):
+        self._round_trip()
+        document = self.documents.get(filename)
+        if document is None:
+            return None
+        return {"content_hash": document.get("content_hash"), "sample_hash": document.get("sample_hash"),
+                "summary": document.get("summary"), "needs": document.get("semantic_needs"),
+                "explicit": document.get("explicit_refs")}
+
+    # --- Chunks ---
+    def get_chunk_ids(self, filename):
+        self._round_trip()
+        with self._lock:
+            return set(self.has_chunk.get(filename, set()))
+
+    def write_chunks(self, filename, rows, batch_size=500):
+        for i in range(0, len(rows), batch_size):
+            self._round_trip()
+            with self._lock:
+                # Like the Cypher writer: nothing is written without the Document
+                if filename not in self.documents:
+                    return
+                for row in rows[i:i + batch_size]:
+                    self.chunks[row["id"]] = {**self.chunks.get(row["id"], {}), **row["metadata"], "text": row["text"]}
+                    self.index["chunks"].put(row["id"], row["embedding"])
+                    self.has_chunk[filename].add(row["id"])
+                    self.chunk_owner[row["id"]] = filename
+                self._dirty = True
+
+    def update_chunk_positions(self, rows):
+        if not rows:
+            return
+        self._round_trip()
+        with self._lock:
+            for row in rows:
+                if row["id"] in self.chunks:
+                    self.chunks[row["id"]].update(chunk_index=row["chunk_index"], page=row["page"], page_end=row["page_end"])
+            self._dirty = True
+
+    def delete_stale_chunks(self, filename, keep_ids):
+        self._round_trip()
+        with self._lock:
+            stale = self.has_chunk.get(filename, set()) - set(keep_ids)
+            for chunk_id in stale:
+                self.chunks.pop(chunk_id, None)
+                self.chunk_owner.pop(chunk_id, None)
+                self.index["chunks"].remove(chunk_id)
+            self.has_chunk[filename] -= stale
+            self._dirty = self._dirty or bool(stale)
+            return len(stale)
+
+    # --- Retrieval ---
+    def corpus_generation(self):
+        self._round_trip()
+        return self.generation
+
+    def _chunk_hit(self, chunk_id, score):
+        chunk = self.chunks[chunk_id]
+        return {"id": chunk_id, "text": chunk.get("text"), "page": chunk.get("page"),
+                "chunk_index": chunk.get("chunk_index"), "document": self.chunk_owner.get(chunk_id), "score": score}
+
+    def search_chunks(self, query_embeddings, k=5, candidates=20, neighbour_docs=3, neighbour_chunks=2):
+        """Same shape and ranking as GraphManager.search_chunks, one matrix product for the whole batch."""
+        if len(query_embeddings) == 0:
+            return []
+        self._round_trip()
+        results = []
+        with self._lock:
+            chunk_index = self.index["chunks"]
+            for query, hits in zip(query_embeddings, chunk_index.search_many(query_embeddings, max(candidates, k))):
+                hits = [(c, score) for c, score in hits if self.chunk_owner.get(c) in self.documents][:k]
+                docs = list(dict.fromkeys(self.chunk_owner[c] for c, _ in hits))
+
+                # Best link score per neighbour, over both directions of REFERENCES
+                link_scores = {}
+                for d in docs:
+                    edges = [(n, e) for n, e in self.references.get(d, {}).items()]
+                    edges += [(s, targets[d]) for s, targets in self.references.items() if d in targets]
+                    for n, edge in edges:
+                        if n not in docs and n in self.documents:
+                            link_scores[n] = max(edge.get("score", 1.0), link_scores.get(n, 0.0))
+                neighbours = []
+                for n, link_score in sorted(link_scores.items(), key=lambda item: -item[1])[:neighbour_docs]:
+                    chunk_ids = [c for c in self.has_chunk.get(n, ()) if c in chunk_index]
+                    top = []
+                    if chunk_ids:
+                        rows = np.array([chunk_index.rows[c] for c in chunk_ids])
+                        unit = np.asarray(query, dtype=np.float32)
+                        unit = unit / (np.linalg.norm(unit) or 1.0)
+                        scores = (1 + chunk_index.matrix[rows] @ unit) / 2
+                        best = np.argsort(-scores)[:neighbour_chunks]
+                        top = [self._chunk_hit(chunk_ids[i], float(scores[i])) for i in best]
+                    neighbours.append({"document": n, "link_score": link_score, "chunks": top})
+
+                results.append({"chunks": [self._chunk_hit(c, score) for c, score in hits], "neighbours": neighbours})
+        return results
+
+    # --- Linking ---
+    def _link(self, source, target, score=None):
+        edge = self.references.setdefault(source, {}).setdefault(target, {})
+        edge.update(type="inferred", updated_at=_now())
+        if score is not None:
+            edge["score"] = score
+
+    @staticmethod
+    def _refs(document):
+        return [r.lower() for r in document.get("explicit_refs") or [] if r and r.strip()]
+
+    def run_batch_linker(self, filenames):
+        """
+        Same four passes as GraphManager._BATCH_LINK_QUERY, per file:
+        1. Outbound: each need -> top k+1 summaries, best score per target above the threshold.
+        2. Outbound: explicit refs contained in other documents' ids.
+        3. Inbound: the summary -> top 4k needs, best score per owning document.
+        4. Inbound: other documents whose explicit refs are contained in this id.
+        """
+        self._round_trip()
+        totals = {"outbound": 0, "inbound": 0}
+        with self._lock:
+            for filename in dict.fromkeys(f for f in filenames if f):
+                this = self.documents.get(filename)
+                if this is None:
+                    continue
+
+                # 1. Outbound semantic
+                need_ids = self.needs.get(filename, [])
+                best = {}
+                if need_ids:
+                    needs_matrix = np.stack([self.index["needs"].vector(n) for n in need_ids])
+                    for hits in self.index["summaries"].search_many(needs_matrix, self.top_k + 1):
+                        for target, score in hits:
+                            if score >= self.threshold and target != filename:
+                                best[target] = max(score, best.get(target, 0.0))
+                for target, score in best.items():
+                    self._link(filename, target, score)
+                totals["outbound"] += len(best)
+
+                # 2. Outbound explicit
+                refs = self._refs(this)
+                if refs:
+                    for target in self.documents:
+                        if target != filename and any(ref in target.lower() for ref in refs):
+                            self._link(filename, target)
+                            totals["outbound"] += 1
+
+                # 3. Inbound semantic
+                if filename in self.index["summaries"]:
+                    best = {}
+                    for need_id, score in self.index["needs"].search(self.index["summaries"].vector(filename), self.top_k * 4):
+                        source = self.need_owner.get(need_id)
+                        if score >= self.threshold and source is not None and source != filename:
+                            best[source] = max(score, best.get(source, 0.0))
+                    for source, score in best.items():
+                        self._link(source, filename, score)
+                    totals["inbound"] += len(best)
+
+                # 4. Inbound explicit
+                name = filename.lower()
+                for source, document in self.documents.items():
+                    if source != filename and any(ref in name for ref in self._refs(document)):
+                        self._link(source, filename)
+                        totals["inbound"] += 1
+            self.generation += 1
+            self._dirty = True
+
+        logger.info(f"Links established: {totals['outbound']} outbound, {totals['inbound']} inbound")
+        return totals
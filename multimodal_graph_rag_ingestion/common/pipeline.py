@@ -0,0 +1,182 @@
+import os
+import hashlib
+import logging
+from common.ingest import iter_page_batches, chunk_content, generate_doc_metadata, TextSample, PAGE_BATCH_SIZE
+from common.chunker import StreamingChunker
+from common.loader import store_in_graph, assign_chunk_ids, content_hash
+from common.resources import get_embedder
+from common.tracing import span, count
+
+logger = logging.getLogger(__name__)
+
+# "incremental": diff chunk hashes against the stored version and write only changes
+# "full": Kill & Fill, wipe the document and rewrite everything
+INGEST_MODE = os.getenv("INGEST_MODE", "incremental").lower()
+
+def write_document_node(gm, filename, summary, needs, explicit, content_hash=None, sample_hash=None):
+    """
+    Embeds the summary and each need (for the vector linker) and writes the Document node.
+    """
+    needs = [n for n in needs if n.strip()]
+    vectors = get_embedder().embed_texts([summary] + needs)
+    gm.create_document_node(filename, summary, needs, explicit,
+                            content_hash=content_hash, sample_hash=sample_hash,
+                            summary_embedding=vectors[0].tolist(), need_embeddings=vectors[1:].tolist())
+
+def ingest_document(pdf_path, filename, gm, source=None, mode=INGEST_MODE, checkpoint=None):
+    """
+    Streaming ingest: extract -> save asset -> describe -> chunk -> embed -> write,
+    one page batch at a time. Only the current batch, a bounded text sample and
+    the set of chunk ids are held in memory, so peak usage stays flat as page
+    count grows.
+
+    In incremental mode unchanged chunks (same content hash) are neither
+    re-embedded nor rewritten, stale chunks are deleted at the end, and the
+    metadata LLM call is skipped when the text sample is unchanged.
+
+    With a checkpoint (common.checkpoint), every written batch is committed to it
+    and a retry continues from the next page, restoring the text sample and the
+    chunker's carried-over text from the last commit.
+
+    One StreamingChunker spans the batches, so chunks run across batch and page
+    boundaries; each batch writes the chunks it completed.
+    """
+    sample = TextSample()
+    chunker = StreamingChunker()
+    stats = {"pages": 0}
+    start_page = checkpoint.next_page if checkpoint else 0
+
+    # 1. Pick up where an earlier attempt stopped (its chunks are already in the graph)
+    if start_page:
+        stats["pages"] = start_page
+        sample.add(checkpoint.resume_state["sample"])
+        chunker = StreamingChunker.from_state(checkpoint.resume_state["carry"])
+
+    writer = DocumentWriter(gm, filename, mode=mode, stats=stats,
+                            resume=checkpoint.progress() if start_page else None)
+    if start_page:
+        stats["resumed_at_page"] = start_page + 1
+    if checkpoint:
+        import fitz
+        with fitz.open(pdf_path) as doc:
+            page_count = doc.page_count
+
+    # 2. Stream the remaining pages, committing each batch once it is in the graph
+    for blocks in iter_page_batches(pdf_path, source=source, start_page=start_page):
+        for block in blocks:
+            stats["pages"] = max(stats["pages"], block["page"])
+            if block["type"] == "text":
+                sample.add(block["content"])
+        chunks = writer.write(chunk_content(blocks, chunker))
+        if checkpoint:
+            end_page = min(start_page + PAGE_BATCH_SIZE, page_count)
+            checkpoint.commit(start_page, end_page, chunks, sample=sample.text(), carry=chunker.state())
+            start_page = end_page
+
+    # 3. The text after the last complete chunk
+    with span("chunk"):
+        tail = list(chunker.flush())
+    count("chunks", len(tail))
+    if tail:
+        writer.write(tail)
+    stats = writer.finish(sample)
+    if checkpoint:
+        checkpoint.clear()
+    return stats
+
+def write_chunk_stream(gm, filename, chunk_batches, sample, mode=INGEST_MODE, stats=None):
+    """
+    Writes a document from an iterable of chunk lists (in document order) and
+    finishes with its Document node. Shared by ingest_document and the shard
+    merge step (common.sharding); chunks that already carry an "embedding" are
+    written without calling the embedding model. `sample` only has to be
+    complete once chunk_batches is exhausted.
+    """
+    writer = DocumentWriter(gm, filename, mode=mode, stats=stats)
+    for batch in chunk_batches:
+        writer.write(batch)
+    return writer.finish(sample)
+
+
+class DocumentWriter:
+    """
+    Writes one document batch by batch (see write_chunk_stream).
+
+    `resume` continues an interrupted run: {"chunk_ids": [...], "content_hashes": [...]}
+    of the batches already written, in document order. The previous version is
+    not wiped again, and chunks already in the graph are kept as they are, so
+    replaying a batch is harmless.
+    """
+    def __init__(self, gm, filename, mode=INGEST_MODE, stats=None, resume=None):
+        self.gm = gm
+        self.filename = filename
+        self.mode = mode
+        self.doc_hasher = hashlib.sha256()
+        self.occurrences = {}
+        self.seen_ids = set()
+        self.stats = stats if stats is not None else {}
+        self.stats.update({"chunks": 0, "embedded": 0, "unchanged": 0, "deleted": 0})
+
+        # 1. Resolve the previous version (Kill & Fill drops it outright, unless resuming)
+        self.state = gm.get_document_state(filename) if mode == "incremental" else None
+        if self.state is None and resume is None:
+            gm.delete_document_data(filename)
+            self.existing_ids = set()
+        else:
+            self.existing_ids = gm.get_chunk_ids(filename)
+        gm.touch_document(filename)
+
+        if resume is not None:
+            for chunk_id, digest in zip(resume["chunk_ids"], resume["content_hashes"]):
+                self.doc_hasher.update(digest.encode("ascii"))
+                self.occurrences[digest] = self.occurrences.get(digest, 0) + 1
+                self.seen_ids.add(chunk_id)
+            self.stats["chunks"] = len(resume["chunk_ids"])
+
+    def write(self, batch):
+        """
+        2. Writes one batch: new chunks are embedded and stored, known ones only
+        get their position refreshed. Returns the batch's chunks, stamped with ids.
+        """
+        chunks = assign_chunk_ids(batch, self.filename, self.occurrences, start_index=self.stats["chunks"])
+        self.stats["chunks"] += len(chunks)
+
+        new_chunks, kept_rows = [], []
+        for chunk_data in chunks:
+            self.doc_hasher.update(chunk_data["metadata"]["content_hash"].encode("ascii"))
+            self.seen_ids.add(chunk_data["id"])
+            if chunk_data["id"] in self.existing_ids:
+                metadata = chunk_data["metadata"]
+                kept_rows.append({"id": chunk_data["id"], "chunk_index": metadata["chunk_index"],
+                                  "page": metadata["page"], "page_end": metadata.get("page_end", metadata["page"])})
+            else:
+                new_chunks.append(chunk_data)
+
+        if new_chunks:
+            store_in_graph(new_chunks, self.filename, gm=self.gm)
+        self.gm.update_chunk_positions(kept_rows)
+        self.stats["embedded"] += len(new_chunks)
+        self.stats["unchanged"] += len(kept_rows)
+        return chunks
+
+    def finish(self, sample):
+        gm, filename, state = self.gm, self.filename, self.state
+
+        # 3. Drop chunks that no longer exist in the new version
+        if self.existing_ids - self.seen_ids:
+            self.stats["deleted"] = gm.delete_stale_chunks(filename, self.seen_ids)
+
+        # 4. Semantic metadata from the bounded sample (reused if the sample did not change),
+        #    then summary/need embeddings for the vector linker
+        sample_text = sample.text()
+        sample_hash = content_hash(sample_text)
+        if state is not None and state["sample_hash"] == sample_hash:
+            summary, needs, explicit = state["summary"], state["needs"], state["explicit"]
+            logger.info("Text sample unchanged, reusing document metadata.")
+        else:
+            summary, needs, explicit = generate_doc_metadata(sample_text)
+        write_document_node(gm, filename, summary, needs, explicit,
+                            content_hash=self.doc_hasher.hexdigest(), sample_hash=sample_hash)
+
+        logger.info(f"✅ Ingested '{filename}' ({self.mode}): {self.stats}")
+        return self.stats
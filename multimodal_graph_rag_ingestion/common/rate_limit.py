@@ -0,0 +1,120 @@
+"""
+Shared client-side rate limiting for model calls.
+
+Every Gemini request (vision, metadata) goes through one token bucket per
+process, and embedding requests through another, so the thread pools of the
+pipeline cannot outrun the per-minute request quota between them. On a quota
+error (HTTP 429 / RESOURCE_EXHAUSTED) the bucket halves its rate for everyone
+and the call is retried with jittered exponential backoff; the rate creeps
+back up with each successful call.
+
+The buckets are per process (i.e. per Lambda container): size
+LLM_REQUESTS_PER_MINUTE as the project quota divided by the expected
+concurrency.
+"""
+import os
+import time
+import random
+import logging
+import threading
+from common.tracing import count
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "300"))
+EMBED_REQUESTS_PER_MINUTE = float(os.getenv("EMBED_REQUESTS_PER_MINUTE", "1500"))
+# Requests that may go out back to back before the rate applies
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "2"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "60"))
+
+_QUOTA_MARKERS = ("429", "resource_exhausted", "resource exhausted", "quota", "rate limit", "too many requests")
+
+
+def is_quota_error(error):
+    """True for rate/quota rejections (worth waiting for), False for everything else."""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status == 429:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in _QUOTA_MARKERS)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with adaptive rate: backoff() halves the rate
+    (down to min_fraction of the configured one), success() adds back 5% of it.
+    """
+    def __init__(self, requests_per_minute, burst=RATE_LIMIT_BURST, min_fraction=0.1):
+        self.max_rate = requests_per_minute / 60.0
+        self.rate = self.max_rate
+        self.min_rate = self.max_rate * min_fraction
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Blocks until a request may be sent; returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def backoff(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            # Drain the burst too, so the requests queued behind this one spread out
+            self.tokens = 0.0
+
+    def success(self):
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(name="llm"):
+    """Process-wide bucket: "llm" for chat/vision calls, "embeddings" for embedding calls."""
+    with _limiters_lock:
+        if name not in _limiters:
+            rpm = EMBED_REQUESTS_PER_MINUTE if name == "embeddings" else LLM_REQUESTS_PER_MINUTE
+            _limiters[name] = TokenBucket(rpm)
+        return _limiters[name]
+
+def call_with_limits(fn, limiter=None, max_retries=LLM_MAX_RETRIES):
+    """
+    Runs fn() under the rate limiter, retrying quota errors with jittered
+    exponential backoff. Other errors are raised immediately.
+    """
+    limiter = limiter or get_rate_limiter()
+    for attempt in range(max_retries + 1):
+        if limiter.acquire() > 0:
+            count("rate_limited")
+        try:
+            result = fn()
+        except Exception as e:
+            if not is_quota_error(e) or attempt == max_retries:
+                raise
+            limiter.backoff()
+            count("quota_retries")
+            delay = min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+            logger.warning(f"⏳ Quota error ({e}), retrying in {delay:.1f}s at {limiter.rate * 60:.0f} req/min")
+            time.sleep(delay)
+            continue
+        limiter.success()
+        return result
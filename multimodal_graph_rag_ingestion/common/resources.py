@@ -0,0 +1,162 @@
+import os
+import time
+import logging
+import threading
+from common.secrets import load_config
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+# Process-level registry: everything here survives warm Lambda invocations.
+# Heavy SDKs (neo4j, boto3, LangChain) are imported inside the factories, so a handler
+# only pays for the clients it actually uses.
+CONFIG_TTL_SECONDS = int(os.getenv("CONFIG_TTL_SECONDS", "900"))
+# Idle time after which a pooled driver is re-verified before reuse
+DRIVER_LIVENESS_INTERVAL = int(os.getenv("NEO4J_LIVENESS_INTERVAL", "60"))
+
+# HTTP connections kept by the shared S3 client (botocore defaults to 10)
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+# Optional S3-compatible endpoint (MinIO, moto server) for local runs
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+
+LLM_MODEL = "gemini-1.5-flash"
+EMBEDDING_MODEL = "models/text-embedding-004"
+
+_lock = threading.RLock()
+_config = None
+_config_loaded_at = 0.0
+_driver = None
+_driver_checked_at = 0.0
+_clients = {}
+
+
+def get_config(force_refresh=False):
+    """
+    Memoized load_config(): one Secrets Manager round-trip per TTL window
+    instead of one per importing module. A failed refresh keeps serving
+    the previous value.
+    """
+    global _config, _config_loaded_at
+    with _lock:
+        if _config is not None and not force_refresh and time.monotonic() - _config_loaded_at < CONFIG_TTL_SECONDS:
+            return _config
+        try:
+            config = load_config()
+            if _config is not None and config != _config:
+                # Credentials rotated: clients built from the old ones are rebuilt lazily
+                _clients.clear()
+            _config = config
+            _config_loaded_at = time.monotonic()
+        except Exception as e:
+            if _config is None:
+                raise
+            logger.warning(f"Config refresh failed, keeping cached config: {e}")
+        return _config
+
+def refresh_config():
+    return get_config(force_refresh=True)
+
+
+def _connect():
+    from neo4j import GraphDatabase
+    config = get_config()
+    if not config.get("NEO4J_URI"):
+        raise ValueError("DB Config Missing")
+    driver = GraphDatabase.driver(
+        config["NEO4J_URI"],
+        auth=(config["NEO4J_USERNAME"], config["NEO4J_PASSWORD"]),
+        liveness_check_timeout=DRIVER_LIVENESS_INTERVAL
+    )
+    driver.verify_connectivity()
+    return driver
+
+def get_driver():
+    """
+    Returns the pooled Neo4j driver, reused across warm invocations.
+    1. Verifies connectivity if the driver has been idle past the liveness interval.
+    2. Rebuilds it if the check fails.
+    3. On an auth failure, refreshes the config once (rotated secret) and reconnects.
+    """
+    from neo4j.exceptions import AuthError
+    global _driver, _driver_checked_at
+    with _lock:
+        now = time.monotonic()
+        if _driver is not None:
+            if now - _driver_checked_at < DRIVER_LIVENESS_INTERVAL:
+                _driver_checked_at = now
+                return _driver
+            try:
+                _driver.verify_connectivity()
+                _driver_checked_at = now
+                return _driver
+            except Exception as e:
+                logger.warning(f"Pooled Neo4j driver failed liveness check, reconnecting: {e}")
+                if isinstance(e, AuthError):
+                    refresh_config()
+                close_driver()
+
+        try:
+            _driver = _connect()
+        except AuthError:
+            logger.warning("Neo4j authentication failed, refreshing config and retrying once")
+            refresh_config()
+            _driver = _connect()
+        _driver_checked_at = time.monotonic()
+        logger.info("🔌 Neo4j driver connected")
+        return _driver
+
+def close_driver():
+    global _driver
+    with _lock:
+        if _driver is not None:
+            try:
+                _driver.close()
+            except Exception:
+                pass
+            _driver = None
+
+
+def _get_client(name, factory):
+    with _lock:
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = factory()
+        return client
+
+def register_client(name, client):
+    """
+    Installs a pre-built client under a registry name ("s3", "llm:<model>",
+    "embeddings:<model>", "embedder:<model>"), e.g. a local stand-in for
+    offline benchmarks. It is used until the config changes.
+    """
+    with _lock:
+        _clients[name] = client
+
+def get_s3_client():
+    def factory():
+        import boto3
+        from botocore.config import Config
+        return boto3.client("s3", endpoint_url=S3_ENDPOINT_URL,
+                            config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS))
+    return _get_client("s3", factory)
+
+def get_llm(model=LLM_MODEL):
+    def factory():
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        # Single attempt: quota retries and backoff are shared across threads in common.rate_limit
+        return ChatGoogleGenerativeAI(model=model, google_api_key=get_config().get("GOOGLE_API_KEY"), temperature=0,
+                                      max_retries=1)
+    return _get_client(f"llm:{model}", factory)
+
+def get_embeddings(model=EMBEDDING_MODEL):
+    def factory():
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        return GoogleGenerativeAIEmbeddings(model=model, google_api_key=get_config().get("GOOGLE_API_KEY"))
+    return _get_client(f"embeddings:{model}", factory)
+
+def get_embedder(model=EMBEDDING_MODEL):
+    """Shared CachedEmbedder, so its cache also survives warm invocations."""
+    def factory():
+        from common.embedder import CachedEmbedder
+        return CachedEmbedder(get_embeddings(model))
+    return _get_client(f"embedder:{model}", factory)
@@ -0,0 +1,185 @@
+"""
+Read path: graph-aware retrieval over the ingested corpus.
+
+    from common.retrieval import get_retriever
+    result = get_retriever().retrieve("What is the torque spec for the pump flange?")
+    results = get_retriever().retrieve_many([...])   # one graph round-trip for the batch
+
+Each result is {"query", "chunks": [...], "neighbours": [{"document", "link_score", "chunks"}]}
+(see GraphStore.search_chunks): the best chunks from vector_index plus the best
+chunks of the REFERENCES neighbours of the documents they came from.
+
+1. Query embeddings are kept in an LRU (popular questions are embedded once).
+2. Results are kept for up to RETRIEVAL_CACHE_TTL seconds, keyed on the corpus
+   generation stored in the graph (GraphStore.corpus_generation). Every ingest,
+   delete and linker pass bumps it, in any process, so each search reads it
+   once and drops results cached under an older generation.
+Results are shared with the cache: treat them as read-only.
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from common.tracing import span, count
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+# Vector index candidates per query (headroom for chunks of deleted documents)
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+RETRIEVAL_NEIGHBOUR_DOCS = int(os.getenv("RETRIEVAL_NEIGHBOUR_DOCS", "3"))
+RETRIEVAL_NEIGHBOUR_CHUNKS = int(os.getenv("RETRIEVAL_NEIGHBOUR_CHUNKS", "2"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "300"))
+# Parallel embedding requests for the cache misses of a batch
+QUERY_EMBED_CONCURRENCY = int(os.getenv("QUERY_EMBED_CONCURRENCY", "4"))
+
+
+def normalize_query(query):
+    return " ".join(query.split())
+
+
+class Retriever:
+    def __init__(self, store=None, embeddings=None, k=RETRIEVAL_TOP_K, candidates=RETRIEVAL_CANDIDATES,
+                 neighbour_docs=RETRIEVAL_NEIGHBOUR_DOCS, neighbour_chunks=RETRIEVAL_NEIGHBOUR_CHUNKS,
+                 embedding_cache_size=QUERY_EMBEDDING_CACHE_SIZE, cache_size=RETRIEVAL_CACHE_SIZE,
+                 cache_ttl=RETRIEVAL_CACHE_TTL):
+        if store is None:
+            from common.graph_store import get_graph_store
+            store = get_graph_store()
+        if embeddings is None:
+            from common.resources import get_embeddings
+            embeddings = get_embeddings()
+        self.store = store
+        self.embeddings = embeddings
+        self.k = k
+        self.candidates = candidates
+        self.neighbour_docs = neighbour_docs
+        self.neighbour_chunks = neighbour_chunks
+        self.embedding_cache_size = embedding_cache_size
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.stats = {"embedding_hits": 0, "embedding_misses": 0, "result_hits": 0, "result_misses": 0}
+        self._embedding_cache = OrderedDict()  # normalized query -> vector
+        self._results = OrderedDict()  # (normalized query, k, generation) -> (expires_at, result)
+        self._generation = None  # corpus generation of the cached results
+        self._lock = threading.Lock()
+
+    # --- Query embeddings (LRU) ---
+    def _embed_one(self, text):
+        from common.rate_limit import call_with_limits, get_rate_limiter
+        return call_with_limits(lambda: self.embeddings.embed_query(text), limiter=get_rate_limiter("embeddings"))
+
+    def embed_queries(self, queries):
+        """Vectors for normalized queries, embedding only the ones not in the LRU."""
+        vectors, missing = {}, []
+        with self._lock:
+            for query in dict.fromkeys(queries):
+                vector = self._embedding_cache.get(query)
+                if vector is None:
+                    missing.append(query)
+                else:
+                    self._embedding_cache.move_to_end(query)
+                    vectors[query] = vector
+            self.stats["embedding_hits"] += len(vectors)
+            self.stats["embedding_misses"] += len(missing)
+
+        if missing:
+            with span("embed_query"), ThreadPoolExecutor(max_workers=max(1, min(QUERY_EMBED_CONCURRENCY, len(missing)))) as pool:
+                embedded = list(pool.map(self._embed_one, missing))
+            with self._lock:
+                for query, vector in zip(missing, embedded):
+                    vectors[query] = vector
+                    self._embedding_cache[query] = vector
+                    self._embedding_cache.move_to_end(query)
+                while len(self._embedding_cache) > self.embedding_cache_size:
+                    self._embedding_cache.popitem(last=False)
+        count("query_embedding_hits", len(queries) - len(missing))
+        return [vectors[query] for query in queries]
+
+    # --- Results (TTL) ---
+    def _cached(self, key, now):
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < now:
+            del self._results[key]
+            return None
+        self._results.move_to_end(key)
+        return result
+
+    def _remember(self, key, result, now):
+        self._results[key] = (now + self.cache_ttl, result)
+        self._results.move_to_end(key)
+        while len(self._results) > self.cache_size:
+            self._results.popitem(last=False)
+
+    def _use_generation(self, generation):
+        # Results of older generations can never be hit again; free their slots
+        if generation != self._generation:
+            self._results.clear()
+            self._generation = generation
+
+    def invalidate(self):
+        """Drops every cached result (the next search reads the generation again anyway)."""
+        with self._lock:
+            self._results.clear()
+            self._generation = None
+
+    # --- Queries ---
+    def retrieve(self, query, k=None):
+        return self.retrieve_many([query], k=k)[0]
+
+    def retrieve_many(self, queries, k=None):
+        """
+        Batch API: cached results are served from memory, the rest are embedded
+        (LRU first) and searched in a single graph round-trip. Results are in input order.
+        """
+        k = k or self.k
+        normalized = [normalize_query(q) for q in queries]
+        # 1. One cheap read: anything cached under an older corpus generation is stale
+        generation = self.store.corpus_generation()
+        now = time.monotonic()
+        results = {}
+        with self._lock:
+            self._use_generation(generation)
+            for query in dict.fromkeys(normalized):
+                cached = self._cached((query, k, generation), now)
+                if cached is not None:
+                    results[query] = cached
+            pending = [q for q in dict.fromkeys(normalized) if q not in results]
+            self.stats["result_hits"] += len(normalized) - len(pending)
+            self.stats["result_misses"] += len(pending)
+        count("retrieval_cache_hits", len(normalized) - len(pending))
+
+        if pending:
+            vectors = self.embed_queries(pending)
+            with span("retrieve"):
+                found = self.store.search_chunks(vectors, k=k, candidates=self.candidates,
+                                                 neighbour_docs=self.neighbour_docs,
+                                                 neighbour_chunks=self.neighbour_chunks)
+            now = time.monotonic()
+            with self._lock:
+                for query, result in zip(pending, found):
+                    results[query] = {"query": query, **result}
+                    # Not cached if the corpus moved on while searching (another thread saw a newer generation)
+                    if generation == self._generation:
+                        self._remember((query, k, generation), results[query], now)
+        return [results[query] for query in normalized]
+
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+def get_retriever():
+    """Process-wide Retriever on the configured graph store and embedding model."""
+    global _retriever
+    with _retriever_lock:
+        if _retriever is None:
+            _retriever = Retriever()
+        return _retriever
@@ -1,7 +1,5 @@
 import os
 import json
-import boto3
-from botocore.exceptions import ClientError
 from dotenv import load_dotenv
 import logging
 
@@ -25,7 +23,9 @@ def get_secret(secret_arn):
 
     logger.info(f"🔐 Connecting to Secrets Manager in region: {region_name}")
 
-    # 2. Create Client
+    # 2. Create Client (boto3 is imported here so .env-only runs never load it)
+    import boto3
+    from botocore.exceptions import ClientError
     session = boto3.session.Session()
     client = session.client(
         service_name='secretsmanager',
@@ -0,0 +1,73 @@
+import os
+import json
+from common.resources import get_s3_client
+from common.sharding import S3ShardStore, process_shard, merge_shards, encode_shard
+from common.tracing import start_trace, finish_trace, span, add_bytes
+from common.graph_store import get_graph_store
+import logging
+
+logger = logging.getLogger(__name__)
+
+def handler(event, context):
+    """
+    STEP 1b: SHARD WORKER (one Map iteration)
+    Extracts, describes, chunks and embeds one page range of a large PDF and
+    parks the result in S3 for the merge step.
+    Input: { "bucket": ..., "key": ..., "filename": ..., "run_id": ..., "index": 0,
+             "start_page": 0, "end_page": 150 }
+    Output: { "index": 0, "key": "shards/<run_id>/00000.json.gz", "pages": 150, "chunks": 812 }
+    """
+    logger.info(f"Shard Worker Received: {json.dumps(event)}")
+    start_trace("ShardWorker")
+
+    # Own directory per shard, but the original file name so asset keys match an unsharded ingest
+    work_dir = os.path.join("/tmp", f"shard-{event['run_id']}-{event['index']}")
+    local_path = os.path.join(work_dir, event["filename"])
+    try:
+        os.makedirs(work_dir, exist_ok=True)
+        with span("download"):
+            get_s3_client().download_file(event["bucket"], event["key"], local_path)
+        add_bytes("pdf", os.path.getsize(local_path))
+
+        result = process_shard(local_path, event, source=f"s3://{event['bucket']}/{event['key']}")
+        data = encode_shard(result)
+        with span("shard_upload"):
+            key = S3ShardStore(event["bucket"]).put(event["run_id"], event["index"], data)
+        add_bytes("shard", len(data))
+
+        return finish_trace({"index": event["index"], "key": key,
+                             "pages": result["pages"], "chunks": len(result["chunks"])})
+
+    except Exception as e:
+        logger.error(f"Shard Worker Critical Failure: {str(e)}")
+        # Raise so the Map iteration retries (or fails the execution)
+        raise e
+    finally:
+        if os.path.exists(local_path):
+            os.remove(local_path)
+        if os.path.isdir(work_dir):
+            os.rmdir(work_dir)
+        finish_trace()
+
+def merge_handler(event, context):
+    """
+    STEP 1c: MERGE WORKER
+    Streams every shard result back in order through the normal write path
+    (chunks, Document node, metadata), then hands the file on to linking.
+    Input: { "filename": ..., "bucket": ..., "run_id": ..., "shards": [ <ShardWorker outputs> ] }
+    Output: { "filename": "example.pdf", "status": "ingested", ... }
+    """
+    logger.info(f"Merge Worker Received: {event.get('filename')} ({len(event.get('shards', []))} shards)")
+
+    start_trace("MergeWorker")
+    gm = get_graph_store()
+    try:
+        stats = merge_shards(gm, event["filename"], event["shards"], S3ShardStore(event["bucket"]))
+        return finish_trace({"status": "ingested", "filename": event["filename"], **stats})
+
+    except Exception as e:
+        logger.error(f"Merge Worker Critical Failure: {str(e)}")
+        raise e
+    finally:
+        gm.close()
+        finish_trace()
@@ -0,0 +1,239 @@
+"""
+Sharded ingestion for documents too large for one 15-minute invocation.
+
+    plan  -> IngestWorker splits the PDF into page-range shards (build_plan)
+    map   -> ShardWorker runs extraction, vision, chunking and embedding per shard
+             (process_shard) and parks the result in a ShardStore
+    merge -> MergeWorker streams the shards back in order through the normal
+             write path (merge_shards), then the file is queued for linking
+
+Chunks are re-assembled in document order, so chunk ids, chunk_index and the
+metadata sample match a single ingest_document run (near-duplicate image
+detection is per shard). That needs shard boundaries on multiples of
+common.chunker.CHUNK_BREAK_PAGES (same default as SHARD_PAGES), where the
+single pass also ends a chunk. simulate() runs the whole flow locally.
+
+    python -m common.sharding big.pdf --shard-pages 50   # local dry run (needs model/graph config)
+"""
+import os
+import gzip
+import json
+import base64
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+# Documents with more pages than this are fanned out by the state machine
+SHARD_THRESHOLD_PAGES = int(os.getenv("SHARD_THRESHOLD_PAGES", "300"))
+SHARD_PAGES = int(os.getenv("SHARD_PAGES", "150"))
+SHARD_PREFIX = os.getenv("SHARD_PREFIX", "shards/")
+
+
+def plan_shards(page_count, shard_pages=SHARD_PAGES):
+    """Page ranges [start, end) covering the document."""
+    return [(start, min(start + shard_pages, page_count)) for start in range(0, page_count, shard_pages)]
+
+def build_plan(bucket, key, filename, page_count, run_id, shard_pages=SHARD_PAGES):
+    """
+    Map state input: one item per shard. Kept small (Step Functions payloads cap at 256 KB).
+    """
+    return {
+        "status": "needs_sharding",
+        "filename": filename,
+        "run_id": run_id,
+        "pages": page_count,
+        "shards": [
+            {"bucket": bucket, "key": key, "filename": filename, "run_id": run_id,
+             "index": i, "start_page": start, "end_page": end}
+            for i, (start, end) in enumerate(plan_shards(page_count, shard_pages))
+        ],
+    }
+
+
+# --- SHARD STORAGE ---
+def encode_shard(result):
+    """gzip'd JSON; embeddings travel as base64 float32 (4 bytes per value instead of ~20)."""
+    payload = dict(result)
+    embeddings = np.asarray(result["embeddings"], dtype=np.float32)
+    payload["embeddings"] = base64.b64encode(embeddings.tobytes()).decode("ascii")
+    payload["shape"] = list(embeddings.shape)
+    return gzip.compress(json.dumps(payload).encode("utf-8"))
+
+def decode_shard(data):
+    payload = json.loads(gzip.decompress(data))
+    raw = base64.b64decode(payload.pop("embeddings"))
+    payload["embeddings"] = np.frombuffer(raw, dtype=np.float32).reshape(payload.pop("shape"))
+    return payload
+
+
+class ShardStore:
+    """Where shard results wait for the merge step."""
+    def put(self, run_id, index, data):
+        """Stores encoded shard data, returns its key."""
+        raise NotImplementedError
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def delete(self, keys):
+        raise NotImplementedError
+
+
+class S3ShardStore(ShardStore):
+    """
+    Production store under SHARD_PREFIX in the document bucket (outside the
+    .pdf event filter; a lifecycle rule expires leftovers from failed runs).
+    """
+    def __init__(self, bucket, prefix=SHARD_PREFIX, client=None):
+        from common.resources import get_s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client or get_s3_client()
+
+    def put(self, run_id, index, data):
+        key = f"{self.prefix}{run_id}/{index:05d}.json.gz"
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType="application/gzip")
+        return key
+
+    def get(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def delete(self, keys):
+        for i in range(0, len(keys), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": key} for key in keys[i:i + 1000]], "Quiet": True}
+            )
+
+
+class LocalShardStore(ShardStore):
+    """Directory-backed store for simulate() and local runs."""
+    def __init__(self, root):
+        self.root = root
+
+    def put(self, run_id, index, data):
+        key = os.path.join(run_id, f"{index:05d}.json.gz")
+        os.makedirs(os.path.join(self.root, run_id), exist_ok=True)
+        with open(os.path.join(self.root, key), "wb") as f:
+            f.write(data)
+        return key
+
+    def get(self, key):
+        with open(os.path.join(self.root, key), "rb") as f:
+            return f.read()
+
+    def delete(self, keys):
+        for key in keys:
+            try:
+                os.remove(os.path.join(self.root, key))
+            except FileNotFoundError:
+                pass
+
+
+# --- MAP / MERGE ---
+def process_shard(pdf_path, shard, source=None):
+    """
+    Extraction, vision, chunking and embedding for one page range.
+    Returns {"index", "pages", "sample", "chunks": [{"text", "metadata"}], "embeddings": matrix}.
+    """
+    from common.ingest import iter_page_batches, chunk_content, TextSample
+    from common.chunker import StreamingChunker
+    from common.resources import get_embedder
+
+    sample = TextSample()
+    chunker = StreamingChunker()
+    chunks = []
+    for blocks in iter_page_batches(pdf_path, source=source,
+                                    start_page=shard["start_page"], end_page=shard["end_page"]):
+        for block in blocks:
+            if block["type"] == "text":
+                sample.add(block["content"])
+        chunks.extend(chunk_content(blocks, chunker))
+    chunks.extend(chunker.flush())
+
+    embeddings = get_embedder().embed_texts([c["text"] for c in chunks]) if chunks \
+        else np.empty((0, 0), dtype=np.float32)
+    return {
+        "index": shard["index"],
+        "pages": shard["end_page"] - shard["start_page"],
+        "sample": sample.text(),
+        "chunks": chunks,
+        "embeddings": embeddings,
+    }
+
+def merge_shards(gm, filename, shard_refs, store, mode=None):
+    """
+    Writes the document from its shard results, one shard in memory at a time,
+    then deletes the intermediates. shard_refs: [{"index": ..., "key": ...}] (any order).
+    """
+    from common.ingest import TextSample
+    from common.pipeline import write_chunk_stream, INGEST_MODE
+
+    refs = sorted(shard_refs, key=lambda ref: ref["index"])
+    stats = {"pages": sum(ref.get("pages", 0) for ref in refs), "shards": len(refs)}
+
+    # The metadata sample is the document prefix, so it usually comes from the first shard alone
+    sample = TextSample()
+    decoded = {}
+    for ref in refs:
+        if sample.full:
+            break
+        shard = decode_shard(store.get(ref["key"]))
+        sample.add(shard["sample"])
+        if not decoded:
+            decoded[ref["key"]] = shard  # reused by the write pass below
+
+    def chunk_batches():
+        for ref in refs:
+            shard = decoded.pop(ref["key"], None) or decode_shard(store.get(ref["key"]))
+            for chunk_data, vector in zip(shard["chunks"], shard["embeddings"]):
+                chunk_data["embedding"] = vector.tolist()
+            yield shard["chunks"]
+
+    write_chunk_stream(gm, filename, chunk_batches(), sample, mode=mode or INGEST_MODE, stats=stats)
+    store.delete([ref["key"] for ref in refs])
+    return stats
+
+
+def simulate(pdf_path, filename, gm, store_root, shard_pages=SHARD_PAGES, max_workers=4, mode=None):
+    """
+    Local harness: plan -> shards on a thread pool (standing in for the Map state) -> merge.
+    Uses whatever model/graph clients are configured (see benchmarks.fakes for stand-ins).
+    """
+    import fitz
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+    plan = build_plan("local", pdf_path, filename, page_count, run_id="simulation", shard_pages=shard_pages)
+    store = LocalShardStore(store_root)
+
+    def run(shard):
+        result = process_shard(pdf_path, shard, source=pdf_path)
+        return {"index": shard["index"], "pages": result["pages"],
+                "key": store.put(shard["run_id"], shard["index"], encode_shard(result))}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        refs = list(pool.map(run, plan["shards"]))
+    return merge_shards(gm, filename, refs, store, mode=mode)
+
+
+def main():
+    import argparse
+    import tempfile
+    parser = argparse.ArgumentParser(description="Run the sharded ingest flow locally.")
+    parser.add_argument("pdf")
+    parser.add_argument("--shard-pages", type=int, default=SHARD_PAGES)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    from common.graph_store import get_graph_store
+    logging.basicConfig(level=logging.INFO)
+    with tempfile.TemporaryDirectory() as root:
+        stats = simulate(args.pdf, os.path.basename(args.pdf), get_graph_store(), root,
+                         shard_pages=args.shard_pages, max_workers=args.workers)
+    print(json.dumps(stats, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Lightweight per-invocation tracing: span timings, counts, byte sizes and LLM token usage.
+
+    start_trace("IngestWorker")
+    with span("extract"):
+        ...
+    count("pages")
+    add_bytes("pdf", size)
+    record_llm_usage(response)
+    return finish_trace({"status": "ingested"})  # emits EMF, adds result["trace"]
+
+Spans are flat accumulators keyed by name (count/total/max). Spans recorded on
+worker threads (e.g. analyze_image) add up their own time, so their total can
+exceed the wall time of the stage that runs them.
+
+With TRACING_ENABLED=false, or outside a handler (backfill, benchmarks), every
+call is a single global check that returns immediately.
+"""
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+
+# --- CONFIGURATION ---
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "GraphRAGIngestion")
+
+_NOOP = nullcontext()
+_current = None
+
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.counts = {}
+        self.bytes = {}
+        self.tokens = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name, seconds):
+        with self._lock:
+            s = self.spans.get(name)
+            if s is None:
+                self.spans[name] = {"count": 1, "total_s": seconds, "max_s": seconds}
+            else:
+                s["count"] += 1
+                s["total_s"] += seconds
+                s["max_s"] = max(s["max_s"], seconds)
+
+    def add(self, bucket, name, n):
+        with self._lock:
+            bucket[name] = bucket.get(name, 0) + n
+
+    def summary(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "duration_ms": round((time.perf_counter() - self.started) * 1000, 1),
+                "spans": {name: {"count": s["count"], "total_ms": round(s["total_s"] * 1000, 1),
+                                 "max_ms": round(s["max_s"] * 1000, 1)} for name, s in self.spans.items()},
+                "counts": dict(self.counts),
+                "bytes": dict(self.bytes),
+                "tokens": dict(self.tokens),
+            }
+
+
+def start_trace(name):
+    """Starts the trace for this invocation (Lambda runs one invocation per process at a time)."""
+    global _current
+    _current = Trace(name) if TRACING_ENABLED else None
+    return _current
+
+@contextmanager
+def _timed(trace, name):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(name, time.perf_counter() - t0)
+
+def span(name):
+    trace = _current
+    if trace is None:
+        return _NOOP
+    return _timed(trace, name)
+
+def count(name, n=1):
+    trace = _current
+    if trace is not None:
+        trace.add(trace.counts, name, n)
+
+def add_bytes(name, n):
+    trace = _current
+    if trace is not None:
+        trace.add(trace.bytes, name, n)
+
+def record_llm_usage(response):
+    """Counts one LLM call and its token usage (LangChain usage_metadata, when present)."""
+    trace = _current
+    if trace is None:
+        return
+    trace.add(trace.counts, "llm_calls", 1)
+    usage = getattr(response, "usage_metadata", None) or {}
+    for key in ("input_tokens", "output_tokens"):
+        if usage.get(key):
+            trace.add(trace.tokens, key, usage[key])
+
+def to_emf(summary):
+    """
+    CloudWatch Embedded Metric Format record: printed to stdout, CloudWatch Logs
+    extracts the metrics (dimension: Handler) and keeps the rest as a searchable log line.
+    """
+    values, metrics = {}, []
+    def metric(name, value, unit):
+        values[name] = value
+        metrics.append({"Name": name, "Unit": unit})
+
+    metric("duration_ms", summary["duration_ms"], "Milliseconds")
+    for name, s in summary["spans"].items():
+        metric(f"{name}_ms", s["total_ms"], "Milliseconds")
+    for name, value in summary["counts"].items():
+        metric(name, value, "Count")
+    for name, value in summary["bytes"].items():
+        metric(f"{name}_bytes", value, "Bytes")
+    for name, value in summary["tokens"].items():
+        metric(name, value, "Count")
+
+    return {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            # EMF allows at most 100 metrics per directive
+            "CloudWatchMetrics": [{"Namespace": METRICS_NAMESPACE, "Dimensions": [["Handler"]], "Metrics": metrics[:100]}],
+        },
+        "Handler": summary["name"],
+        "trace": summary,
+        **values,
+    }
+
+def finish_trace(result=None):
+    """
+    Ends the active trace and prints its EMF record. If `result` is a dict the
+    summary is added under result["trace"]. Safe to call when no trace is active.
+    """
+    global _current
+    trace, _current = _current, None
+    if trace is None:
+        return result
+    summary = trace.summary()
+    print(json.dumps(to_emf(summary)), flush=True)
+    if isinstance(result, dict):
+        result["trace"] = summary
+    return result
@@ -5,6 +5,8 @@ from aws_cdk import (
     aws_s3 as s3,
     aws_secretsmanager as secretsmanager,
     aws_lambda as _lambda,
+    aws_lambda_event_sources as lambda_event_sources,
+    aws_sqs as sqs,
     aws_stepfunctions as sfn,
     aws_events as events,
     aws_events_targets as targets,
@@ -26,7 +28,12 @@ class MultimodalGraphRagIngestionStack(Stack):
             versioned=True,
             removal_policy=RemovalPolicy.DESTROY,
             auto_delete_objects=True,
-            event_bridge_enabled=True 
+            event_bridge_enabled=True,
+            # Shard results and ingest checkpoints of failed runs (successful runs delete their own);
+            # image descriptions past IMAGE_CACHE_MAX_AGE_DAYS (the GcWorker also enforces the size cap)
+            lifecycle_rules=[s3.LifecycleRule(prefix="shards/", expiration=Duration.days(1)),
+                             s3.LifecycleRule(prefix="checkpoints/", expiration=Duration.days(7)),
+                             s3.LifecycleRule(prefix="cache/image-descriptions/", expiration=Duration.days(30))]
         )
 
         # 2. Secrets Manager (The Vault)
@@ -48,6 +55,40 @@ class MultimodalGraphRagIngestionStack(Stack):
                 "SECRET_ARN": self.api_secrets.secret_arn,
                 "S3_BUCKET_NAME": self.doc_bucket.bucket_name,
                 "UPLOAD_TO_S3": "true",
+                "IMAGE_CACHE_BACKEND": "s3",
+                # Retries (timeouts included) resume from the last committed page batch
+                "CHECKPOINT_BACKEND": "s3",
+                # 1024 MB is under one vCPU: extraction workers would only slow the ingest down
+                "EXTRACT_WORKERS": "1",
+                "AWS_REGION": target_region
+            }
+        )
+
+        # Sharded path for PDFs above SHARD_THRESHOLD_PAGES: Map over page ranges, then merge
+        self.shard_worker = _lambda.DockerImageFunction(self, "ShardWorker",
+            code=rag_image_code,
+            command=["common.shard_worker.handler"],
+            timeout=Duration.minutes(15),
+            # More memory also means more vCPUs for multi-process page extraction
+            memory_size=3008,
+            environment={
+                "SECRET_ARN": self.api_secrets.secret_arn,
+                "S3_BUCKET_NAME": self.doc_bucket.bucket_name,
+                "UPLOAD_TO_S3": "true",
+                "IMAGE_CACHE_BACKEND": "s3",
+                # 3008 MB is ~1.7 vCPUs
+                "EXTRACT_WORKERS": "2",
+                "AWS_REGION": target_region
+            }
+        )
+
+        self.merge_worker = _lambda.DockerImageFunction(self, "MergeWorker",
+            code=rag_image_code,
+            command=["common.shard_worker.merge_handler"],
+            timeout=Duration.minutes(15),
+            memory_size=1024,
+            environment={
+                "SECRET_ARN": self.api_secrets.secret_arn,
                 "AWS_REGION": target_region
             }
         )
@@ -63,10 +104,59 @@ class MultimodalGraphRagIngestionStack(Stack):
             }
         )
 
+        # Purges tombstoned documents (chunks, relationships, S3 assets) in small batches
+        self.gc_worker = _lambda.DockerImageFunction(self, "GcWorker",
+            code=rag_image_code,
+            command=["common.gc_worker.handler"],
+            timeout=Duration.minutes(15),
+            memory_size=512,
+            environment={
+                "SECRET_ARN": self.api_secrets.secret_arn,
+                "S3_BUCKET_NAME": self.doc_bucket.bucket_name,
+                # Size cap of the shared description cache (IMAGE_CACHE_MAX_ENTRIES / _MAX_BYTES)
+                "IMAGE_CACHE_BACKEND": "s3",
+                # Sweeps fall on every GC_CACHE_EVICT_EVERY-th slot of the GcSchedule below
+                "GC_SCHEDULE_MINUTES": "15",
+                "AWS_REGION": target_region
+            }
+        )
+
+        # Link Queue: coalesces upload bursts so one LinkWorker run links many files
+        self.link_dlq = sqs.Queue(self, "LinkDeadLetterQueue",
+            retention_period=Duration.days(14),
+            removal_policy=RemovalPolicy.DESTROY
+        )
+        self.link_queue = sqs.Queue(self, "LinkQueue",
+            # AWS guidance: at least 6x the consumer's timeout
+            visibility_timeout=Duration.minutes(30),
+            # Filenames that keep failing to link are parked instead of redelivered until retention expires
+            dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=3, queue=self.link_dlq),
+            removal_policy=RemovalPolicy.DESTROY
+        )
+        self.link_worker.add_event_source(lambda_event_sources.SqsEventSource(self.link_queue,
+            batch_size=1000,
+            max_batching_window=Duration.seconds(30),
+            # Few concurrent linkers, so batches do not contend on the same Document nodes
+            max_concurrency=2,
+            # link_worker reports failing filenames; the rest of the batch is deleted
+            report_batch_item_failures=True
+        ))
+
         # Permissions
         self.api_secrets.grant_read(self.ingest_worker)
         self.api_secrets.grant_read(self.link_worker)
         self.doc_bucket.grant_read_write(self.ingest_worker)
+        self.doc_bucket.grant_delete(self.ingest_worker, "checkpoints/*")
+        for worker in (self.shard_worker, self.merge_worker):
+            self.api_secrets.grant_read(worker)
+            self.doc_bucket.grant_read_write(worker)
+        # The merge only cleans up shard results
+        self.doc_bucket.grant_delete(self.merge_worker, "shards/*")
+        self.api_secrets.grant_read(self.gc_worker)
+        self.doc_bucket.grant_read(self.gc_worker, "assets/*")
+        self.doc_bucket.grant_delete(self.gc_worker, "assets/*")
+        self.doc_bucket.grant_read(self.gc_worker, "cache/image-descriptions/*")
+        self.doc_bucket.grant_delete(self.gc_worker, "cache/image-descriptions/*")
 
         # 5. State Machine Orchestration
         log_group = logs.LogGroup(self, "RAGWorkflowLogs",
@@ -80,7 +170,9 @@ class MultimodalGraphRagIngestionStack(Stack):
             asl_string = f.read()
 
         asl_final = asl_string.replace("${IngestFunctionArn}", self.ingest_worker.function_arn) \
-                              .replace("${LinkFunctionArn}", self.link_worker.function_arn)
+                              .replace("${ShardFunctionArn}", self.shard_worker.function_arn) \
+                              .replace("${MergeFunctionArn}", self.merge_worker.function_arn) \
+                              .replace("${LinkQueueUrl}", self.link_queue.queue_url)
 
         self.state_machine = sfn.StateMachine(self, "RAGWorkflow",
             definition_body=sfn.DefinitionBody.from_string(asl_final),
@@ -89,8 +181,13 @@ class MultimodalGraphRagIngestionStack(Stack):
                 level=sfn.LogLevel.ALL,
                 include_execution_data=True
             ),
-            timeout=Duration.minutes(20)
+            # Sharded documents run plan + Map + merge, each step up to 15 minutes
+            timeout=Duration.hours(2)
         )
+        self.ingest_worker.grant_invoke(self.state_machine)
+        self.shard_worker.grant_invoke(self.state_machine)
+        self.merge_worker.grant_invoke(self.state_machine)
+        self.link_queue.grant_send_messages(self.state_machine)
 
         # 6. Lifecycle Trigger (Create/Modify/Delete)
         s3_event_rule = events.Rule(self, "S3LifecycleRule",
@@ -105,10 +202,20 @@ class MultimodalGraphRagIngestionStack(Stack):
         )
         s3_event_rule.add_target(targets.SfnStateMachine(self.state_machine))
 
+        # 7. Background Garbage Collection
+        # On the quarter hour (not rate()), so the event time identifies the GcWorker's schedule slot
+        gc_rule = events.Rule(self, "GcSchedule", schedule=events.Schedule.cron(minute="0/15"))
+        gc_rule.add_target(targets.LambdaFunction(self.gc_worker))
+
         # --- ARNs & RESOURCE OUTPUTS ---
         CfnOutput(self, "StackArn", value=self.stack_id)
         CfnOutput(self, "IngestWorkerArn", value=self.ingest_worker.function_arn)
+        CfnOutput(self, "ShardWorkerArn", value=self.shard_worker.function_arn)
+        CfnOutput(self, "MergeWorkerArn", value=self.merge_worker.function_arn)
         CfnOutput(self, "LinkWorkerArn", value=self.link_worker.function_arn)
+        CfnOutput(self, "GcWorkerArn", value=self.gc_worker.function_arn)
+        CfnOutput(self, "LinkQueueUrl", value=self.link_queue.queue_url)
+        CfnOutput(self, "LinkDeadLetterQueueUrl", value=self.link_dlq.queue_url)
         CfnOutput(self, "StateMachineArn", value=self.state_machine.state_machine_arn)
         CfnOutput(self, "BucketName", value=self.doc_bucket.bucket_name)
         CfnOutput(self, "SecretArn", value=self.api_secrets.secret_arn)
\ No newline at end of file